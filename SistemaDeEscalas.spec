@@ -6,7 +6,8 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('database.db', '.'), ('.streamlit', './.streamlit'), ('app.py', '.')],
-    hiddenimports=[],
+    # Módulos do projeto importados pelo app.py (que vai como data e não passa pela análise de imports)
+    hiddenimports=['processador', 'padroes', 'escrita_json', 'banco', 'edicao_em_massa', 'biblioteca', 'jornadas', 'registros', 'numpy'],
     hookspath=['./hooks'],
     hooksconfig={},
     runtime_hooks=[],
@@ -4,49 +4,89 @@ import streamlit as st
 import sqlite3
 import pandas as pd
 import json
+import io
+import csv
 import os
-import copy
-import uuid
+import tempfile
 import time
+import banco
+from edicao_em_massa import gerar_sobreposicoes, materializar, indice_tags, executar_lote
 from datetime import datetime
+from itertools import islice
 
 # --- Configuração da Página ---
 st.set_page_config(page_title="Central de Gestão de Escalas", page_icon="⚙️", layout="wide")
 
-# --- Conexão com o Banco de Dados (Cacheado) ---
+# --- Conexões com o Banco de Dados (pool cacheado; cada execução usa uma conexão própria) ---
+CAMINHO_BANCO = 'database.db'
+
 @st.cache_resource
-def get_db_connection():
+def get_db_pool():
     if not os.path.exists('output'): os.makedirs('output')
-    conn = sqlite3.connect('database.db', check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute('CREATE TABLE IF NOT EXISTS jsons (id INTEGER PRIMARY KEY, name TEXT UNIQUE, data TEXT)')
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS regras_traducao (
-            id INTEGER PRIMARY KEY, nome_regra TEXT, tipo_regra TEXT NOT NULL,
-            condicao_texto TEXT, condicao_duracao TEXT,
-            condicao_qtde_horarios INTEGER, condicao_sem_dia BOOLEAN,
-            formato_saida TEXT NOT NULL, prioridade INTEGER DEFAULT 10
-        )
-    ''')
-    conn.commit()
-    return conn
+    pool = banco.PoolConexoes(CAMINHO_BANCO)
+    with pool.conexao() as conn:
+        with banco.escrita(conn):
+            conn.execute('CREATE TABLE IF NOT EXISTS jsons (id INTEGER PRIMARY KEY, name TEXT UNIQUE, data TEXT)')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS regras_traducao (
+                    id INTEGER PRIMARY KEY, nome_regra TEXT, tipo_regra TEXT NOT NULL,
+                    condicao_texto TEXT, condicao_duracao TEXT,
+                    condicao_qtde_horarios INTEGER, condicao_sem_dia BOOLEAN,
+                    formato_saida TEXT NOT NULL, prioridade INTEGER DEFAULT 10
+                )
+            ''')
+        banco.inicializar(conn)
+    return pool
+
+@st.cache_resource
+def get_indice_modelos():
+    # Lido do snapshot binário da biblioteca (refeito automaticamente quando o JSON muda).
+    from biblioteca import IndiceModelos
+    return IndiceModelos.carregar('biblioteca_escalas.json') if os.path.exists('biblioteca_escalas.json') else None
+
+def get_biblioteca_escalas():
+    # process_file só usa as jornadas da biblioteca; elas vêm do mesmo snapshot.
+    indice = get_indice_modelos()
+    return {"jornadas": indice.jornadas} if indice is not None else None
 
 # --- Funções Auxiliares ---
 def salvar_no_banco(conn, data, nome, selected_id=None):
-    cursor = conn.cursor()
-    json_str = json.dumps(data, ensure_ascii=False, indent=4)
     try:
-        if selected_id:
-            cursor.execute("UPDATE jsons SET name = ?, data = ? WHERE id = ?", (nome, json_str, selected_id))
-        else:
-            cursor.execute("INSERT INTO jsons (name, data) VALUES (?, ?)", (nome, json_str))
-        conn.commit(); return True
+        banco.salvar_documento(conn, data, nome, json_id=selected_id); return True
     except sqlite3.IntegrityError:
         st.error(f"Erro: Um arquivo com o nome '{nome}' já existe."); return False
     except Exception as e:
         st.error(f"Ocorreu um erro ao salvar: {e}"); return False
 
+def _json_exportado(conn, json_id, chaves_escalas=None):
+    """Bytes do JSON exportado: só as escalas escolhidas e as jornadas usadas por elas saem do banco, escritas em partes."""
+    return b"".join(parte.encode('utf-8') for parte in banco.iterar_json(conn, json_id, chaves_escalas))
+
+def _busca_paginada(buscar, chave, rotulo_busca):
+    """Campo de busca + seletor de página. buscar(termo, limite, deslocamento) -> (linhas, total); devolve (linhas, total, termo, pagina)."""
+    col_busca, col_pagina = st.columns([3, 1])
+    termo = col_busca.text_input(rotulo_busca, key=f"busca_{chave}")
+    chave_pagina = f"pagina_{chave}"
+    pagina = st.session_state.get(chave_pagina, 1)
+    linhas, total = buscar(termo, banco.TAMANHO_PAGINA, (pagina - 1) * banco.TAMANHO_PAGINA)
+    paginas = max(1, -(-total // banco.TAMANHO_PAGINA))
+    if pagina > paginas:
+        pagina = st.session_state[chave_pagina] = paginas
+        linhas, total = buscar(termo, banco.TAMANHO_PAGINA, (pagina - 1) * banco.TAMANHO_PAGINA)
+    if paginas > 1: col_pagina.number_input(f"Página (de {paginas})", min_value=1, max_value=paginas, key=chave_pagina)
+    return linhas, total, termo, pagina
+
+def _seletor_arquivo(conn, rotulo, chave, aviso_vazio="Nenhum arquivo no banco de dados."):
+    """Selectbox de arquivos alimentado pela busca no banco, uma página por vez; devolve (id, nome) ou (None, None)."""
+    linhas, total, termo, _ = _busca_paginada(lambda termo, limite, deslocamento: banco.buscar_arquivos(conn, termo, limite, deslocamento), f"arquivo_{chave}", "Buscar arquivo (início do nome)")
+    if not total:
+        if termo: st.info("Nenhum arquivo encontrado com esse início de nome.")
+        else: st.warning(aviso_vazio)
+        return None, None
+    options_list = {r["id"]: r["name"] for r in linhas}
+    json_id = st.selectbox(rotulo, options_list.keys(), format_func=lambda id: options_list.get(id), key=f"json_select_{chave}", index=None, placeholder="Escolha um arquivo...")
+    return (json_id, options_list[json_id]) if json_id in options_list else (None, None)
+
 # ==============================================================================
 # DEFINIÇÃO DAS PÁGINAS DA APLICAÇÃO
 # ==============================================================================
@@ -55,26 +95,16 @@ def pagina_dashboard(conn):
     st.header("📊 Dashboard de Controle")
     st.markdown("Visão geral dos dados e atividade no sistema.")
     try:
-        cursor = conn.cursor()
-        total_arquivos = cursor.execute("SELECT COUNT(*) FROM jsons").fetchone()[0]
-        rows = cursor.execute("SELECT data FROM jsons").fetchall()
-        total_escalas, total_jornadas = 0, 0
-        for row in rows:
-            try:
-                json_data = json.loads(row[0])
-                total_escalas += len(json_data.get("escalas", []))
-                total_jornadas += len(json_data.get("jornadas", {}))
-            except: continue
+        files_data = banco.estatisticas_arquivos(conn)
         col1, col2, col3 = st.columns(3)
-        col1.metric("Arquivos Salvos", f"{total_arquivos}")
-        col2.metric("Total de Escalas", f"{total_escalas}")
-        col3.metric("Total de Jornadas", f"{total_jornadas}")
+        col1.metric("Arquivos Salvos", f"{len(files_data)}")
+        col2.metric("Total de Escalas", f"{sum(f['n_escalas'] or 0 for f in files_data)}")
+        col3.metric("Total de Jornadas", f"{sum(f['n_jornadas'] or 0 for f in files_data)}")
         st.divider()
         st.subheader("📁 Arquivos no Banco de Dados")
-        files_data = cursor.execute("SELECT id, name, data FROM jsons ORDER BY name").fetchall()
         if not files_data: st.info("Nenhum arquivo encontrado.")
         else:
-            display_data = [{"ID": f["id"], "Nome do Arquivo": f["name"], "Nº de Escalas": len(json.loads(f["data"]).get("escalas",[]))} for f in files_data]
+            display_data = [{"ID": f["id"], "Nome do Arquivo": f["name"], "Nº de Escalas": f["n_escalas"], "Nº de Jornadas": f["n_jornadas"], "Tamanho (KB)": round((f["tamanho"] or 0) / 1024, 1), "Última Modificação": f["modificado_em"]} for f in files_data]
             st.dataframe(pd.DataFrame(display_data), use_container_width=True, hide_index=True)
     except Exception as e: st.error(f"Ocorreu um erro ao carregar o dashboard: {e}")
 
@@ -102,13 +132,14 @@ def pagina_gerenciar_regras(conn):
             prioridade = st.number_input("Prioridade", min_value=1, value=10)
             if st.form_submit_button("Adicionar Regra"):
                 try:
-                    if tipo_regra == "Tradução Exata (DE -> PARA)":
-                        cursor.execute("INSERT INTO regras_traducao (nome_regra, tipo_regra, condicao_texto, formato_saida, prioridade) VALUES (?, 'EXATA', ?, ?, ?)", (nome_regra, texto_original, formato_saida, prioridade))
-                    elif tipo_regra == "Padrão por Quantidade de Horários":
-                        cursor.execute("INSERT INTO regras_traducao (nome_regra, tipo_regra, condicao_qtde_horarios, condicao_sem_dia, formato_saida, prioridade) VALUES (?, 'QUANTIDADE', ?, ?, ?, ?)", (nome_regra, cond_qtde, cond_sem_dia, formato_saida, prioridade))
-                    else:
-                        cursor.execute("INSERT INTO regras_traducao (nome_regra, tipo_regra, condicao_duracao, condicao_texto, formato_saida, prioridade) VALUES (?, 'DURACAO', ?, ?, ?, ?)", (nome_regra, cond_duracao, cond_texto, formato_saida, prioridade))
-                    conn.commit(); st.success("Regra adicionada!"); st.rerun()
+                    with banco.escrita(conn):
+                        if tipo_regra == "Tradução Exata (DE -> PARA)":
+                            cursor.execute("INSERT INTO regras_traducao (nome_regra, tipo_regra, condicao_texto, formato_saida, prioridade) VALUES (?, 'EXATA', ?, ?, ?)", (nome_regra, texto_original, formato_saida, prioridade))
+                        elif tipo_regra == "Padrão por Quantidade de Horários":
+                            cursor.execute("INSERT INTO regras_traducao (nome_regra, tipo_regra, condicao_qtde_horarios, condicao_sem_dia, formato_saida, prioridade) VALUES (?, 'QUANTIDADE', ?, ?, ?, ?)", (nome_regra, cond_qtde, cond_sem_dia, formato_saida, prioridade))
+                        else:
+                            cursor.execute("INSERT INTO regras_traducao (nome_regra, tipo_regra, condicao_duracao, condicao_texto, formato_saida, prioridade) VALUES (?, 'DURACAO', ?, ?, ?, ?)", (nome_regra, cond_duracao, cond_texto, formato_saida, prioridade))
+                    st.success("Regra adicionada!"); st.rerun()
                 except Exception as e: st.error(f"Erro ao salvar: {e}")
     st.divider()
     st.subheader("Regras Existentes")
@@ -125,12 +156,13 @@ def pagina_gerenciar_regras(conn):
                     elif regra['tipo_regra'] == 'QUANTIDADE': st.code(f"SE qtde for {regra['condicao_qtde_horarios']}' E sem dias\nENTÃO: '{regra['formato_saida']}'", language=None)
                 with col2:
                     if st.button("🗑️ Excluir", key=f"del_{regra['id']}", use_container_width=True):
-                        cursor.execute("DELETE FROM regras_traducao WHERE id = ?", (regra["id"],)); conn.commit(); st.toast("Regra excluída!"); st.rerun()
+                        with banco.escrita(conn): cursor.execute("DELETE FROM regras_traducao WHERE id = ?", (regra["id"],))
+                        st.toast("Regra excluída!"); st.rerun()
 
 def pagina_traduzir_csv_com_regras(conn):
     st.header("📄 Traduzir CSV com Regras")
     st.info("Carregue um CSV. O sistema usará as regras definidas em 'Gerenciar Regras' para traduzir o texto.")
-    try: from processador import traduzir_horarios
+    try: from processador import traduzir_horarios, LOG_DESLIGADO, LOG_RESUMO, LOG_COMPLETO
     except ImportError: st.error("Arquivo 'processador.py' não encontrado."); return
     cursor = conn.cursor()
     regras = [dict(row) for row in cursor.execute("SELECT * FROM regras_traducao ORDER BY prioridade").fetchall()]
@@ -152,24 +184,27 @@ def pagina_traduzir_csv_com_regras(conn):
         default_col_name = "DFHORDESCRICAO"
         default_index = colunas.index(default_col_name) if default_col_name in colunas else 0
         coluna_selecionada = st.selectbox("2. Selecione a coluna a ser traduzida", colunas, index=default_index)
+        niveis_log = {LOG_RESUMO: "Resumo (resultado de cada linha)", LOG_COMPLETO: "Completo (todas as regras testadas)", LOG_DESLIGADO: "Desligado"}
+        modo_log = st.radio("Análise da tradução", niveis_log.keys(), format_func=niveis_log.get, horizontal=True, help="O modo completo registra cada regra testada em cada linha e consome mais memória em arquivos grandes.")
         if st.button("3. Aplicar Regras e Traduzir", use_container_width=True, type="primary"):
             with st.spinner("Analisando e traduzindo..."):
-                df_resultado, log_depuracao = traduzir_horarios(df, coluna_selecionada, regras)
+                df_resultado, log_depuracao = traduzir_horarios(df, coluna_selecionada, regras, cache=st.session_state.setdefault('cache_traducoes', {}), modo_log=modo_log)
                 st.session_state.df_traduzido = df_resultado
                 csv_resultado = df_resultado.to_csv(index=False, sep=successful_config['sep']).encode(successful_config['encoding'], errors='ignore')
                 st.session_state.csv_traduzido = csv_resultado
                 if log_depuracao:
-                    st.session_state.log_depuracao_data = "\n".join(log_depuracao).encode('utf-8')
+                    # O log é estruturado durante a tradução e vira texto uma única vez aqui, não a cada reexecução da página.
+                    st.session_state.log_depuracao = log_depuracao.renderizar().encode('utf-8')
                     st.session_state.log_depuracao_filename = f"log_depuracao_{uploaded_file.name}.txt"
-                elif 'log_depuracao_data' in st.session_state: del st.session_state.log_depuracao_data
+                elif 'log_depuracao' in st.session_state: del st.session_state.log_depuracao
             st.success("Tradução concluída!")
     if 'df_traduzido' in st.session_state and uploaded_file:
         st.subheader("Resultado da Tradução"); st.dataframe(st.session_state.df_traduzido)
         col1, col2 = st.columns(2)
         with col1: st.download_button(label="📥 Baixar CSV Traduzido", data=st.session_state.csv_traduzido, file_name=f"traduzido_{uploaded_file.name}", mime="text/csv", use_container_width=True)
         with col2:
-            if 'log_depuracao_data' in st.session_state:
-                st.download_button(label="📋 Baixar Análise da Tradução (.txt)", data=st.session_state.log_depuracao_data, file_name=st.session_state.log_depuracao_filename, mime="text/plain", use_container_width=True)
+            if 'log_depuracao' in st.session_state:
+                st.download_button(label="📋 Baixar Análise da Tradução (.txt)", data=st.session_state.log_depuracao, file_name=st.session_state.log_depuracao_filename, mime="text/plain", use_container_width=True)
 
 def pagina_gerar_escalas_csv(conn):
     st.header("📊 Gerar Escalas por CSV")
@@ -204,6 +239,9 @@ def pagina_gerar_escalas_csv(conn):
             df = df.drop(columns=[col for col in df.columns if 'Unnamed:' in str(col)], errors='ignore')
             st.subheader("Pré-visualização do Arquivo Carregado")
             st.dataframe(df.head())
+            gerar_compacto = st.checkbox("Gerar JSON compacto (sem indentação)", value=False, help="Arquivos bem menores; o conteúdo é o mesmo.")
+            usar_biblioteca = st.checkbox("Reaproveitar jornadas da biblioteca de escalas", value=False, disabled=not os.path.exists('biblioteca_escalas.json'), help="Jornadas com os mesmos horários contratuais de 'biblioteca_escalas.json' são usadas no lugar de novas.")
+            usar_modelos = st.checkbox("Usar modelos da biblioteca para descrições equivalentes", value=False, disabled=not os.path.exists('biblioteca_escalas.json'), help="Descrições com os mesmos dias e horários de um modelo de 'biblioteca_escalas.json' (e nome parecido) usam o tipo e as jornadas do modelo. As associações ficam no log.")
 
             if st.button("🚀 Processar Escalas", use_container_width=True, type="primary"):
                 with st.spinner('Processando...'):
@@ -216,9 +254,9 @@ def pagina_gerar_escalas_csv(conn):
                     os.makedirs(output_dir, exist_ok=True)
                     output_path = os.path.join(output_dir, output_filename)
                     
-                    processed_data, log_unificacao = process_file(df, output_path)
+                    arquivo_gerado, log_unificacao = process_file(df, output_path, biblioteca=get_biblioteca_escalas() if usar_biblioteca else None, compacto=gerar_compacto, retornar_dados=False, modelos=get_indice_modelos() if usar_modelos else None)
                     
-                    st.session_state.processed_data_for_save = processed_data
+                    st.session_state.gen_arquivo = arquivo_gerado
                     st.session_state.gen_output_path = output_path
                     st.session_state.gen_log_unificacao = log_unificacao
                     st.session_state.gen_log_filename = log_filename
@@ -235,13 +273,14 @@ def pagina_gerar_escalas_csv(conn):
             nome_arquivo = st.text_input("Nome para salvar no banco de dados:", value=os.path.basename(st.session_state.gen_output_path))
             submitted = st.form_submit_button("Salvar no Banco")
             if submitted:
-                if salvar_no_banco(conn, st.session_state.processed_data_for_save, nome=nome_arquivo):
+                if salvar_no_banco(conn, st.session_state.gen_arquivo.carregar(), nome=nome_arquivo):
                     st.success(f"Arquivo '{nome_arquivo}' salvo no banco de dados!")
 
         col1, col2 = st.columns(2)
         with col1:
-            with open(st.session_state.gen_output_path, "rb") as f:
-                st.download_button(label=f"📥 Baixar JSON Gerado", data=f, file_name=os.path.basename(st.session_state.gen_output_path), mime="application/json", use_container_width=True)
+            # O botão recebe o arquivo aberto (aceito por todas as versões do Streamlit) e o lê direto do disco; o JSON não fica na sessão.
+            with st.session_state.gen_arquivo.abrir() as arquivo_gerado:
+                st.download_button(label=f"📥 Baixar JSON Gerado", data=arquivo_gerado, file_name=st.session_state.gen_arquivo.nome, mime="application/json", use_container_width=True)
         with col2:
             if st.session_state.gen_log_unificacao:
                 log_data = "\n".join(st.session_state.gen_log_unificacao)
@@ -250,50 +289,35 @@ def pagina_gerar_escalas_csv(conn):
 def _pagina_edicao_em_massa(conn, titulo_pagina, chave_sufixo, formato_novo_nome, sufixo_arquivo_novo):
     st.header(titulo_pagina)
     st.info("Esta ferramenta cria novas escalas em lote com base na substituição de um prefixo em uma tag específica.")
-    cursor = conn.cursor()
-    rows = cursor.execute("SELECT id, name FROM jsons ORDER BY name").fetchall()
-    if not rows: st.warning("Nenhum arquivo no banco de dados."); return
-    options_list = {r["id"]: r["name"] for r in rows}
-    json_id = st.selectbox("Selecione o JSON para editar", options_list.keys(), format_func=lambda id: options_list.get(id), key=f"json_select_{chave_sufixo}", index=None, placeholder="Escolha um arquivo...")
+    json_id, selected_name = _seletor_arquivo(conn, "Selecione o JSON para editar", chave_sufixo)
     if json_id:
-        selected_name = options_list[json_id]
-        result = cursor.execute("SELECT data FROM jsons WHERE id=?", (json_id,)).fetchone()
-        if not result: st.error("Arquivo não encontrado."); return
-        original_data = json.loads(result[0])
-        escalas = original_data.get('escalas', [])
+        try: original_data, versao = banco.carregar_documento_versionado(conn, json_id)  # compartilhado pelo cache: não alterar
+        except KeyError: st.error("Arquivo não encontrado."); return
+        escalas = original_data.get('escalas', []) if isinstance(original_data, dict) else []
         if not escalas: st.warning("O arquivo não contém 'escalas'."); return
-        todas_tags = sorted(list(set(key for esc in escalas for key in esc.keys())))
+        indice = indice_tags(json_id, versao, escalas)
+        todas_tags = indice.todas_tags
         with st.container(border=True):
             col1, col2, col3 = st.columns(3)
             tag_selecionada, valor_localizar, valor_substituir = col1.selectbox("Tag", todas_tags, key=f"tag_{chave_sufixo}"), col2.text_input("Localizar prefixo", key=f"search_{chave_sufixo}"), col3.text_input("Substituir por", key=f"replace_{chave_sufixo}")
             if st.button("👁️ Pré-visualizar", use_container_width=True, key=f"preview_{chave_sufixo}"):
-                dados_preview, novas_escalas = [], []
-                if valor_localizar:
-                    for esc in original_data.get("escalas", []):
-                        valor_original = esc.get(tag_selecionada)
-                        if isinstance(valor_original, str) and valor_original.startswith(valor_localizar):
-                            nova_escala = copy.deepcopy(esc)
-                            novo_valor = valor_substituir + valor_original[len(valor_localizar):]
-                            nova_escala[tag_selecionada] = novo_valor
-                            novo_nome = formato_novo_nome.format(nome_antigo=nova_escala.get("NOME", ""), valor_substituir=valor_substituir)
-                            nova_escala["NOME"], nova_escala["key"] = novo_nome, uuid.uuid4().hex
-                            novas_escalas.append(nova_escala)
-                            dados_preview.append({"Nome Original": esc.get("NOME"), "Novo Nome": novo_nome, f"Tag Original": valor_original, f"Tag Proposta": novo_valor})
+                sobreposicoes, dados_preview = gerar_sobreposicoes(escalas, tag_selecionada, valor_localizar, valor_substituir, formato_novo_nome, indice=indice)
                 if dados_preview:
-                    json_modificado = copy.deepcopy(original_data); json_modificado["escalas"].extend(novas_escalas)
-                    st.session_state[f'preview_{chave_sufixo}'] = pd.DataFrame(dados_preview)
-                    st.session_state[f'json_mod_{chave_sufixo}'] = json_modificado
+                    # Na sessão fica só o diff; o documento completo é montado ao salvar.
+                    st.session_state[f'tabela_previa_{chave_sufixo}'] = pd.DataFrame(dados_preview)
+                    st.session_state[f'alteracoes_{chave_sufixo}'] = {"json_id": json_id, "versao": versao, "sobreposicoes": sobreposicoes}
                 else: st.warning("Nenhum registro encontrado.")
-        if f'preview_{chave_sufixo}' in st.session_state:
+        alteracoes = st.session_state.get(f'alteracoes_{chave_sufixo}')
+        if alteracoes and alteracoes["json_id"] == json_id:
             with st.container(border=True):
-                st.markdown("#### Confirme e Salve"); st.dataframe(st.session_state[f'preview_{chave_sufixo}'], use_container_width=True)
+                st.markdown("#### Confirme e Salve"); st.dataframe(st.session_state[f'tabela_previa_{chave_sufixo}'], use_container_width=True)
                 opcao = st.radio("Como salvar?", ["Sobrescrever arquivo", "Salvar como novo"], key=f"save_opt_{chave_sufixo}", horizontal=True)
                 novo_nome_arquivo = st.text_input("Nome do novo arquivo:", value=selected_name.replace(".json", f"_{sufixo_arquivo_novo}.json"), key=f"new_name_{chave_sufixo}") if opcao == "Salvar como novo" else ""
                 if st.button("Salvar Agora", key=f"save_btn_{chave_sufixo}", type="primary"):
-                    json_final = st.session_state[f'json_mod_{chave_sufixo}']
                     id_salvar, nome_salvar = (json_id, selected_name) if opcao == "Sobrescrever arquivo" else (None, novo_nome_arquivo.strip())
-                    if not nome_salvar: st.error("Informe um nome para o novo arquivo.")
-                    elif salvar_no_banco(conn, json_final, nome=nome_salvar, selected_id=id_salvar):
+                    if alteracoes["versao"] != versao: st.error("O arquivo foi alterado desde a pré-visualização. Gere a pré-visualização novamente.")
+                    elif not nome_salvar: st.error("Informe um nome para o novo arquivo.")
+                    elif salvar_no_banco(conn, materializar(original_data, alteracoes["sobreposicoes"]), nome=nome_salvar, selected_id=id_salvar):
                         st.success("Arquivo salvo!"); [st.session_state.pop(key) for key in list(st.session_state.keys()) if key.endswith(chave_sufixo)]; time.sleep(1); st.rerun()
 
 def pagina_edicao_em_lote(conn):
@@ -302,6 +326,45 @@ def pagina_edicao_em_lote(conn):
 def pagina_duplicar_para_coligadas(conn):
     _pagina_edicao_em_massa(conn, "🔎 Duplicar para Coligadas/Filiais", "dup", "{nome_antigo} (Cópia: {valor_substituir})", "duplicado")
 
+def pagina_edicao_varios_arquivos(conn):
+    st.header("🧰 Edição em Lote em Vários Arquivos")
+    st.info("Aplica as mesmas regras de substituição de prefixo a vários arquivos de uma vez. Todos os arquivos são gravados juntos: se algum falhar, nenhum é alterado.")
+    marcados = st.session_state.setdefault("lote_arquivos_sel", {})
+    todos = st.checkbox("Aplicar a todos os arquivos do banco", value=False, key="lote_todos")
+    if not todos:
+        linhas, _, termo, pagina = _busca_paginada(lambda termo, limite, deslocamento: banco.buscar_arquivos(conn, termo, limite, deslocamento), "lote_arquivos", "Buscar arquivo (início do nome)")
+        opcoes = {r["id"]: r["name"] for r in linhas}
+        escolhidos = st.multiselect("1. Selecione os arquivos:", options=opcoes.keys(), format_func=lambda id: opcoes.get(id), default=[id for id in opcoes if id in marcados], key=f"lote_arquivos_{termo}_{pagina}")
+        for id in opcoes: marcados.pop(id, None)
+        marcados.update({id: opcoes[id] for id in escolhidos})
+        st.caption(f"{len(marcados)} arquivo(s) selecionado(s) no total.")
+    st.markdown("2. Regras de substituição (aplicadas às escalas originais de cada arquivo):")
+    regras = st.data_editor(pd.DataFrame({"Tag": ["COD"], "Localizar prefixo": [""], "Substituir por": [""]}), num_rows="dynamic", use_container_width=True, key="lote_regras")
+    modo = st.radio("3. Como salvar?", ["Edição em lote (sobrescrever os arquivos)", "Duplicar para coligadas (novos arquivos)"], key="lote_modo", horizontal=True)
+    if st.button("▶️ Executar em todos os arquivos", type="primary", use_container_width=True, key="lote_executar"):
+        ids = [r["id"] for r in banco.estatisticas_arquivos(conn)] if todos else list(marcados)
+        lista_regras = [(str(r["Tag"]).strip(), str(r["Localizar prefixo"]), str(r["Substituir por"])) for _, r in regras.fillna("").iterrows() if str(r["Tag"]).strip() and r["Localizar prefixo"]]
+        if not ids: st.warning("Nenhum arquivo selecionado."); st.stop()
+        if not lista_regras: st.warning("Informe ao menos uma regra com tag e prefixo."); st.stop()
+        duplicar = modo.startswith("Duplicar")
+        barra = st.progress(0.0, text="Preparando arquivos...")
+        try:
+            gravados, falhas = executar_lote(CAMINHO_BANCO, conn, ids, lista_regras,
+                                             "{nome_antigo} (Cópia: {valor_substituir})" if duplicar else "{nome_antigo} - {valor_substituir}",
+                                             sufixo_arquivo_novo="duplicado" if duplicar else None,
+                                             progresso=lambda feitos, total: barra.progress(feitos / total, text=f"Preparando arquivos... {feitos}/{total}"))
+        except sqlite3.IntegrityError as e: barra.empty(); st.error(f"Nenhum arquivo foi gravado: um dos nomes novos já existe ({e})."); st.stop()
+        except ValueError as e: barra.empty(); st.error(f"Nenhum arquivo foi gravado: {e}"); st.stop()
+        except Exception as e: barra.empty(); st.error(f"Nenhum arquivo foi gravado: erro ao processar os arquivos ({type(e).__name__}: {e})."); st.stop()
+        barra.progress(1.0, text="Concluído.")
+        if falhas:
+            st.warning(f"{len(falhas)} arquivo(s) não puderam ser lidos e ficaram de fora:")
+            st.dataframe(pd.DataFrame(falhas, columns=["ID", "Arquivo", "Erro"]), use_container_width=True, hide_index=True)
+        if gravados:
+            st.success(f"{len(gravados)} arquivo(s) gravado(s), {sum(n for _, _, n in gravados)} escala(s) nova(s).")
+            st.dataframe(pd.DataFrame(gravados, columns=["ID", "Arquivo", "Escalas novas"]), use_container_width=True, hide_index=True)
+        elif not falhas: st.warning("Nenhuma escala encontrada com essas regras nos arquivos selecionados.")
+
 def pagina_importar_escala(conn):
     st.header("📥 Importar Arquivo JSON")
     uploaded_file = st.file_uploader("Escolha um arquivo .json", type="json", key="import_json_uploader")
@@ -332,46 +395,27 @@ def pagina_importar_escala(conn):
 
 def pagina_exportar_json_personalizado(conn):
     st.header("🧩 Exportar JSON Personalizado")
-    cursor = conn.cursor()
-    files = cursor.execute("SELECT id, name FROM jsons ORDER BY name").fetchall()
-    if not files:
-        st.warning("Nenhum arquivo JSON disponível."); return
-
-    options_files = {f['id']: f['name'] for f in files}
-    selected_file_id = st.selectbox("1. Arquivo de origem:", options_files.keys(), format_func=lambda id: options_files.get(id), index=None, placeholder="Escolha um arquivo...")
+    selected_file_id, selected_file_name = _seletor_arquivo(conn, "1. Arquivo de origem:", "export", aviso_vazio="Nenhum arquivo JSON disponível.")
 
     if selected_file_id:
-        json_data = json.loads(cursor.execute("SELECT data FROM jsons WHERE id = ?", (selected_file_id,)).fetchone()['data'])
-        escalas_disponiveis = json_data.get("escalas", [])
-        
-        scale_options = {s.get("key"): s.get("NOME", "Escala sem nome") for s in escalas_disponiveis if s.get("key")}
-        
+        # A seleção fica na sessão e sobrevive à troca de busca/página; só a página atual vai para o multiselect.
+        marcadas = st.session_state.setdefault(f"export_sel_{selected_file_id}", set())
         select_all = st.checkbox("Selecionar todas as escalas", value=False)
-        default_selection = list(scale_options.keys()) if select_all else []
-        
-        selected_keys = st.multiselect("2. Selecione as escalas:", options=scale_options.keys(), format_func=lambda k: scale_options.get(k, k), default=default_selection)
+        if not select_all:
+            linhas, _, termo, pagina = _busca_paginada(lambda termo, limite, deslocamento: banco.buscar_escalas(conn, selected_file_id, termo, limite, deslocamento), f"escala_{selected_file_id}", "Buscar escala (início do NOME ou COD)")
+            scale_options = {s["key"]: s["nome"] if s["nome"] is not None else "Escala sem nome" for s in linhas if s["key"]}
+            escolhidas = st.multiselect("2. Selecione as escalas:", options=scale_options.keys(), format_func=lambda k: scale_options.get(k, k), default=[k for k in scale_options if k in marcadas], key=f"escalas_{selected_file_id}_{termo}_{pagina}")
+            marcadas.difference_update(scale_options); marcadas.update(escolhidas)
+            st.caption(f"{len(marcadas)} escala(s) selecionada(s) no total.")
         
         if st.button("Gerar JSON Personalizado", type="primary", use_container_width=True):
+            selected_keys = banco.chaves_escalas(conn, selected_file_id) if select_all else list(marcadas)
             if not selected_keys:
                 st.warning("Nenhuma escala selecionada."); st.stop()
             
-            escalas_selecionadas = [s for s in escalas_disponiveis if s.get("key") in selected_keys]
-            
-            jornadas_usadas = set()
-            for esc in escalas_selecionadas:
-                jornadas_usadas.update(esc.get("JORNADAS", []))
-            
-            jornadas_originais = json_data.get("jornadas", {})
-            jornadas_filtradas = {key: value for key, value in jornadas_originais.items() if key in jornadas_usadas}
-
-            new_json = {
-                "escalas": escalas_selecionadas, 
-                "jornadas": jornadas_filtradas, 
-                "horas_adicionais": json_data.get("horas_adicionais", {})
-            }
-            
-            st.session_state.export_data = json.dumps(new_json, indent=4, ensure_ascii=False)
-            st.session_state.export_filename = f"personalizado_{options_files[selected_file_id]}"
+            # O JSON é montado uma vez aqui; as reexecuções da página só reenviam os bytes ao botão.
+            st.session_state.export_data = _json_exportado(conn, selected_file_id, selected_keys)
+            st.session_state.export_filename = f"personalizado_{selected_file_name}"
             st.success("JSON personalizado gerado com sucesso!")
 
     if 'export_data' in st.session_state and st.session_state.export_data:
@@ -379,36 +423,43 @@ def pagina_exportar_json_personalizado(conn):
         st.download_button("📥 Baixar JSON", st.session_state.export_data, st.session_state.export_filename, "application/json", use_container_width=True)
 
 
+def _csv_lista_escalas(termo=""):
+    """
+    CSV da lista de escalas (mesmo formato do DataFrame.to_csv de antes) em um arquivo temporário, já no início e
+    pronto para o st.download_button: as linhas saem do banco em lotes e vão direto para o arquivo. Feche depois do uso.
+    """
+    saida = tempfile.TemporaryFile()
+    try:
+        texto = io.TextIOWrapper(saida, encoding='latin-1', newline='')
+        escritor = csv.writer(texto, delimiter=';', lineterminator=os.linesep)
+        escritor.writerow(["Arquivo", "Escala"])
+        with get_db_pool().conexao() as conn:
+            linhas = banco.listar_escalas(conn, termo)
+            while lote := list(islice(linhas, 5000)): escritor.writerows(lote)
+        texto.flush(); texto.detach()
+    except BaseException: saida.close(); raise
+    saida.seek(0)
+    return saida
+
 def pagina_exportar_lista(conn):
     st.header("📁 Exportar Lista de Escalas")
-    rows = conn.cursor().execute("SELECT name, data FROM jsons ORDER BY name").fetchall()
-    if not rows: st.warning("Nenhum arquivo no banco de dados."); return
-    data_list = []
-    for row in rows:
-        try:
-            escalas_data = json.loads(row['data']).get("escalas", [])
-            if isinstance(escalas_data, list):
-                for esc in escalas_data: 
-                    data_list.append([row['name'], esc.get("NOME", "Sem nome")])
-            else:
-                 data_list.append([row['name'], "ERRO DE FORMATO (escalas não é uma lista)"])
-        except Exception: 
-            data_list.append([row['name'], "ERRO AO LER JSON"])
-    df = pd.DataFrame(data_list, columns=["Arquivo", "Escala"])
-    st.dataframe(df, use_container_width=True, hide_index=True)
-    st.download_button("📥 Baixar como CSV", df.to_csv(index=False, sep=';').encode('latin-1'), "lista_escalas.csv", "text/csv")
+    linhas, total, termo, _ = _busca_paginada(lambda termo, limite, deslocamento: (list(banco.listar_escalas(conn, termo, limite, deslocamento)), banco.total_lista_escalas(conn, termo)),
+                                              "lista_escalas", "Filtrar por arquivo (início do nome)")
+    if not total:
+        if termo: st.info("Nenhum arquivo encontrado com esse início de nome.")
+        else: st.warning("Nenhum arquivo no banco de dados.")
+        return
+    st.dataframe(pd.DataFrame(linhas, columns=["Arquivo", "Escala"]), use_container_width=True, hide_index=True)
+    st.caption(f"{total} escala(s) no total; a tabela mostra uma página, o CSV traz todas.")
+    with _csv_lista_escalas(termo) as csv_lista: st.download_button("📥 Baixar como CSV", csv_lista, "lista_escalas.csv", "text/csv")
 
 
 def pagina_excluir_arquivo(conn):
     st.header("🗑️ Excluir Arquivo")
-    cursor = conn.cursor()
-    files = cursor.execute("SELECT id, name FROM jsons ORDER BY name").fetchall()
-    if not files: st.warning("Nenhum arquivo no banco de dados."); return
-    file_map = {f['id']: f['name'] for f in files}
-    selected_id = st.selectbox("Selecione um arquivo para excluir:", file_map.keys(), format_func=lambda id: file_map.get(id), index=None, placeholder="Escolha um arquivo...")
+    selected_id, selected_name = _seletor_arquivo(conn, "Selecione um arquivo para excluir:", "excluir")
     if selected_id and st.button("Confirmar Exclusão", type="danger"):
-        cursor.execute("DELETE FROM jsons WHERE id = ?", (selected_id,)); conn.commit()
-        st.success(f"Arquivo '{file_map[selected_id]}' excluído."); time.sleep(1); st.rerun()
+        banco.excluir_arquivo(conn, selected_id)
+        st.success(f"Arquivo '{selected_name}' excluído."); time.sleep(1); st.rerun()
 
 def pagina_documentacao(conn):
     st.header("📄 Documentação dos Recursos")
@@ -450,7 +501,6 @@ def pagina_documentacao(conn):
 # ==============================================================================
 def main():
     st.sidebar.title("⚙️ Menu de Ferramentas")
-    conn = get_db_connection()
     if 'current_page' not in st.session_state:
         st.session_state.current_page = "📊 Dashboard"
 
@@ -463,6 +513,7 @@ def main():
         "--- EDIÇÃO E GESTÃO ---": None,
         "📝 Edição em Lote": pagina_edicao_em_lote, 
         "🔎 Duplicar para Coligadas": pagina_duplicar_para_coligadas,
+        "🧰 Edição em Vários Arquivos": pagina_edicao_varios_arquivos,
         "🧩 Exportar JSON Personalizado": pagina_exportar_json_personalizado,
         "--- ARQUIVOS ---": None,
         "📥 Importar Arquivo JSON": pagina_importar_escala,
@@ -484,7 +535,8 @@ def main():
     
     page_to_call = PAGES[st.session_state.current_page]
     if page_to_call is not None:
-        page_to_call(conn)
+        with get_db_pool().conexao() as conn:
+            page_to_call(conn)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,576 @@
+# banco.py (Armazenamento normalizado dos arquivos de escalas no SQLite)
+"""
+Cada arquivo salvo é uma linha em `jsons` (id, name) e o conteúdo fica distribuído em tabelas:
+escalas, jornadas, escala_jornada (a lista JORNADAS de cada escala) e horas_adicionais.
+`jsons.layout` guarda o que é preciso para remontar o documento exatamente como foi salvo
+(ordem das chaves do topo, se jornadas/horas_adicionais eram lista ou dicionário, chaves extras).
+Documentos fora do formato {"escalas": [...], ...} continuam inteiros em `jsons.data`.
+`jsons.formato` diz como as colunas de conteúdo (dados/data) do arquivo estão gravadas:
+0 = texto JSON, 1 = JSON compacto comprimido com zlib (deflate com dicionário de pré-carga).
+Executar `python banco.py compactar [database.db]` regrava tudo no formato atual e faz VACUUM;
+`python banco.py deduplicar [database.db]` une as jornadas equivalentes repetidas dentro de cada arquivo (jornadas.impressao).
+As conexões vêm de um PoolConexoes (WAL, pragmas ajustados) e toda escrita passa por escrita(conn),
+que serializa os escritores do processo.
+"""
+
+import json
+import hashlib
+import queue
+import sqlite3
+import sys
+import threading
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+
+from jornadas import deduplicar_jornadas, impressao_jornada
+
+ESQUEMA = '''
+    CREATE TABLE IF NOT EXISTS escalas (
+        id INTEGER PRIMARY KEY, json_id INTEGER NOT NULL REFERENCES jsons(id),
+        posicao INTEGER NOT NULL, key TEXT, nome TEXT, cod TEXT, dados TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_escalas_json ON escalas (json_id, posicao);
+    CREATE INDEX IF NOT EXISTS idx_escalas_nome ON escalas (json_id, nome COLLATE NOCASE);
+    CREATE INDEX IF NOT EXISTS idx_escalas_cod ON escalas (json_id, cod COLLATE NOCASE);
+    CREATE TABLE IF NOT EXISTS jornadas (
+        id INTEGER PRIMARY KEY, json_id INTEGER NOT NULL REFERENCES jsons(id),
+        posicao INTEGER NOT NULL, chave TEXT, key TEXT, nome TEXT, dados TEXT NOT NULL, impressao TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_jornadas_json ON jornadas (json_id, key);
+    CREATE TABLE IF NOT EXISTS escala_jornada (
+        escala_id INTEGER NOT NULL REFERENCES escalas(id), posicao INTEGER NOT NULL, jornada_key TEXT NOT NULL,
+        PRIMARY KEY (escala_id, posicao)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_escala_jornada_key ON escala_jornada (jornada_key);
+    CREATE TABLE IF NOT EXISTS horas_adicionais (
+        id INTEGER PRIMARY KEY, json_id INTEGER NOT NULL REFERENCES jsons(id),
+        posicao INTEGER NOT NULL, chave TEXT, dados TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_horas_adicionais_json ON horas_adicionais (json_id, posicao);
+    CREATE INDEX IF NOT EXISTS idx_jsons_nome ON jsons (name COLLATE NOCASE);
+    CREATE TABLE IF NOT EXISTS jsons_stats (
+        json_id INTEGER PRIMARY KEY REFERENCES jsons(id), n_escalas INTEGER NOT NULL, n_jornadas INTEGER NOT NULL,
+        tamanho INTEGER NOT NULL, modificado_em TEXT NOT NULL, hash TEXT NOT NULL
+    );
+'''
+COLECOES = ("jornadas", "horas_adicionais")
+TABELAS_CONTEUDO = ("escalas", "jornadas", "horas_adicionais")
+
+FORMATO_TEXTO, FORMATO_ZLIB = 0, 1
+FORMATO_ATUAL = FORMATO_ZLIB
+# Trechos que se repetem em toda escala e jornada: com eles pré-carregados no deflate, cada linha pequena comprime
+# cerca de 5x em vez de 2x. O dicionário faz parte do FORMATO_ZLIB; qualquer mudança exige um novo formato.
+_DICIONARIO_ZLIB = (
+    b'{"NOME":"","DESC_ESCALA":"","COD":"","carga_horaria":"","tipo_escala":"","TIPO":"SEMANAL","JORNADAS":null,'
+    b'"dsr":{"ativo":"1","dia_completo":"1","desconto_valor_falta":"1","apuracao":{"semanal":"1"}},"TIPO_HORA_ADICIONAL":"",'
+    b'"TIPO_HORA_ADICIONAL_NOTURNO":"","COD_ADICIONAL_NOTURNO":"","excedente_apuracao_semanal":"","deficit_apuracao_semanal":"",'
+    b'"excedente_apuracao_mensal":"","deficit_apuracao_mensal":"","key":""}'
+    b'{"NOME_JORNADA":"","DESC_JORNADA":"","HORAS_CONTRATUAIS":[],"TRATAMENTO_EXPEDIENTE_EXTRA":"",'
+    b'"TRATAMENTO_ADICIONAL_PARA_PERIODO_DO_DIA":"","HORAS_CONTRATUAIS_INTERVALO_EXTRA":["",""],"FL_HORA_COMPENSAVEL":"1",'
+    b'"FL_ADICIONAL_NOTURNO_SOBRE_EXTRA":"","FL_FATOR_POSTERIOR":"1","FL_TRATAMENTO_CARGA_INFERIOR":"FALTA",'
+    b'"FL_TRATAMENTO_CARGA_SUPERIOR":"Hora Extra 50%","PREASSINALA_SOMENTE_BATIDAS_PARES":false,"batida_automatica":[],'
+    b'"PERIODOS":[{"TM_HORA_INICIO":"","TM_HORA_FIM":"","DESC_TIPO_HORA":"Expediente"},{"TM_HORA_INICIO":"","TM_HORA_FIM":"",'
+    b'"DESC_TIPO_HORA":"Hora Extra 50%"},{"TM_HORA_INICIO":"","TM_HORA_FIM":"","DESC_TIPO_HORA":"Adicional Noturno"}],'
+    b'"key":"","PREASSINALA_SOMENTE_BATIDAS_PARES":true}'
+)
+
+# ==============================================================================
+# CONEXÕES
+# ==============================================================================
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",  # leitores não bloqueiam o escritor (e vice-versa)
+    "PRAGMA synchronous = NORMAL",  # seguro com WAL; evita um fsync por transação
+    "PRAGMA busy_timeout = 30000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -32000",  # ~32 MB por conexão
+    "PRAGMA mmap_size = 268435456",
+)
+_TRAVA_ESCRITA = threading.Lock()
+
+def conectar(caminho):
+    conn = sqlite3.connect(caminho, timeout=30, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS: conn.execute(pragma)
+    return conn
+
+class PoolConexoes:
+    """
+    Conexões reaproveitadas entre as execuções do Streamlit. Cada execução (uma thread por sessão)
+    pega uma conexão só sua em conexao() e a devolve ao final; até `tamanho` conexões ficam abertas.
+    Com todas em uso, conexao() não espera: abre uma conexão temporária, fechada ao final. Assim quem já
+    segura uma conexão (a execução da página) pode pedir outra (o download gerado no clique) sem travar.
+    """
+    def __init__(self, caminho, tamanho=8):
+        self.caminho, self.tamanho = caminho, tamanho
+        self._livres, self._criadas, self._trava = queue.LifoQueue(), 0, threading.Lock()
+
+    @contextmanager
+    def conexao(self):
+        temporaria = False
+        try: conn = self._livres.get_nowait()
+        except queue.Empty:
+            with self._trava:
+                temporaria = self._criadas >= self.tamanho
+                if not temporaria: self._criadas += 1
+            conn = conectar(self.caminho)
+        try: yield conn
+        finally:
+            if conn.in_transaction: conn.rollback()
+            if temporaria: conn.close()
+            else: self._livres.put(conn)
+
+@contextmanager
+def escrita(conn):
+    """Transação de escrita: um escritor por vez no processo, e BEGIN IMMEDIATE reserva o banco já no início (sem 'database is locked' no meio do commit)."""
+    with _TRAVA_ESCRITA:
+        conn.execute("BEGIN IMMEDIATE")
+        try: yield conn
+        except BaseException:
+            conn.rollback(); raise
+        conn.commit()
+
+# ==============================================================================
+# CODIFICAÇÃO DO CONTEÚDO
+# ==============================================================================
+
+def _compactar(valor): return json.dumps(valor, ensure_ascii=False, separators=(',', ':'))
+
+def codificar(valor, formato=FORMATO_ATUAL): return _codificar_texto(_compactar(valor), formato)
+
+def _codificar_texto(texto, formato=FORMATO_ATUAL):
+    """Conteúdo gravado no formato a partir do JSON compacto já serializado (_compactar)."""
+    if formato == FORMATO_TEXTO: return texto
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15, 9, zlib.Z_DEFAULT_STRATEGY, _DICIONARIO_ZLIB)
+    return compressor.compress(texto.encode('utf-8')) + compressor.flush()
+
+def decodificar(dados, formato):
+    """Valor gravado por codificar(); conteúdo ilegível (JSON inválido ou bloco zlib corrompido) sempre gera ValueError."""
+    if not formato: return json.loads(dados)
+    descompressor = zlib.decompressobj(-15, _DICIONARIO_ZLIB)
+    try: texto = descompressor.decompress(dados) + descompressor.flush()
+    except (zlib.error, TypeError) as erro: raise ValueError(f"conteúdo comprimido ilegível: {erro}") from erro
+    return json.loads(texto)
+
+def inicializar(conn):
+    """Cria as tabelas normalizadas (e a coluna jsons.layout) e migra os arquivos ainda guardados inteiros em jsons.data."""
+    with _TRAVA_ESCRITA:
+        colunas = {row[1] for row in conn.execute("PRAGMA table_info(jsons)")}
+        if "layout" not in colunas: conn.execute("ALTER TABLE jsons ADD COLUMN layout TEXT")
+        if "formato" not in colunas: conn.execute(f"ALTER TABLE jsons ADD COLUMN formato INTEGER NOT NULL DEFAULT {FORMATO_TEXTO}")
+        conn.executescript(ESQUEMA)
+        if "impressao" not in {row[1] for row in conn.execute("PRAGMA table_info(jornadas)")}: conn.execute("ALTER TABLE jornadas ADD COLUMN impressao TEXT")
+        # Impressões repetidas são procuradas dentro de cada arquivo (deduplicar_arquivos); o índice só por impressão nunca era usado.
+        conn.execute("DROP INDEX IF EXISTS idx_jornadas_impressao")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jornadas_json_impressao ON jornadas (json_id, impressao)")
+    with escrita(conn):
+        migrar_blobs(conn)
+        preencher_impressoes(conn)
+        for json_id, data in conn.execute("SELECT id, data FROM jsons WHERE id NOT IN (SELECT json_id FROM jsons_stats)").fetchall():
+            try: _gravar_estatisticas(conn, json_id, None, estatisticas=linhas_conteudo(exportar_documento(conn, json_id))["estatisticas"])
+            except ValueError: _gravar_estatisticas(conn, json_id, None, data if isinstance(data, bytes) else (data or "").encode('utf-8'))
+
+def migrar_blobs(conn):
+    """Distribui nas tabelas normalizadas o conteúdo das linhas de jsons gravadas no formato antigo (data inteiro, sem layout). Chamar dentro de escrita()."""
+    pendentes = conn.execute("SELECT id, data FROM jsons WHERE layout IS NULL").fetchall()
+    for json_id, data in pendentes:
+        try: documento = json.loads(data) if data is not None else {}
+        except (TypeError, ValueError): conn.execute("UPDATE jsons SET layout = ? WHERE id = ?", (_compactar({"bruto": True}), json_id)); continue
+        _remover_conteudo(conn, json_id); _gravar_conteudo(conn, json_id, documento)
+    return len(pendentes)
+
+def preencher_impressoes(conn):
+    """
+    Calcula jornadas.impressao das linhas gravadas antes da coluna existir. Chamar dentro de escrita().
+    Linhas com conteúdo ilegível ficam sem impressão (não entram na deduplicação) em vez de impedir a inicialização.
+    """
+    pendentes = conn.execute("SELECT j.id, j.dados, s.formato FROM jornadas j JOIN jsons s ON s.id = j.json_id WHERE j.impressao IS NULL").fetchall()
+    impressoes = []
+    for id_, dados, formato in pendentes:
+        try: impressoes.append((impressao_jornada(decodificar(dados, formato)), id_))
+        except ValueError: continue
+    conn.executemany("UPDATE jornadas SET impressao = ? WHERE id = ?", impressoes)
+    return len(impressoes)
+
+def _normalizavel(documento): return isinstance(documento, dict) and isinstance(documento.get("escalas", []), list)
+
+def _estatisticas(documento, tamanho, hash_conteudo):
+    """(n_escalas, n_jornadas, tamanho, hash) com o tamanho e o hash já calculados (ver linhas_conteudo)."""
+    escalas = documento.get("escalas") if isinstance(documento, dict) else None
+    jornadas = documento.get("jornadas") if isinstance(documento, dict) else None
+    return (len(escalas) if isinstance(escalas, list) else 0, len(jornadas) if isinstance(jornadas, (list, dict)) else 0, tamanho, hash_conteudo)
+
+def _gravar_estatisticas(conn, json_id, documento, conteudo=None, estatisticas=None):
+    """Atualiza jsons_stats: contagens, tamanho e hash (de linhas_conteudo, ou do conteúdo bruto ilegível informado)."""
+    n_escalas, n_jornadas, tamanho, hash_conteudo = estatisticas or _estatisticas(documento, len(conteudo), hashlib.sha1(conteudo).hexdigest())
+    conn.execute("INSERT OR REPLACE INTO jsons_stats (json_id, n_escalas, n_jornadas, tamanho, modificado_em, hash) VALUES (?, ?, ?, ?, ?, ?)",
+                 (json_id, n_escalas, n_jornadas, tamanho, datetime.now().isoformat(sep=' ', timespec='seconds'), hash_conteudo))
+
+def _remover_conteudo(conn, json_id):
+    conn.execute("DELETE FROM escala_jornada WHERE escala_id IN (SELECT id FROM escalas WHERE json_id = ?)", (json_id,))
+    for tabela in ("escalas", "jornadas", "horas_adicionais"): conn.execute(f"DELETE FROM {tabela} WHERE json_id = ?", (json_id,))
+
+def _coluna_texto(valor):
+    """Valor de um campo do documento (key, NOME, COD...) como texto para as colunas de busca; o JSON guardado não muda."""
+    return str(valor) if valor is not None else None
+
+def linhas_conteudo(documento):
+    """
+    Tudo o que _inserir_conteudo grava para um documento (estatísticas, layout e linhas já codificadas), sem tocar no
+    banco: é a parte pesada da gravação e pode ser feita fora da transação, inclusive em outro processo.
+    O tamanho e o hash das estatísticas saem do mesmo JSON compacto de cada parte que é codificado para gravação:
+    o tamanho é o do documento em JSON compacto (aproximado) e o hash muda sempre que o conteúdo gravado muda.
+    """
+    resumo, tamanho = hashlib.sha1(), 0
+    def codificar_parte(valor, chave=None):
+        nonlocal tamanho
+        texto = _compactar(valor)
+        parte = (texto if chave is None else f"{_compactar(chave)}:{texto}").encode('utf-8')
+        resumo.update(parte); resumo.update(b"\n"); tamanho += len(parte)
+        return _codificar_texto(texto)
+    linhas = {"bruto": None, "escalas": [], "vinculos": [], "jornadas": [], "horas_adicionais": []}
+    if not _normalizavel(documento):
+        linhas["bruto"], linhas["layout"] = codificar_parte(documento), _compactar({"bruto": True})
+        linhas["estatisticas"] = _estatisticas(documento, tamanho, resumo.hexdigest())
+        return linhas
+    layout = {"ordem": list(documento.keys()), "tipos": {}, "extras": {}}
+    for chave, valor in documento.items():
+        if chave == "escalas": continue
+        if chave in COLECOES and isinstance(valor, (list, dict)): layout["tipos"][chave] = "dict" if isinstance(valor, dict) else "list"
+        else: layout["extras"][chave] = valor
+    for posicao, escala in enumerate(documento.get("escalas", [])):
+        dados = escala
+        if isinstance(escala, dict):
+            jornadas_escala = escala.get("JORNADAS")
+            # A lista JORNADAS vai para escala_jornada; no JSON da escala fica só o lugar dela (null).
+            if isinstance(jornadas_escala, list) and jornadas_escala and all(isinstance(k, str) for k in jornadas_escala):
+                dados = {**escala, "JORNADAS": None}
+                linhas["vinculos"].append((posicao, jornadas_escala))
+                codificar_parte(jornadas_escala, posicao)  # só entra no tamanho e no hash
+            campos = (escala.get("key"), escala.get("NOME"), escala.get("COD"))
+        else: campos = (None, None, None)
+        linhas["escalas"].append((posicao, *map(_coluna_texto, campos), codificar_parte(dados)))
+    if "jornadas" in layout["tipos"]:
+        itens = documento["jornadas"].items() if layout["tipos"]["jornadas"] == "dict" else ((None, j) for j in documento["jornadas"])
+        linhas["jornadas"] = [(posicao, chave, *((_coluna_texto(j.get("key")), _coluna_texto(j.get("NOME_JORNADA"))) if isinstance(j, dict) else (None, None)), codificar_parte(j, chave), impressao_jornada(j)) for posicao, (chave, j) in enumerate(itens)]
+    if "horas_adicionais" in layout["tipos"]:
+        itens = documento["horas_adicionais"].items() if layout["tipos"]["horas_adicionais"] == "dict" else ((None, h) for h in documento["horas_adicionais"])
+        linhas["horas_adicionais"] = [(posicao, chave, codificar_parte(h, chave)) for posicao, (chave, h) in enumerate(itens)]
+    linhas["layout"] = _compactar(layout)
+    layout_utf8 = linhas["layout"].encode('utf-8')
+    resumo.update(layout_utf8); tamanho += len(layout_utf8)
+    linhas["estatisticas"] = _estatisticas(documento, tamanho, resumo.hexdigest())
+    return linhas
+
+def _inserir_conteudo(conn, json_id, linhas):
+    """Grava o resultado de linhas_conteudo() para o arquivo json_id (cujo conteúdo anterior já foi removido)."""
+    _gravar_estatisticas(conn, json_id, None, estatisticas=linhas["estatisticas"])
+    if linhas["bruto"] is not None:
+        conn.execute("UPDATE jsons SET data = ?, layout = ?, formato = ? WHERE id = ?", (linhas["bruto"], linhas["layout"], FORMATO_ATUAL, json_id))
+        return
+    conn.executemany("INSERT INTO escalas (json_id, posicao, key, nome, cod, dados) VALUES (?, ?, ?, ?, ?, ?)", ((json_id, *linha) for linha in linhas["escalas"]))
+    if linhas["vinculos"]:
+        ids = dict(conn.execute("SELECT posicao, id FROM escalas WHERE json_id = ?", (json_id,)).fetchall())
+        conn.executemany("INSERT INTO escala_jornada (escala_id, posicao, jornada_key) VALUES (?, ?, ?)", ((ids[posicao], i, k) for posicao, chaves in linhas["vinculos"] for i, k in enumerate(chaves)))
+    conn.executemany("INSERT INTO jornadas (json_id, posicao, chave, key, nome, dados, impressao) VALUES (?, ?, ?, ?, ?, ?, ?)", ((json_id, *linha) for linha in linhas["jornadas"]))
+    conn.executemany("INSERT INTO horas_adicionais (json_id, posicao, chave, dados) VALUES (?, ?, ?, ?)", ((json_id, *linha) for linha in linhas["horas_adicionais"]))
+    conn.execute("UPDATE jsons SET data = NULL, layout = ?, formato = ? WHERE id = ?", (linhas["layout"], FORMATO_ATUAL, json_id))
+
+def _gravar_conteudo(conn, json_id, documento): _inserir_conteudo(conn, json_id, linhas_conteudo(documento))
+
+def gravar_linhas(conn, linhas, nome, json_id=None):
+    """Como salvar_documento, a partir de linhas_conteudo(), mas dentro de uma transação escrita() aberta pelo chamador."""
+    if json_id:
+        conn.execute("UPDATE jsons SET name = ? WHERE id = ?", (nome, json_id))
+        _remover_conteudo(conn, json_id)
+    else: json_id = conn.execute("INSERT INTO jsons (name) VALUES (?)", (nome,)).lastrowid
+    _inserir_conteudo(conn, json_id, linhas)
+    CACHE_DOCUMENTOS.descartar(json_id)
+    return json_id
+
+def salvar_documento(conn, documento, nome, json_id=None):
+    """Grava (ou sobrescreve, se json_id for informado) um arquivo em uma única transação; devolve o id. Nome repetido gera sqlite3.IntegrityError."""
+    linhas = linhas_conteudo(documento)  # codificação fora da trava de escrita
+    with escrita(conn): json_id = gravar_linhas(conn, linhas, nome, json_id)
+    return json_id
+
+def excluir_arquivo(conn, json_id):
+    with escrita(conn):
+        _remover_conteudo(conn, json_id)
+        conn.execute("DELETE FROM jsons_stats WHERE json_id = ?", (json_id,))
+        conn.execute("DELETE FROM jsons WHERE id = ?", (json_id,))
+    CACHE_DOCUMENTOS.descartar(json_id)
+
+TAMANHO_PAGINA = 50
+
+def _prefixo_like(termo):
+    """Padrão LIKE 'termo%' (sem diferenciar maiúsculas) com os curingas do termo escapados: usa os índices COLLATE NOCASE."""
+    return (termo or "").strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+def buscar_arquivos(conn, termo="", limite=TAMANHO_PAGINA, deslocamento=0):
+    """Página de (id, name) dos arquivos cujo nome começa com termo, em ordem de nome; devolve (linhas, total)."""
+    padrao = _prefixo_like(termo)
+    total = conn.execute("SELECT COUNT(*) FROM jsons WHERE name LIKE ? ESCAPE '\\'", (padrao,)).fetchone()[0]
+    linhas = conn.execute("SELECT id, name FROM jsons WHERE name LIKE ? ESCAPE '\\' ORDER BY name COLLATE NOCASE LIMIT ? OFFSET ?", (padrao, limite, deslocamento)).fetchall()
+    return linhas, total
+
+def estatisticas_arquivos(conn):
+    """Uma linha por arquivo com as estatísticas materializadas em jsons_stats (sem ler o conteúdo)."""
+    return conn.execute("SELECT j.id, j.name, s.n_escalas, s.n_jornadas, s.tamanho, s.modificado_em, s.hash FROM jsons j LEFT JOIN jsons_stats s ON s.json_id = j.id ORDER BY j.name").fetchall()
+
+def buscar_escalas(conn, json_id, termo="", limite=TAMANHO_PAGINA, deslocamento=0):
+    """Página de (key, nome, cod) das escalas do arquivo cujo NOME ou COD começa com termo, na ordem do documento; devolve (linhas, total)."""
+    if not (termo and termo.strip()):
+        total = conn.execute("SELECT COUNT(*) FROM escalas WHERE json_id = ?", (json_id,)).fetchone()[0]
+        return conn.execute("SELECT key, nome, cod FROM escalas WHERE json_id = ? ORDER BY posicao LIMIT ? OFFSET ?", (json_id, limite, deslocamento)).fetchall(), total
+    # Uma consulta por prefixo, cada uma no seu índice NOCASE (com OR o SQLite percorria todas as escalas do arquivo); a UNION tira as repetidas.
+    prefixo = _prefixo_like(termo)
+    ids = ("SELECT id FROM escalas WHERE json_id = ? AND nome LIKE ? ESCAPE '\\'"
+           " UNION SELECT id FROM escalas WHERE json_id = ? AND cod LIKE ? ESCAPE '\\'")
+    parametros = (json_id, prefixo, json_id, prefixo)
+    total = conn.execute(f"SELECT COUNT(*) FROM ({ids})", parametros).fetchone()[0]
+    linhas = conn.execute(f"SELECT key, nome, cod FROM escalas WHERE id IN ({ids}) ORDER BY posicao LIMIT ? OFFSET ?", (*parametros, limite, deslocamento)).fetchall()
+    return linhas, total
+
+def _lista_escalas_bruto(conn, json_id):
+    """Nomes das escalas de um arquivo guardado inteiro, com as mensagens de erro de sempre da lista de escalas."""
+    try:
+        escalas = exportar_documento(conn, json_id).get("escalas", [])
+        if not isinstance(escalas, list): return ["ERRO DE FORMATO (escalas não é uma lista)"]
+        return [esc.get("NOME", "Sem nome") for esc in escalas]
+    except Exception: return ["ERRO AO LER JSON"]
+
+def _nome_ausente(dados, formato):
+    """Nome listado para uma escala com a coluna nome vazia: None se ela tem "NOME": null, "Sem nome" se não tem NOME (como esc.get("NOME", "Sem nome"))."""
+    try: escala = decodificar(dados, formato)
+    except ValueError: return "Sem nome"
+    return None if isinstance(escala, dict) and "NOME" in escala else "Sem nome"
+
+def total_lista_escalas(conn, termo=""):
+    """Quantidade de linhas de listar_escalas(), pelas contagens de jsons_stats (um arquivo guardado inteiro rende uma linha)."""
+    return conn.execute("SELECT COALESCE(SUM(CASE WHEN j.data IS NOT NULL THEN 1 ELSE COALESCE(s.n_escalas, 0) END), 0) FROM jsons j LEFT JOIN jsons_stats s ON s.json_id = j.id"
+                        " WHERE j.name LIKE ? ESCAPE '\\'", (_prefixo_like(termo),)).fetchone()[0]
+
+def listar_escalas(conn, termo="", limite=-1, deslocamento=0):
+    """
+    Gera (arquivo, nome da escala) dos arquivos cujo nome começa com termo, em ordem de arquivo e de posição,
+    lendo do banco conforme é consumido. Com limite/deslocamento, os arquivos anteriores à página são pulados
+    inteiros pelas contagens de jsons_stats.
+    """
+    arquivos = conn.execute("SELECT j.id, j.name, j.data IS NOT NULL, COALESCE(s.n_escalas, 0), j.formato FROM jsons j LEFT JOIN jsons_stats s ON s.json_id = j.id"
+                            " WHERE j.name LIKE ? ESCAPE '\\' ORDER BY j.name", (_prefixo_like(termo),)).fetchall()
+    for json_id, nome_arquivo, bruto, n_escalas, formato in arquivos:
+        if limite == 0: return
+        # Um arquivo guardado inteiro não é normalizável (não é dict ou escalas não é lista): sempre rende uma linha,
+        # a mensagem de erro, e só é lido se essa linha cair na página.
+        if bruto: n_escalas = 1
+        if deslocamento >= n_escalas: deslocamento -= n_escalas; continue
+        if bruto: linhas = _lista_escalas_bruto(conn, json_id)[:1]
+        else: linhas = (nome if nome is not None else _nome_ausente(dados, formato) for nome, dados in conn.execute(
+            "SELECT nome, CASE WHEN nome IS NULL THEN dados END FROM escalas WHERE json_id = ? ORDER BY posicao LIMIT ? OFFSET ?", (json_id, limite, deslocamento)))
+        deslocamento = 0
+        for escala in linhas:
+            yield nome_arquivo, escala
+            if limite > 0: limite -= 1
+
+def deduplicar_arquivos(conn):
+    """Regrava, um por transação, os arquivos com jornadas equivalentes repetidas (jornadas.deduplicar_jornadas); devolve quantas jornadas saíram."""
+    removidas = 0
+    repetidas = conn.execute("SELECT DISTINCT json_id FROM jornadas WHERE impressao IS NOT NULL GROUP BY json_id, impressao HAVING COUNT(*) > 1").fetchall()
+    for (json_id,) in repetidas:
+        documento, substituidas = deduplicar_jornadas(exportar_documento(conn, json_id))
+        if not substituidas: continue
+        nome = conn.execute("SELECT name FROM jsons WHERE id = ?", (json_id,)).fetchone()[0]
+        salvar_documento(conn, documento, nome, json_id); removidas += len(substituidas)
+    return removidas
+
+def chaves_escalas(conn, json_id):
+    """Keys de todas as escalas do arquivo (as que têm key), na ordem do documento."""
+    return [row[0] for row in conn.execute("SELECT key FROM escalas WHERE json_id = ? AND key IS NOT NULL ORDER BY posicao", (json_id,))]
+
+# Filtro de escalas por conjunto de keys: a seleção vai como um único array JSON (json_each), sem limite de parâmetros.
+_FILTRO_CHAVES = " AND e.key IN (SELECT value FROM json_each(?))"
+
+def _jornadas_escala(conn, json_id, chaves=None):
+    vinculos = {}
+    consulta = "SELECT ej.escala_id, ej.jornada_key FROM escala_jornada ej JOIN escalas e ON e.id = ej.escala_id WHERE e.json_id = ?"
+    if chaves is not None: consulta += _FILTRO_CHAVES
+    for escala_id, jornada_key in conn.execute(consulta + " ORDER BY ej.escala_id, ej.posicao", (json_id,) if chaves is None else (json_id, chaves)):
+        vinculos.setdefault(escala_id, []).append(jornada_key)
+    return vinculos
+
+def _ler_conteudo(conn, json_id, chaves_escalas=None):
+    """
+    (layout, escalas, coleções) do arquivo, com as escalas decodificadas uma a uma conforme são consumidas e coleções()
+    devolvendo jornadas/horas_adicionais; (None, documento, None) para arquivos brutos; None se o arquivo não existe.
+    Com chaves_escalas (qualquer iterável), só as escalas com essas keys e só as jornadas usadas por elas: as ligadas
+    em escala_jornada e as keys em texto das listas JORNADAS que ficaram no JSON da escala. Por isso, nesse caso,
+    coleções() só pode ser chamada depois de consumidas as escalas.
+    """
+    row = conn.execute("SELECT data, layout, formato FROM jsons WHERE id = ?", (json_id,)).fetchone()
+    if row is None: return None
+    data, layout, formato = row[0], json.loads(row[1]) if row[1] else {"bruto": True}, row[2]
+    if layout.get("bruto"): return (None, decodificar(data, formato), None) if data is not None else None
+    chaves = _compactar(sorted(set(chaves_escalas))) if chaves_escalas is not None else None
+    consulta = "SELECT e.id, e.dados FROM escalas e WHERE e.json_id = ?" + (_FILTRO_CHAVES if chaves is not None else "")
+    vinculos = _jornadas_escala(conn, json_id, chaves)
+    cursor = conn.execute(consulta + " ORDER BY e.posicao", (json_id,) if chaves is None else (json_id, chaves))
+    usadas = set()
+    def escalas():
+        for escala_id, dados in cursor:
+            escala = decodificar(dados, formato)
+            if escala_id in vinculos: escala["JORNADAS"] = vinculos[escala_id]
+            elif chaves is not None and isinstance(escala, dict) and isinstance(escala.get("JORNADAS"), list):
+                usadas.update(k for k in escala["JORNADAS"] if isinstance(k, str))
+            yield escala
+    def colecoes():
+        resultado = {}
+        for chave, tipo in layout["tipos"].items():
+            if chave == "jornadas" and chaves is not None:
+                itens = conn.execute("SELECT j.chave, j.dados FROM jornadas j WHERE j.json_id = ? AND COALESCE(j.chave, j.key) IN (SELECT ej.jornada_key FROM escala_jornada ej"
+                                     " JOIN escalas e ON e.id = ej.escala_id WHERE e.json_id = ?" + _FILTRO_CHAVES + " UNION SELECT value FROM json_each(?)) ORDER BY j.posicao",
+                                     (json_id, json_id, chaves, _compactar(sorted(usadas)))).fetchall()
+            else: itens = conn.execute(f"SELECT chave, dados FROM {chave} WHERE json_id = ? ORDER BY posicao", (json_id,)).fetchall()
+            resultado[chave] = {c: decodificar(d, formato) for c, d in itens} if tipo == "dict" else [decodificar(d, formato) for _, d in itens]
+        return resultado
+    return layout, escalas(), colecoes
+
+def _partes_documento(layout, escalas, colecoes, selecao):
+    """
+    (chave, valor) do documento na ordem de saída, com o iterador das escalas como valor de "escalas". O arquivo inteiro
+    sai na ordem em que foi salvo; uma seleção de escalas sai sempre com escalas, jornadas e horas_adicionais, nessa ordem.
+    """
+    if selecao:
+        yield "escalas", escalas
+        demais = colecoes()
+        yield "jornadas", demais.get("jornadas", {})
+        yield "horas_adicionais", demais["horas_adicionais"] if "horas_adicionais" in demais else layout["extras"].get("horas_adicionais", {})
+        return
+    demais = colecoes()
+    for chave in layout["ordem"]:
+        yield chave, escalas if chave == "escalas" else demais[chave] if chave in demais else layout["extras"][chave]
+
+def exportar_documento(conn, json_id, chaves_escalas=None):
+    """
+    Remonta o documento do arquivo no mesmo formato em que foi salvo; KeyError se o arquivo não existe
+    (um documento salvo como JSON null volta como None).
+    Com chaves_escalas, monta {"escalas", "jornadas", "horas_adicionais"} com só as escalas com essas keys e só as jornadas usadas por elas.
+    """
+    conteudo = _ler_conteudo(conn, json_id, chaves_escalas)
+    if conteudo is None: raise KeyError(json_id)
+    if conteudo[0] is None: return conteudo[1]
+    return {chave: list(valor) if chave == "escalas" else valor for chave, valor in _partes_documento(*conteudo, chaves_escalas is not None)}
+
+def iterar_json(conn, json_id, chaves_escalas=None):
+    """
+    Texto de exportar_json() em partes, uma escala por vez, sem montar o documento nem a string inteira
+    (nada é gerado se o arquivo não existe).
+    """
+    conteudo = _ler_conteudo(conn, json_id, chaves_escalas)
+    if conteudo is None: return
+    if conteudo[0] is None: yield json.dumps(conteudo[1], ensure_ascii=False, indent=4); return
+    vazio = True
+    for chave, valor in _partes_documento(*conteudo, chaves_escalas is not None):
+        yield ("{" if vazio else ",") + "\n    " + json.dumps(chave, ensure_ascii=False) + ": "
+        vazio = False
+        if chave == "escalas":
+            nenhuma = True
+            for escala in valor:
+                yield ("[" if nenhuma else ",") + "\n        " + json.dumps(escala, ensure_ascii=False, indent=4).replace("\n", "\n        ")
+                nenhuma = False
+            yield "[]" if nenhuma else "\n    ]"
+        else: yield json.dumps(valor, ensure_ascii=False, indent=4).replace("\n", "\n    ")
+    yield "{}" if vazio else "\n}"
+
+class CacheDocumentos:
+    """
+    LRU dos documentos já montados, compartilhado por todas as sessões do processo. A chave é (json_id, hash do conteúdo
+    em jsons_stats): um arquivo regravado nunca é servido com o conteúdo antigo. A memória de cada documento é estimada
+    pelo tamanho do JSON compacto em jsons_stats (os objetos Python ocupam ~3x esse texto); ao passar de limite_bytes, sai o menos usado.
+    Objetos derivados de um documento (anexo(), como o índice de tags da edição em lote) ficam na mesma entrada e saem com ele.
+    """
+    FATOR_MEMORIA = 3
+
+    def __init__(self, limite_bytes=256 * 1024 * 1024):
+        self.limite_bytes, self.em_uso = limite_bytes, 0
+        self._itens, self._trava = OrderedDict(), threading.Lock()
+
+    def obter(self, chave):
+        with self._trava:
+            if (item := self._itens.get(chave)) is None: return None
+            self._itens.move_to_end(chave)
+            return item[0]
+
+    def guardar(self, chave, documento, tamanho_json):
+        custo = tamanho_json * self.FATOR_MEMORIA
+        if custo > self.limite_bytes: return
+        with self._trava:
+            if chave in self._itens: self.em_uso -= self._itens.pop(chave)[1]
+            self._itens[chave] = (documento, custo, {}); self.em_uso += custo
+            while self.em_uso > self.limite_bytes: self.em_uso -= self._itens.popitem(last=False)[1][1]
+
+    def anexo(self, chave, nome, criar):
+        """Objeto `nome` derivado do documento em `chave`, criado por criar() uma vez por entrada; sem o documento no cache, só criar()."""
+        with self._trava:
+            if (item := self._itens.get(chave)) is not None and nome in item[2]: return item[2][nome]
+        valor = criar()
+        if item is not None:
+            with self._trava: valor = item[2].setdefault(nome, valor)
+        return valor
+
+    def descartar(self, json_id):
+        with self._trava:
+            for chave in [c for c in self._itens if c[0] == json_id]: self.em_uso -= self._itens.pop(chave)[1]
+
+    def __len__(self): return len(self._itens)
+
+CACHE_DOCUMENTOS = CacheDocumentos()
+
+def carregar_documento_versionado(conn, json_id):
+    """
+    (documento, versão) do arquivo, passando pelo CACHE_DOCUMENTOS: interações seguidas com o mesmo arquivo não
+    remontam o documento. A versão é o hash do conteúdo. O objeto devolvido é compartilhado — copie antes de alterar.
+    KeyError se o arquivo não existe, como em exportar_documento().
+    """
+    conn.execute("BEGIN")  # hash e conteúdo lidos do mesmo instantâneo
+    try:
+        row = conn.execute("SELECT hash, tamanho FROM jsons_stats WHERE json_id = ?", (json_id,)).fetchone()
+        if row is None: return exportar_documento(conn, json_id), None
+        chave = (json_id, row[0])
+        if (documento := CACHE_DOCUMENTOS.obter(chave)) is None:
+            documento = exportar_documento(conn, json_id)
+            if documento is not None: CACHE_DOCUMENTOS.guardar(chave, documento, row[1])
+        return documento, row[0]
+    finally: conn.commit()
+
+def exportar_json(conn, json_id, chaves_escalas=None):
+    """Texto do documento no formato em que os arquivos sempre foram salvos (indent=4, ensure_ascii=False)."""
+    return "".join(iterar_json(conn, json_id, chaves_escalas)) or json.dumps(None)
+
+def recodificar(conn, formato=FORMATO_ATUAL):
+    """Regrava o conteúdo de todos os arquivos no formato indicado, um arquivo por transação; devolve quantos foram convertidos."""
+    convertidos = 0
+    for json_id, data, formato_antigo in conn.execute("SELECT id, data, formato FROM jsons WHERE formato != ?", (formato,)).fetchall():
+        try:
+            with escrita(conn):
+                novo_data = codificar(decodificar(data, formato_antigo), formato) if data is not None else None
+                for tabela in TABELAS_CONTEUDO:
+                    linhas = conn.execute(f"SELECT id, dados FROM {tabela} WHERE json_id = ?", (json_id,)).fetchall()
+                    conn.executemany(f"UPDATE {tabela} SET dados = ? WHERE id = ?", ((codificar(decodificar(d, formato_antigo), formato), i) for i, d in linhas))
+                conn.execute("UPDATE jsons SET data = ?, formato = ? WHERE id = ?", (novo_data, formato, json_id))
+            convertidos += 1
+        except ValueError: pass  # conteúdo ilegível (importado assim ou bloco zlib corrompido): fica como está
+    return convertidos
+
+if __name__ == '__main__':
+    # Uso: python banco.py compactar|deduplicar [caminho do banco]
+    if len(sys.argv) < 2 or sys.argv[1] not in ("compactar", "deduplicar"): sys.exit("Uso: python banco.py compactar|deduplicar [database.db]")
+    caminho = sys.argv[2] if len(sys.argv) > 2 else "database.db"
+    conn = conectar(caminho)
+    inicializar(conn)
+    if sys.argv[1] == "deduplicar": mensagem = f"{deduplicar_arquivos(conn)} jornada(s) repetida(s) removida(s); banco compactado."
+    else: mensagem = f"{recodificar(conn)} arquivo(s) convertido(s) para o formato {FORMATO_ATUAL}; banco compactado."
+    conn.execute("VACUUM"); conn.close()
+    print(mensagem)
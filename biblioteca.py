@@ -0,0 +1,199 @@
+# biblioteca.py (Busca de modelos em biblioteca_escalas.json)
+"""
+Associa descrições de escala aos modelos ("templates") da biblioteca. O índice é montado uma vez: nome
+normalizado -> modelo, para a busca exata, e trigramas -> modelos, que restringem a busca aproximada a
+poucos candidatos antes da pontuação com rapidfuzz. Um candidato só é aceito se tiver a mesma estrutura
+da descrição (dias, ciclos como 12X36 e horários): nomes parecidos com horários diferentes não casam.
+IndiceModelos.carregar() guarda o índice pronto em um snapshot binário ao lado do JSON (ids de jornada
+internados, JORNADAS dos modelos como arrays de inteiros, índices já montados) e só o refaz quando o JSON muda.
+Jornadas equivalentes da biblioteca (mesma jornadas.impressao_jornada, keys diferentes) ficam uma só no índice.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import re
+import unicodedata
+from array import array
+from collections import Counter, namedtuple
+
+from rapidfuzz import fuzz
+
+import padroes
+from jornadas import impressao_jornada
+
+LIMIAR_PADRAO = 85
+MAX_CANDIDATOS = 25
+MAX_CACHE = 50000
+VERSAO_SNAPSHOT = 3
+
+logger = logging.getLogger(__name__)
+
+
+def normalizar_nome(texto):
+    """Maiúsculas sem acentos, sem o código inicial ('0132C ', '0006PA ') e sem pontuação além de ':'."""
+    if not isinstance(texto, str): return ""
+    texto = unicodedata.normalize('NFKD', texto.upper().replace('ª', 'A').replace('º', 'O'))
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return padroes.NAO_ALFANUMERICO.sub(' ', padroes.CODIGO_INICIAL.sub('', texto.strip())).strip()
+
+# Tokenizador da assinatura: classifica a descrição em uma única varredura.
+DIA, INTERVALO_DE_DIAS, HORARIO, SEPARADOR, PALAVRA_CHAVE, PALAVRA = 'DIA', 'INTERVALO_DIAS', 'HORARIO', 'SEPARADOR', 'PALAVRA_CHAVE', 'PALAVRA'
+Token = namedtuple('Token', 'tipo texto inicio fim')
+
+_LETRA = r'[^\W\d_]'
+_DIAS = r'SEGUNDA|SEG|TERÇA|TERCA|TER|QUARTA|QUA|QUINTA|QUI|SEXTA|SEX|SÁBADO|SABADO|SÁB|SAB|DOMINGO|DOM|[2-6][ªA]'
+_DIA = rf'(?<!{_LETRA})(?:{_DIAS})(?!{_LETRA})'
+TOKENIZADOR = re.compile(
+    rf'(?P<{PALAVRA_CHAVE}>\d{{1,2}}\s*X\s*\d{{1,2}}|\((?:IM)?PAR\))'
+    rf'|(?P<{INTERVALO_DE_DIAS}>{_DIA}\s+(?:ATÉ|ATE|A)\s+{_DIA})'
+    rf'|(?P<{DIA}>{_DIA})'
+    rf'|(?P<{HORARIO}>\d{{1,2}}:\d{{2}}|\d{{4}}|\d{{1,2}}H(?!{_LETRA}))'
+    rf'|(?P<{SEPARADOR}>(?<!{_LETRA})(?:ÀS|AS|ATÉ|ATE|A|E)(?!{_LETRA})|[/,\-])'
+    rf'|(?P<{PALAVRA}>{_LETRA}+)'
+)
+
+def tokenizar(texto):
+    """
+    Converte uma descrição (já em maiúsculas) em uma lista de Token(tipo, texto, inicio, fim),
+    em uma única varredura. Tipos: DIA, INTERVALO_DIAS, HORARIO, SEPARADOR, PALAVRA_CHAVE e PALAVRA.
+    Caracteres que não formam nenhum token (espaços, ':' soltos etc.) são ignorados.
+    """
+    if not isinstance(texto, str): return []
+    return [Token(m.lastgroup, m.group(), m.start(), m.end()) for m in TOKENIZADOR.finditer(texto)]
+
+def assinatura(texto):
+    """Estrutura da descrição: dias (como índices 0-6), ciclos (12X36, 6X1...), horários HH:MM e horas como 24H, na ordem em que aparecem."""
+    partes = []
+    for token in tokenizar(texto.upper() if isinstance(texto, str) else texto):
+        if token.tipo == DIA: partes.append(str(padroes.MAPA_DIAS.get(token.texto, token.texto)))
+        elif token.tipo == INTERVALO_DE_DIAS:
+            inicio, fim = padroes.INTERVALO_DIAS.search(token.texto).groups()
+            partes.append(f"{padroes.MAPA_DIAS.get(inicio, inicio)}-{padroes.MAPA_DIAS.get(fim, fim)}")
+        elif token.tipo == PALAVRA_CHAVE: partes.append(padroes.ESPACOS.sub('', token.texto))
+        elif token.tipo == HORARIO and ':' in token.texto: partes.append(token.texto.zfill(5))
+        elif token.tipo == HORARIO and token.texto.endswith('H'): partes.append(token.texto.zfill(3))
+    return tuple(partes)
+
+def _trigramas(nome):
+    nome = f"  {nome} "
+    return {nome[i:i + 3] for i in range(len(nome) - 2)}
+
+
+ModeloEncontrado = namedtuple('ModeloEncontrado', 'nome tipo jornadas pontuacao')
+
+
+class IndiceModelos:
+    """
+    Uso:
+        indice = IndiceModelos.carregar("biblioteca_escalas.json")  # ou IndiceModelos(biblioteca) a partir do dict
+        modelo = indice.buscar("SEG A SEX 08:00 AS 17:00")            # ModeloEncontrado ou None
+        indice.jornada(modelo.jornadas[0])                            # jornada da biblioteca
+        indice.por_impressao.get(impressao_jornada(jornada))          # key da jornada equivalente da biblioteca
+    """
+    def __init__(self, biblioteca, limiar=LIMIAR_PADRAO):
+        self.limiar = limiar
+        modelos = (biblioteca or {}).get("templates", {})
+        # Jornadas internadas pela impressão digital: a primeira key de cada impressão é a canônica e as demais são sinônimos dela.
+        # O id é a posição da key canônica em _chaves_jornadas; as JORNADAS de cada modelo viram um array de ids.
+        self.jornadas, self.por_impressao, self._sinonimos = {}, {}, {}
+        for chave, jornada in (biblioteca or {}).get("jornadas", {}).items():
+            if (impressao := impressao_jornada(jornada)) is not None and impressao in self.por_impressao: self._sinonimos[chave] = self.por_impressao[impressao]; continue
+            if impressao is not None: self.por_impressao[impressao] = chave
+            self.jornadas[chave] = jornada
+        self._chaves_jornadas = list(self.jornadas)
+        ids_jornadas = {chave: i for i, chave in enumerate(self._chaves_jornadas)}
+        ids_jornadas.update((chave, ids_jornadas[canonica]) for chave, canonica in self._sinonimos.items())
+        tipo_id = 'H' if len(self._chaves_jornadas) < 65536 else 'I'
+        self._tipos, ids_tipos = [], {}
+        self._nomes, self._tipo_modelo, self._jornadas_modelo = [], array('H'), []
+        self._normalizados, self._assinaturas, self._exatos, por_trigrama = [], [], {}, {}
+        for nome, modelo in modelos.items():
+            if not isinstance(modelo, dict) or not modelo.get("JORNADAS") or any(k not in ids_jornadas for k in modelo["JORNADAS"]): continue
+            posicao, normalizado = len(self._nomes), normalizar_nome(nome)
+            if (tipo := modelo.get("TIPO")) not in ids_tipos: ids_tipos[tipo] = len(self._tipos); self._tipos.append(tipo)
+            self._nomes.append(nome); self._tipo_modelo.append(ids_tipos[tipo])
+            self._jornadas_modelo.append(array(tipo_id, (ids_jornadas[k] for k in modelo["JORNADAS"])))
+            self._normalizados.append(normalizado); self._assinaturas.append(assinatura(normalizado))
+            self._exatos.setdefault(normalizado, posicao)
+            for trigrama in _trigramas(normalizado): por_trigrama.setdefault(trigrama, []).append(posicao)
+        self._por_trigrama = {trigrama: array('H' if len(self._nomes) < 65536 else 'I', posicoes) for trigrama, posicoes in por_trigrama.items()}
+        self._cache = {}
+
+    # O cache de buscas não vai para o snapshot.
+    def __getstate__(self): return {chave: valor for chave, valor in self.__dict__.items() if chave != "_cache"}
+
+    def __setstate__(self, estado): self.__dict__.update(estado, _cache={})
+
+    @classmethod
+    def carregar(cls, caminho="biblioteca_escalas.json", caminho_snapshot=None, limiar=LIMIAR_PADRAO):
+        """
+        Índice da biblioteca em `caminho`, lido do snapshot (<caminho sem extensão>.snapshot) quando ele corresponde
+        ao JSON: mesmo mtime e tamanho ou, se só o mtime mudou, mesmo sha1. Senão o índice é montado do JSON e o
+        snapshot regravado (sem erro se a pasta não permitir escrita). Um snapshot que não pode ser lido (corrompido,
+        ou gravado por outra versão do código, com classes que não existem mais) também é refeito, com um aviso no logger.
+        """
+        caminho_snapshot = caminho_snapshot or os.path.splitext(caminho)[0] + ".snapshot"
+        info = os.stat(caminho)
+        arquivo, hash_json, conteudo = (info.st_mtime_ns, info.st_size), None, None
+        try:
+            with open(caminho_snapshot, 'rb') as f:
+                cabecalho = pickle.load(f)
+                if cabecalho.get("versao") == VERSAO_SNAPSHOT and cabecalho.get("arquivo") != arquivo:
+                    with open(caminho, 'rb') as j: conteudo = j.read()
+                    hash_json = hashlib.sha1(conteudo).hexdigest()
+                if cabecalho.get("versao") == VERSAO_SNAPSHOT and (cabecalho.get("arquivo") == arquivo or cabecalho.get("hash") == hash_json):
+                    indice = pickle.load(f); indice.limiar = limiar
+                    if hash_json is not None: _gravar_snapshot(caminho_snapshot, {**cabecalho, "arquivo": arquivo}, indice)
+                    return indice
+        except FileNotFoundError: pass
+        except Exception as erro: logger.warning("Snapshot da biblioteca ignorado (%s), o índice será refeito: %s: %s", caminho_snapshot, type(erro).__name__, erro)
+        if conteudo is None:
+            with open(caminho, 'rb') as j: conteudo = j.read()
+        indice = cls(json.loads(conteudo), limiar)
+        _gravar_snapshot(caminho_snapshot, {"versao": VERSAO_SNAPSHOT, "arquivo": arquivo, "hash": hashlib.sha1(conteudo).hexdigest()}, indice)
+        return indice
+
+    def __len__(self): return len(self._nomes)
+
+    def jornada(self, chave): return self.jornadas.get(self._sinonimos.get(chave, chave))
+
+    def _encontrado(self, posicao, pontuacao):
+        chaves = self._chaves_jornadas
+        return ModeloEncontrado(self._nomes[posicao], self._tipos[self._tipo_modelo[posicao]], [chaves[i] for i in self._jornadas_modelo[posicao]], pontuacao)
+    def _buscar(self, normalizado):
+        if (posicao := self._exatos.get(normalizado)) is not None: return posicao, 100.0
+        estrutura = assinatura(normalizado)
+        if not estrutura: return None
+        # Bloqueio: só os modelos com mais trigramas em comum (e a mesma estrutura) são pontuados.
+        comuns = Counter(p for trigrama in _trigramas(normalizado) for p in self._por_trigrama.get(trigrama, ()))
+        melhor = None
+        for posicao, _ in comuns.most_common(MAX_CANDIDATOS):
+            if self._assinaturas[posicao] != estrutura: continue
+            pontuacao = fuzz.token_sort_ratio(normalizado, self._normalizados[posicao], score_cutoff=self.limiar)
+            if pontuacao and (melhor is None or pontuacao > melhor[1]): melhor = (posicao, pontuacao)
+        return melhor
+
+    def buscar(self, descricao):
+        """Modelo equivalente à descrição (ModeloEncontrado, com pontuação 0-100) ou None."""
+        normalizado = normalizar_nome(descricao)
+        if not normalizado: return None
+        if normalizado not in self._cache:
+            if len(self._cache) >= MAX_CACHE: self._cache.clear()
+            self._cache[normalizado] = self._buscar(normalizado)
+        resultado = self._cache[normalizado]
+        return self._encontrado(*resultado) if resultado else None
+
+
+def _gravar_snapshot(caminho_snapshot, cabecalho, indice):
+    """Grava cabeçalho + índice em um arquivo temporário e o troca pelo snapshot de uma vez (leitores nunca veem um arquivo pela metade)."""
+    temporario = f"{caminho_snapshot}.{os.getpid()}.tmp"
+    try:
+        with open(temporario, 'wb') as f:
+            pickle.dump(cabecalho, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(indice, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporario, caminho_snapshot)
+    except OSError:
+        if os.path.exists(temporario): os.remove(temporario)
@@ -0,0 +1,160 @@
+# edicao_em_massa.py (Motor da edição em lote e da duplicação para coligadas)
+"""
+Cada nova escala é descrita como uma sobreposição (posição da escala de origem, campos alterados). Só essa
+lista fica na sessão do Streamlit. O documento completo é montado em materializar(), na hora de salvar, e
+as novas escalas compartilham com a de origem tudo o que não mudou (dsr, JORNADAS etc.).
+executar_lote() aplica um conjunto de regras de substituição a vários arquivos salvos de uma vez: os documentos
+são lidos e preparados em paralelo e todos são gravados em uma única transação.
+"""
+
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from bisect import bisect_left
+
+import banco
+
+
+class IndiceTags:
+    """
+    Índice das escalas de um documento: todas as tags existentes (todas_tags) e, por tag, os valores texto em ordem
+    com as posições das escalas. Cada tag é ordenada na primeira busca; a busca por prefixo vira um intervalo (bisect).
+    """
+    def __init__(self, escalas):
+        self._escalas, self._por_tag = escalas, {}
+        self.todas_tags = sorted({key for esc in escalas for key in esc.keys()})
+
+    def _ordenado(self, tag):
+        if (indice := self._por_tag.get(tag)) is None:
+            pares = sorted((valor, posicao) for posicao, esc in enumerate(self._escalas) if isinstance(valor := esc.get(tag), str))
+            indice = self._por_tag[tag] = ([valor for valor, _ in pares], [posicao for _, posicao in pares])
+        return indice
+
+    def posicoes_com_prefixo(self, tag, prefixo):
+        """Posições (em ordem de documento) das escalas cujo valor texto em `tag` começa com `prefixo`."""
+        valores, posicoes = self._ordenado(tag)
+        inicio = bisect_left(valores, prefixo)
+        # Limite superior: o menor texto maior que todos os que começam com o prefixo (sem os caracteres máximos do fim).
+        limite = prefixo.rstrip(chr(0x10FFFF))
+        fim = bisect_left(valores, limite[:-1] + chr(ord(limite[-1]) + 1)) if limite else len(valores)
+        return sorted(posicoes[inicio:fim])
+
+
+def indice_tags(json_id, versao, escalas):
+    """
+    IndiceTags das escalas do arquivo na versão `versao`, guardado junto com o documento em banco.CACHE_DOCUMENTOS:
+    reaproveitado entre as reexecuções do Streamlit e descartado quando o documento sai do cache.
+    """
+    if versao is None: return IndiceTags(escalas)
+    return banco.CACHE_DOCUMENTOS.anexo((json_id, versao), "indice_tags", lambda: IndiceTags(escalas))
+
+
+def gerar_sobreposicoes(escalas, tag, localizar, substituir, formato_novo_nome, indice=None):
+    """
+    Uma sobreposição (posicao, alteracoes) para cada escala cujo valor em `tag` começa com `localizar`, e a linha
+    de pré-visualização correspondente. Devolve (sobreposicoes, previa). Com `indice` (IndiceTags das mesmas escalas),
+    as escalas vêm da busca por prefixo no índice em vez de uma varredura.
+    """
+    sobreposicoes, previa = [], []
+    if not localizar: return sobreposicoes, previa
+    posicoes = indice.posicoes_com_prefixo(tag, localizar) if indice is not None else range(len(escalas))
+    for posicao in posicoes:
+        esc = escalas[posicao]
+        valor_original = esc.get(tag)
+        if isinstance(valor_original, str) and valor_original.startswith(localizar):
+            novo_valor = substituir + valor_original[len(localizar):]
+            nome_antigo = novo_valor if tag == "NOME" else esc.get("NOME", "")
+            novo_nome = formato_novo_nome.format(nome_antigo=nome_antigo, valor_substituir=substituir)
+            sobreposicoes.append((posicao, {tag: novo_valor, "NOME": novo_nome, "key": uuid.uuid4().hex}))
+            previa.append({"Nome Original": esc.get("NOME"), "Novo Nome": novo_nome, "Tag Original": valor_original, "Tag Proposta": novo_valor})
+    return sobreposicoes, previa
+
+
+def materializar(documento, sobreposicoes):
+    """Documento a salvar: o original (que não é alterado) com as novas escalas no fim, cada uma um dict raso {**origem, **alteracoes}."""
+    escalas = documento.get("escalas", [])
+    return {**documento, "escalas": escalas + [{**escalas[posicao], **alteracoes} for posicao, alteracoes in sobreposicoes]}
+
+
+def aplicar_regras(documento, regras, formato_novo_nome):
+    """
+    Aplica cada regra (tag, localizar, substituir) às escalas originais do documento, como uma pré-visualização
+    por regra, e devolve (documento materializado, quantidade de escalas novas).
+    """
+    escalas = documento.get("escalas", []) if isinstance(documento, dict) else []
+    if not isinstance(escalas, list) or not escalas: return documento, 0
+    indice, sobreposicoes = IndiceTags(escalas), []
+    for tag, localizar, substituir in regras: sobreposicoes += gerar_sobreposicoes(escalas, tag, localizar, substituir, formato_novo_nome, indice=indice)[0]
+    return (materializar(documento, sobreposicoes) if sobreposicoes else documento), len(sobreposicoes)
+
+
+_CONEXAO_PROCESSO = None
+
+def _iniciar_processo_lote(caminho_banco):
+    global _CONEXAO_PROCESSO
+    _CONEXAO_PROCESSO = banco.conectar(caminho_banco)
+
+def _preparar_arquivo(tarefa, conn=None):
+    """
+    Executado no pool (com a conexão do processo) ou, com processos=1, no próprio processo com a conexão `conn`: lê o
+    arquivo, aplica as regras e devolve (json_id, versão lida, escalas novas, linhas_conteudo ou None, erro ou None).
+    Um arquivo ilegível (JSON inválido, conteúdo corrompido...) volta com o erro em texto, sem interromper os demais.
+    """
+    json_id, regras, formato_novo_nome = tarefa
+    if conn is None: conn = _CONEXAO_PROCESSO
+    try:
+        conn.execute("BEGIN")  # hash e conteúdo lidos do mesmo instantâneo
+        try:
+            row = conn.execute("SELECT hash FROM jsons_stats WHERE json_id = ?", (json_id,)).fetchone()
+            documento = banco.exportar_documento(conn, json_id)
+        except KeyError: return json_id, None, 0, None, None  # excluído antes da leitura: nada a gravar
+        finally: conn.commit()
+        documento, novas = aplicar_regras(documento, regras, formato_novo_nome)
+        return json_id, row[0] if row else None, novas, banco.linhas_conteudo(documento) if novas else None, None
+    except Exception as erro:
+        return json_id, None, 0, None, f"{type(erro).__name__}: {erro}"
+
+def executar_lote(caminho_banco, conn, ids_arquivos, regras, formato_novo_nome, sufixo_arquivo_novo=None, processos=None, progresso=None):
+    """
+    Aplica `regras` [(tag, localizar, substituir), ...] a cada arquivo de `ids_arquivos` e grava tudo em uma única
+    transação: se um arquivo mudou ou foi excluído desde a leitura (ValueError) ou um nome novo já existe
+    (sqlite3.IntegrityError), nada é gravado. Arquivos que não puderam ser lidos ficam de fora e são informados.
+    Com `sufixo_arquivo_novo` cada resultado vira um arquivo novo (<nome>_<sufixo>.json); sem ele o arquivo é
+    sobrescrito. A leitura e a preparação das linhas rodam em `processos` processos (None = todos os núcleos;
+    1 = no próprio processo). `progresso(feitos, total)` é chamado a cada arquivo preparado.
+    Devolve (gravados, falhas): [(json_id, nome gravado, escalas novas)] dos arquivos alterados e
+    [(json_id, nome, erro)] dos que não puderam ser lidos.
+    """
+    regras = [tuple(regra) for regra in regras if regra[1]]
+    tarefas = [(json_id, regras, formato_novo_nome) for json_id in ids_arquivos]
+    if not tarefas or not regras: return [], []
+    processos = min(processos or os.cpu_count() or 1, len(tarefas))
+    preparados, erros = [], []
+    if processos == 1:
+        # Conexão de leitura só deste lote, fechada no fim: o processo do Streamlit não guarda conexão em variável global.
+        conexao_leitura = banco.conectar(caminho_banco)
+        resultados = (_preparar_arquivo(tarefa, conexao_leitura) for tarefa in tarefas)
+    else:
+        executor = ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_processo_lote, initargs=(caminho_banco,))
+        resultados = executor.map(_preparar_arquivo, tarefas)
+    try:
+        for feitos, (json_id, versao, novas, linhas, erro) in enumerate(resultados, 1):
+            if erro is not None: erros.append((json_id, erro))
+            elif linhas is not None: preparados.append((json_id, versao, novas, linhas))
+            if progresso: progresso(feitos, len(tarefas))
+    finally:
+        if processos > 1: executor.shutdown()
+        else: conexao_leitura.close()
+    nomes_falhas = dict(conn.execute(f"SELECT id, name FROM jsons WHERE id IN ({','.join('?' * len(erros))})", [e[0] for e in erros]).fetchall()) if erros else {}
+    falhas = [(json_id, nomes_falhas.get(json_id, f"id {json_id}"), erro) for json_id, erro in erros]
+    gravados = []
+    with banco.escrita(conn):
+        for json_id, versao, novas, linhas in preparados:
+            # Nome e versão lidos dentro da transação: arquivo excluído (sem linha) também é conflito.
+            atual = conn.execute("SELECT j.name, s.hash FROM jsons j LEFT JOIN jsons_stats s ON s.json_id = j.id WHERE j.id = ?", (json_id,)).fetchone()
+            if atual is None: raise ValueError(f"O arquivo de id {json_id} foi alterado (excluído) durante o processamento.")
+            if atual[1] != versao: raise ValueError(f"O arquivo '{atual[0]}' foi alterado durante o processamento.")
+            if sufixo_arquivo_novo: nome, destino = atual[0].removesuffix(".json") + f"_{sufixo_arquivo_novo}.json", None
+            else: nome, destino = atual[0], json_id
+            gravados.append((banco.gravar_linhas(conn, linhas, nome, destino), nome, novas))
+    return gravados, falhas
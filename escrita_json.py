@@ -0,0 +1,83 @@
+# escrita_json.py (Gravação incremental dos arquivos de escalas)
+"""
+Escreve o JSON de saída {"escalas": [...], "jornadas": ..., "horas_adicionais": ...} à medida
+que as escalas são geradas, em lotes, sem montar o documento inteiro em memória.
+No modo padrão o arquivo é idêntico ao de json.dump(..., ensure_ascii=False, indent=4);
+no modo compacto não há indentação nem espaços. Registros compactos (registros.Registro) são expandidos
+para o dict completo só aqui, na serialização.
+"""
+
+import json
+import os
+
+from registros import para_json
+
+
+class ArquivoJsonGerado:
+    """Referência ao arquivo já gravado: o conteúdo só é lido (ler) ou interpretado (carregar) quando necessário."""
+    def __init__(self, caminho, total_escalas=0):
+        self.caminho, self.total_escalas = caminho, total_escalas
+
+    @property
+    def nome(self): return os.path.basename(self.caminho)
+
+    @property
+    def tamanho(self): return os.path.getsize(self.caminho)
+
+    def abrir(self): return open(self.caminho, 'rb')
+
+    def ler(self):
+        with self.abrir() as f: return f.read()
+
+    def carregar(self):
+        with open(self.caminho, 'r', encoding='utf-8') as f: return json.load(f)
+
+
+class EscritorJsonIncremental:
+    """
+    Uso:
+        with EscritorJsonIncremental(caminho) as escritor:
+            escritor.adicionar_escala(escala)  # quantas vezes for necessário
+            arquivo = escritor.finalizar(jornadas=..., horas_adicionais=...)
+    """
+    def __init__(self, caminho, compacto=False, tamanho_lote=500):
+        self.caminho, self.compacto, self.tamanho_lote = caminho, compacto, tamanho_lote
+        self.total_escalas, self._lote, self._finalizado = 0, [], False
+        if compacto: self._opcoes, self._ind_escala, self._ind_chave = {"separators": (',', ':'), "default": para_json}, "", ""
+        else: self._opcoes, self._ind_escala, self._ind_chave = {"indent": 4, "default": para_json}, "\n        ", "\n    "
+        self._arquivo = open(caminho, 'w', encoding='utf-8')
+        self._arquivo.write('{"escalas":[' if compacto else '{' + self._ind_chave + '"escalas": [')
+
+    def _serializar(self, valor, indentacao):
+        texto = json.dumps(valor, ensure_ascii=False, **self._opcoes)
+        return texto.replace("\n", indentacao) if indentacao else texto
+
+    def _descarregar(self):
+        if not self._lote: return
+        prefixo = "," if self.total_escalas > len(self._lote) else ""
+        self._arquivo.write(prefixo + self._ind_escala + ("," + self._ind_escala).join(self._lote))
+        self._lote = []
+
+    def adicionar_escala(self, escala):
+        self._lote.append(self._serializar(escala, self._ind_escala))
+        self.total_escalas += 1
+        if len(self._lote) >= self.tamanho_lote: self._descarregar()
+
+    def finalizar(self, **demais_chaves):
+        """Fecha a lista de escalas, grava as demais chaves na ordem recebida e devolve um ArquivoJsonGerado."""
+        self._descarregar()
+        self._arquivo.write(self._ind_chave + "]" if self.total_escalas and not self.compacto else "]")
+        dois_pontos = ":" if self.compacto else ": "
+        for chave, valor in demais_chaves.items():
+            self._arquivo.write("," + self._ind_chave + json.dumps(chave, ensure_ascii=False) + dois_pontos + self._serializar(valor, self._ind_chave))
+        self._arquivo.write("}" if self.compacto else "\n}")
+        self._arquivo.close(); self._finalizado = True
+        return ArquivoJsonGerado(self.caminho, self.total_escalas)
+
+    def __enter__(self): return self
+
+    def __exit__(self, tipo_erro, erro, tb):
+        if not self._finalizado:
+            self._arquivo.close()
+            if tipo_erro is not None and os.path.exists(self.caminho): os.remove(self.caminho)
+        return False
@@ -1,7 +1,10 @@
+import numpy as np
 import pandas as pd
-import json
-import re
 import uuid
+import padroes
+from escrita_json import EscritorJsonIncremental
+from jornadas import duracao_expediente, impressao_jornada
+from registros import CAMPOS_JORNADA, PADRAO_ESCALA, PADRAO_JORNADA, Modelo
 
 def generate_key():
     """Gera uma chave hexadecimal de 24 caracteres para identificadores únicos."""
@@ -21,7 +24,7 @@ def format_time_hh_mm_to_hhmm(time_hh_mm_str):
     if time_hh_mm_str is None:
         return ""
     # Remove qualquer caracter que não seja dígito, garantindo apenas HHMM
-    return re.sub(r'[^0-9]', '', str(time_hh_mm_str))
+    return padroes.NAO_DIGITO.sub('', str(time_hh_mm_str))
 
 def standardize_time_range(time_range_str):
     """
@@ -32,7 +35,7 @@ def standardize_time_range(time_range_str):
     if time_range_str is None:
         return ""
     # Remove espaços extras, converte para maiúsculas, substitui '-' e 'ÀS' por 'AS'
-    return re.sub(r'\s+', '', time_range_str).replace('-', 'AS').replace('ÀS', 'AS').upper()
+    return padroes.ESPACOS.sub('', time_range_str).replace('-', 'AS').replace('ÀS', 'AS').upper()
 
 def parse_time_punches(punch_times_str):
     """
@@ -41,7 +44,7 @@ def parse_time_punches(punch_times_str):
     Assume que batidas são pares (entrada, saída, entrada, saída...).
     """
     # Encontra todas as ocorrências de HH:MM ou HHMM e as converte para HH:MM
-    raw_punches = re.findall(r'(\d{2}:?\d{2})', punch_times_str.replace(' ', ''))
+    raw_punches = padroes.HORARIO_HHMM.findall(punch_times_str.replace(' ', ''))
     punches_hh_mm = [format_time_hhmm_to_hh_mm(p) for p in raw_punches]
     
     contractual_hours = punches_hh_mm
@@ -121,9 +124,9 @@ def parse_simple_time_range(time_range_str):
     batida_automatica = []
 
     # Verifica se há um intervalo de almoço explícito (ex: E 1200AS1300 ou E 1200-1300)
-    match_interval = re.match(r'(.+?)E(\d{2}:?\d{2})AS(\d{2}:?\d{2})$', time_range_str_std)
+    match_interval = padroes.INTERVALO_EXPLICITO_AS.match(time_range_str_std)
     if not match_interval:
-        match_interval = re.match(r'(.+?)E(\d{2}:?\d{2})-(\d{2}:?\d{2})$', time_range_str_std)
+        match_interval = padroes.INTERVALO_EXPLICITO_HIFEN.match(time_range_str_std)
 
     if match_interval:
         main_range_str = match_interval.group(1).strip()
@@ -135,7 +138,7 @@ def parse_simple_time_range(time_range_str):
         
         batida_automatica = [interval_start_hhmm, interval_end_hhmm]
 
-        parts = re.split(r'AS', main_range_str)
+        parts = padroes.SEPARADOR_AS.split(main_range_str)
         if len(parts) == 2:
             start_time_raw = parts[0].strip()
             end_time_raw = parts[1].strip()
@@ -179,18 +182,19 @@ def parse_simple_time_range(time_range_str):
     
     # Se não houver intervalo explícito, tenta inferir um intervalo padrão (12:00-13:00)
     # SOMENTE se o range de trabalho abranger esse intervalo E não for um turno noturno.
-    parts = re.split(r'AS', time_range_str_std)
+    parts = padroes.SEPARADOR_AS.split(time_range_str_std)
     if len(parts) == 2:
         start_time_raw = parts[0].strip()
         end_time_raw = parts[1].strip()
 
         start_time_hhmm = format_time_hh_mm_to_hhmm(start_time_raw)
         end_time_hhmm = format_time_hh_mm_to_hhmm(end_time_raw)
+        start_time, end_time = int(start_time_hhmm), int(end_time_hhmm) # Convertidos uma única vez para as comparações abaixo
         
         should_insert_default_interval = False
         # Condição para turnos que não cruzam a meia-noite
-        if int(start_time_hhmm) < int(end_time_hhmm):
-            if int(start_time_hhmm) <= 1200 and int(end_time_hhmm) >= 1300:
+        if start_time < end_time:
+            if start_time <= 1200 and end_time >= 1300:
                 should_insert_default_interval = True
         
         if should_insert_default_interval:
@@ -223,7 +227,7 @@ def parse_simple_time_range(time_range_str):
             ]
 
         # Lidar com turnos que cruzam a meia-noite (e.g., 1900 AS 0700)
-        if int(start_time_hhmm) > int(end_time_hhmm):
+        if start_time > end_time:
             periods[-1]["TM_HORA_FIM"] = "2400" # Último período de expediente vai até meia-noite
             periods.append({
                 "TM_HORA_INICIO": "0000",
@@ -285,6 +289,12 @@ def get_day_indices(day_str):
             
     return sorted(list(set(indices))) # Garante índices únicos e ordenados
 
+# Escalas e jornadas são registros compactos (registros.Modelo): os campos padrão ficam no modelo e só são
+# escritos por extenso na serialização. PREASSINALA_SOMENTE_BATIDAS_PARES e batida_automatica variam aqui.
+ESCALA = Modelo("EscalaGerenciador", ("NOME", "DESC_ESCALA", "COD", "carga_horaria", "tipo_escala", "TIPO", "JORNADAS", *(campo for campo in PADRAO_ESCALA if campo != "tipo_escala"), "key"), PADRAO_ESCALA)
+_PADRAO_JORNADA = {campo: valor for campo, valor in PADRAO_JORNADA.items() if campo not in ("PREASSINALA_SOMENTE_BATIDAS_PARES", "batida_automatica")}
+JORNADA = Modelo("JornadaGerenciador", CAMPOS_JORNADA, _PADRAO_JORNADA)
+
 def create_jornada_object(nome_jornada_raw):
     """
     Cria um objeto de jornada com base no nome do horário.
@@ -292,7 +302,8 @@ def create_jornada_object(nome_jornada_raw):
     """
     # Verifica se a string de entrada parece uma sequência de batidas (ex: "08:00 12:00 14:00 18:00")
     # A presença de mais de duas ocorrências de horário sem 'AS' sugere batidas.
-    if len(re.findall(r'(\d{2}:?\d{2})', nome_jornada_raw.replace(' ', ''))) > 2 and 'AS' not in nome_jornada_raw.upper():
+    # Os horários são contados no texto sem espaços ("08 00 12 00" conta dois) e 'AS' vale em qualquer posição ("08:00AS17:00").
+    if len(padroes.HORARIO_HHMM.findall(nome_jornada_raw.replace(' ', ''))) > 2 and 'AS' not in nome_jornada_raw.upper():
         contractual_hours, periods, batida_automatica = parse_time_punches(nome_jornada_raw)
         nome_jornada_display = ' '.join(contractual_hours) if contractual_hours else nome_jornada_raw
     else:
@@ -307,29 +318,30 @@ def create_jornada_object(nome_jornada_raw):
             nome_jornada_display = nome_jornada_raw
 
 
-    return {
-        "NOME_JORNADA": nome_jornada_display,
-        "DESC_JORNADA": "",
-        "HORAS_CONTRATUAIS": contractual_hours,
-        "TRATAMENTO_EXPEDIENTE_EXTRA": "",
-        "TRATAMENTO_ADICIONAL_PARA_PERIODO_DO_DIA": "",
-        "FL_HORA_COMPENSAVEL": "1",
-        "FL_ADICIONAL_NOTURNO_SOBRE_EXTRA": "",
-        "FL_FATOR_POSTERIOR": "1",
-        "FL_TRATAMENTO_CARGA_INFERIOR": "FALTA",
-        "FL_TRATAMENTO_CARGA_SUPERIOR": "Hora Extra 50%",
-        "PREASSINALA_SOMENTE_BATIDAS_PARES": bool(batida_automatica), # True se houver batidas automáticas
-        "batida_automatica": batida_automatica,
-        "PERIODOS": periods,
-        "key": generate_key(),
-        "HORAS_CONTRATUAIS_INTERVALO_EXTRA": ["", ""] # Mantido como vazio conforme exemplo original
-    }
+    return JORNADA.criar(NOME_JORNADA=nome_jornada_display, HORAS_CONTRATUAIS=contractual_hours,
+                         PREASSINALA_SOMENTE_BATIDAS_PARES=bool(batida_automatica), # True se houver batidas automáticas
+                         batida_automatica=batida_automatica, PERIODOS=periods, key=generate_key())
 
-def process_schedule_description(description, jornada_mapping, all_jornadas):
+def obter_jornada(time_range, jornada_mapping, all_jornadas, por_impressao=None):
+    """
+    Key da jornada do horário, criando-a se for preciso. jornada_mapping guarda o horário padronizado -> key; com
+    por_impressao (impressão digital -> key, jornadas.impressao_jornada), um horário escrito de outro jeito que gere
+    uma jornada equivalente (mesmas horas, períodos e flags) reaproveita a que já existe.
+    """
+    standardized_time = standardize_time_range(time_range)
+    if standardized_time not in jornada_mapping:
+        new_jornada = create_jornada_object(time_range)
+        if por_impressao is None: key = new_jornada['key']
+        elif (key := por_impressao.get(impressao := impressao_jornada(new_jornada))) is None: key = por_impressao[impressao] = new_jornada['key']
+        if key == new_jornada['key']: all_jornadas[key] = new_jornada
+        jornada_mapping[standardized_time] = key
+    return jornada_mapping[standardized_time]
+
+def process_schedule_description(description, jornada_mapping, all_jornadas, por_impressao=None):
     """
     Processa a descrição da escala de trabalho para determinar o array de jornadas
     para a semana e o tipo da escala.
-    Atualiza os dicionários de mapeamento e definições de jornadas.
+    Atualiza os dicionários de mapeamento e definições de jornadas (e por_impressao, se informado: ver obter_jornada).
     """
     description_upper = description.upper() # Use this for case-insensitive checks
     jornadas_semanais = ["ID_FOLGA"] * 7 # Inicializa com "ID_FOLGA" para todos os dias
@@ -337,20 +349,13 @@ def process_schedule_description(description, jornada_mapping, all_jornadas):
 
     # --- Start of Cycle Fixed Scale Detection ---
     # Verifica palavras-chave de ciclo fixo primeiro e retorna para evitar conflitos
-    if re.search(r'12\s*X\s*36', description_upper): # Catches "12X36", "12 X 36", etc.
+    if padroes.CICLO_12X36.search(description_upper): # Catches "12X36", "12 X 36", etc.
         scale_type = "12X36"
         # Regex para extrair o horário após "12 X 36 -" ou "12X36 -"
-        match_time = re.search(r'12\s*X\s*36\s*-\s*([0-9:\sASÀS-]+)', description_upper)
+        match_time = padroes.HORARIO_CICLO_12X36.search(description_upper)
         time_range = match_time.group(1).strip() if match_time else "00:00 AS 00:00" # Default if not found
         
-        standardized_time = standardize_time_range(time_range)
-        
-        if standardized_time not in jornada_mapping:
-            new_jornada = create_jornada_object(time_range)
-            jornada_mapping[standardized_time] = new_jornada['key']
-            all_jornadas[new_jornada['key']] = new_jornada
-        
-        jornada_key = jornada_mapping[standardized_time]
+        jornada_key = obter_jornada(time_range, jornada_mapping, all_jornadas, por_impressao)
         
         # Padrão para 12x36: dia de trabalho e dia de folga alternados.
         # Considerando um ciclo que se repete ao longo da semana.
@@ -368,20 +373,13 @@ def process_schedule_description(description, jornada_mapping, all_jornadas):
         _ensure_special_jornadas_exist(all_jornadas)
         return jornadas_semanais, scale_type
 
-    elif re.search(r'6\s*X\s*1', description_upper): # Catches "6X1", "6 X 1", etc.
+    elif padroes.CICLO_6X1.search(description_upper): # Catches "6X1", "6 X 1", etc.
         scale_type = "6X1"
         # Regex para extrair o horário após "6X1 -"
-        match_time = re.search(r'6\s*X\s*1\s*-\s*([0-9:\sASÀS-]+)', description_upper)
+        match_time = padroes.HORARIO_CICLO_6X1.search(description_upper)
         time_range = match_time.group(1).strip() if match_time else "00:00 AS 00:00" # Default if not found
         
-        standardized_time = standardize_time_range(time_range)
-        
-        if standardized_time not in jornada_mapping:
-            new_jornada = create_jornada_object(time_range)
-            jornada_mapping[standardized_time] = new_jornada['key']
-            all_jornadas[new_jornada['key']] = new_jornada
-        
-        jornada_key = jornada_mapping[standardized_time]
+        jornada_key = obter_jornada(time_range, jornada_mapping, all_jornadas, por_impressao)
         jornadas_semanais = [jornada_key] * 6 + ["ID_DSR"] # 6 dias de trabalho, 1 DSR
         
         # Garante que DSR e FOLGA existem
@@ -395,16 +393,8 @@ def process_schedule_description(description, jornada_mapping, all_jornadas):
         # e depois uma parte que se assemelha a horários.
         # Ela é projetada para ser flexível e capturar múltiplos blocos "DIAS HORÁRIOS"
         # mesmo sem um "E" explícito entre eles, como em "SEG A QUI 08:00 AS 18:00 SEX 08:00:00 AS 17:00:00"
-        segment_parser_regex = re.compile(
-            r'([A-ZÀÁÂÃÄÈÉÊËÌÍÎÏÒÓÔÕÖÙÚÛÜÇ\s,]+?)'  # Group 1: Dias (non-greedy)
-            r'(?:\s*-\s*|\s+)'  # Separador opcional ' - ' ou apenas espaço
-            r'('  # Início do Grupo 2: Parte dos horários
-            r'(?:\d{2}:?\d{2}'  # Início de um horário (HHMM ou HH:MM)
-            r'(?:\s*(?:AS|ÀS|\-)?\s*\d{2}:?\d{2})*'  # Continuação de um range ou mais batidas
-            r')' # Fecha o grupo da sequência de horários
-            r'(?:\s+E\s+\d{2}:?\d{2}(?:AS|\-)\d{2}:?\d{2})?' # Possível intervalo explícito no final
-            r')' # Fim do Grupo 2: Parte dos horários
-        )
+        # (a regex compilada fica em padroes.SEGMENTO_DIAS_HORARIOS)
+        segment_parser_regex = padroes.SEGMENTO_DIAS_HORARIOS
         
         # Inicializa jornadas semanais com FOLGA para todos os 7 dias
         jornadas_semanais = ["ID_FOLGA"] * 7
@@ -423,16 +413,10 @@ def process_schedule_description(description, jornada_mapping, all_jornadas):
             # Decide se a jornada é de FOLGA ou uma jornada de trabalho com base nos horários
             # Se a parte dos horários capturada for vazia, ou não parecer um horário válido,
             # então é um dia de FOLGA.
-            if not times_part_raw or not re.search(r'\d{2}:?\d{2}', times_part_raw): 
+            if not times_part_raw or not padroes.HORARIO_HHMM.search(times_part_raw): 
                 current_jornada_key = "ID_FOLGA"
             else:
-                standardized_time = standardize_time_range(times_part_raw)
-                if standardized_time not in jornada_mapping:
-                    # Cria uma nova jornada se não existir mapeamento para esse horário
-                    new_jornada = create_jornada_object(times_part_raw)
-                    jornada_mapping[standardized_time] = new_jornada['key']
-                    all_jornadas[new_jornada['key']] = new_jornada
-                current_jornada_key = jornada_mapping[standardized_time]
+                current_jornada_key = obter_jornada(times_part_raw, jornada_mapping, all_jornadas, por_impressao)
             
             # Atribui a chave da jornada aos dias correspondentes na semana
             for idx in day_indices:
@@ -446,7 +430,7 @@ def process_schedule_description(description, jornada_mapping, all_jornadas):
         remaining_description = description_upper[last_match_end:].strip()
         if remaining_description:
             # Tenta encontrar padrões de dias sem horários (ex: "SABADO", "DOMINGO")
-            remaining_days_match = re.search(r'([A-ZÀÁÂÃÄÈÉÊËÌÍÎÏÒÓÔÕÖÙÚÛÜÇ\s,]+)', remaining_description)
+            remaining_days_match = padroes.DIAS_SEM_HORARIO.search(remaining_description)
             if remaining_days_match:
                 days_part_remaining = remaining_days_match.group(1).strip()
                 day_indices_remaining = get_day_indices(days_part_remaining)
@@ -492,45 +476,44 @@ def _ensure_special_jornadas_exist(all_jornadas_definitions):
         }
 
 
-def calculate_carga_horaria(jornadas_list, all_jornadas_definitions):
+JORNADAS_SEM_EXPEDIENTE = ("ID_DSR", "ID_FOLGA")
+TAMANHO_BLOCO = 5000
+
+def _duracao_jornada(jornada_key, all_jornadas_definitions, duracoes):
+    """Minutos de expediente da jornada, guardados em duracoes (key -> minutos) na primeira vez; DSR, FOLGA e keys desconhecidas valem 0."""
+    if jornada_key in duracoes: return duracoes[jornada_key]
+    if jornada_key not in all_jornadas_definitions: return 0
+    duracao = 0 if jornada_key in JORNADAS_SEM_EXPEDIENTE else duracao_expediente(all_jornadas_definitions[jornada_key])
+    duracoes[jornada_key] = duracao
+    return duracao
+
+def _horas_arredondadas(total_minutes):
+    """round(total_minutes / 60) sobre um array NumPy de inteiros (.5 vai para o par, como em round)."""
+    horas, resto = np.divmod(total_minutes, 60)
+    return horas + ((resto > 30) | ((resto == 30) & (horas % 2 == 1)))
+
+def calculate_carga_horaria(jornadas_list, all_jornadas_definitions, duracoes=None):
     """
     Calcula a carga horária total da semana em minutos e converte para horas.
-    Considera apenas os períodos de 'Expediente'.
+    Considera apenas os períodos de 'Expediente'. É calculate_cargas_horarias com uma única escala.
     """
-    total_minutes = 0
-    for jornada_key in jornadas_list:
-        # Apenas calcula se a chave da jornada é uma jornada válida (não DSR ou FOLGA)
-        if jornada_key in all_jornadas_definitions and jornada_key not in ["ID_DSR", "ID_FOLGA"]:
-            jornada = all_jornadas_definitions[jornada_key]
-            
-            for period in jornada.get('PERIODOS', []):
-                if period.get('DESC_TIPO_HORA') == 'Expediente':
-                    try:
-                        # Converte 'HHMM' para minutos
-                        start_time_str = period['TM_HORA_INICIO']
-                        end_time_str = period['TM_HORA_FIM']
-
-                        if not start_time_str or not end_time_str:
-                            continue # Pula se o horário estiver faltando ou mal formatado
-
-                        start_hour = int(start_time_str[:2])
-                        start_minute = int(start_time_str[2:])
-                        end_hour = int(end_time_str[:2])
-                        end_minute = int(end_time_str[2:])
-                        
-                        duration_minutes = (end_hour * 60 + end_minute) - (start_hour * 60 + start_minute)
-                        
-                        # Lidar com períodos que cruzam a meia-noite (duração negativa)
-                        if duration_minutes < 0:
-                            duration_minutes += 24 * 60 # Adiciona 24 horas em minutos para turnos noturnos
-                        
-                        total_minutes += duration_minutes
-                    except ValueError as ve:
-                        print(f"Erro ao analisar horário no período: {period} - {ve}")
-                        continue
-    
-    # Retorna a carga horária em horas (arredondado para o inteiro mais próximo)
-    return str(round(total_minutes / 60))
+    return calculate_cargas_horarias([jornadas_list], all_jornadas_definitions, duracoes)[0]
+
+def calculate_cargas_horarias(listas_jornadas, all_jornadas_definitions, duracoes=None):
+    """
+    Carga horária semanal (horas, arredondadas como em round) de várias escalas de uma vez, a partir dos períodos de
+    'Expediente': as jornadas viram ids, as durações um array NumPy e a carga de cada escala a soma das durações dos
+    seus ids (np.bincount). Com duracoes (dict reaproveitado entre chamadas), a duração de cada jornada é calculada uma
+    única vez. Devolve uma lista de strings na ordem recebida.
+    """
+    duracoes = {} if duracoes is None else duracoes
+    ids = {}
+    tamanhos = np.fromiter(map(len, listas_jornadas), dtype=np.intp, count=len(listas_jornadas))
+    indices = np.fromiter((ids.setdefault(jornada_key, len(ids)) for jornadas_list in listas_jornadas for jornada_key in jornadas_list), dtype=np.intp, count=int(tamanhos.sum()))
+    duracao = np.fromiter((_duracao_jornada(jornada_key, all_jornadas_definitions, duracoes) for jornada_key in ids), dtype=np.int64, count=len(ids))
+    # Soma por escala: cada posição de `indices` pertence à escala repetida tamanhos[i] vezes (somas inteiras, exatas em float64).
+    totais = np.bincount(np.repeat(np.arange(len(listas_jornadas)), tamanhos), weights=duracao[indices], minlength=len(listas_jornadas)).astype(np.int64)
+    return [str(horas) for horas in _horas_arredondadas(totais).tolist()]
 
 
 def main():
@@ -558,62 +541,53 @@ def main():
             print(f"Erro fatal ao ler CSV sem cabeçalho: {e}. Por favor, verifique o formato do arquivo de entrada.")
             return
 
-    all_scales = []
     all_jornadas_definitions = {} # Dicionário para armazenar todas as definições de jornadas por key
     jornada_mapping = {} # Mapeia string de horário padronizada para a key da jornada (para evitar duplicatas)
-
-    for index, row in df.iterrows():
-        cod = str(row['CODIGO'])
-        nome_escala = str(row['NOME_DA_ESCALA'])
-        descricao_estrutura = str(row['DESCRICAO_DA_ESTRUTURA'])
-        
-        # Debug: print(f"Processing scale: COD={cod}, NOME='{nome_escala}', DESC='{descricao_estrutura}'")
-
-        jornadas_for_scale, tipo_escala = process_schedule_description(
-            descricao_estrutura, jornada_mapping, all_jornadas_definitions
-        )
-        
-        carga_horaria = calculate_carga_horaria(jornadas_for_scale, all_jornadas_definitions)
-
-        scale_obj = {
-            "NOME": nome_escala,
-            "DESC_ESCALA": descricao_estrutura, # Mantém a descrição original aqui
-            "COD": cod,
-            "carga_horaria": carga_horaria,
-            "tipo_escala": "", # Este campo pode ser populado com lógica adicional se houver tipos além de SEMANAL, 6X1, 12X36
-            "TIPO": tipo_escala,
-            "JORNADAS": jornadas_for_scale,
-            "dsr": { "ativo": "1", "dia_completo": "1", "desconto_valor_falta": "1", "apuracao": { "semanal": "1" } },
-            "TIPO_HORA_ADICIONAL": "",
-            "TIPO_HORA_ADICIONAL_NOTURNO": "",
-            "COD_ADICIONAL_NOTURNO": "",
-            "excedente_apuracao_semanal": "",
-            "deficit_apuracao_semanal": "",
-            "excedente_apuracao_mensal": "",
-            "deficit_apuracao_mensal": "",
-            "key": generate_key()
+    jornadas_por_impressao = {} # Mapeia a impressão digital da jornada para a key (horários diferentes, mesma jornada)
+    used_jornada_keys = set() # Jornadas efetivamente usadas pelas escalas já gravadas
+    duracoes = {} # Minutos de expediente por key de jornada, calculados uma vez (calculate_cargas_horarias)
+
+    # As escalas são gravadas no arquivo à medida que são processadas, em blocos de TAMANHO_BLOCO linhas cuja carga
+    # horária é calculada de uma vez; só as jornadas ficam em memória
+    with EscritorJsonIncremental(output_json_file) as escritor:
+        for inicio_bloco in range(0, len(df), TAMANHO_BLOCO):
+            bloco = []
+            for index, row in df.iloc[inicio_bloco:inicio_bloco + TAMANHO_BLOCO].iterrows():
+                cod = str(row['CODIGO'])
+                nome_escala = str(row['NOME_DA_ESCALA'])
+                descricao_estrutura = str(row['DESCRICAO_DA_ESTRUTURA'])
+
+                # Debug: print(f"Processing scale: COD={cod}, NOME='{nome_escala}', DESC='{descricao_estrutura}'")
+
+                jornadas_for_scale, tipo_escala = process_schedule_description(
+                    descricao_estrutura, jornada_mapping, all_jornadas_definitions, jornadas_por_impressao
+                )
+
+                bloco.append(ESCALA.criar(
+                    NOME=nome_escala,
+                    DESC_ESCALA=descricao_estrutura, # Mantém a descrição original aqui
+                    COD=cod,
+                    TIPO=tipo_escala,
+                    JORNADAS=jornadas_for_scale,
+                    key=generate_key()
+                ))
+
+            cargas = calculate_cargas_horarias([scale_obj['JORNADAS'] for scale_obj in bloco], all_jornadas_definitions, duracoes)
+            for scale_obj, carga_horaria in zip(bloco, cargas):
+                scale_obj['carga_horaria'] = carga_horaria
+                escritor.adicionar_escala(scale_obj)
+                used_jornada_keys.update(scale_obj['JORNADAS'])
+
+        # Filtra as jornadas para incluir apenas aquelas que foram efetivamente usadas
+        filtered_jornadas = {
+            key: value for key, value in all_jornadas_definitions.items()
+            if key in used_jornada_keys
         }
-        all_scales.append(scale_obj)
-
-    # Filtra as jornadas para incluir apenas aquelas que foram efetivamente usadas
-    used_jornada_keys = set()
-    for scale in all_scales:
-        for jornada_key in scale['JORNADAS']:
-            used_jornada_keys.add(jornada_key)
-
-    filtered_jornadas = {
-        key: value for key, value in all_jornadas_definitions.items()
-        if key in used_jornada_keys
-    }
 
-    output_data = {
-        "escalas": all_scales,
-        "jornadas": list(filtered_jornadas.values()), # Converte para lista de objetos JSON
-        "horas_adicionais": [] # Assumindo que este bloco estará vazio com base no prompt
-    }
-
-    with open(output_json_file, 'w', encoding='utf-8') as f:
-        json.dump(output_data, f, ensure_ascii=False, indent=4)
+        escritor.finalizar(
+            jornadas=list(filtered_jornadas.values()), # Converte para lista de objetos JSON
+            horas_adicionais=[] # Assumindo que este bloco estará vazio com base no prompt
+        )
 
     print(f"Arquivo '{output_json_file}' gerado com sucesso!")
 
@@ -0,0 +1,95 @@
+# jornadas.py (Impressão digital canônica de jornadas)
+"""
+Duas jornadas são equivalentes quando têm os mesmos horários contratuais, períodos e flags, mesmo com key,
+NOME_JORNADA ou DESC_JORNADA diferentes. impressao_jornada() resume esse conteúdo em um hash curto, usado
+como chave de índice pelos geradores (processador, gerenciador_escalas_final), pela biblioteca de modelos e
+pela tabela jornadas do banco.
+Para a carga horária, os períodos de Expediente viram intervalos inteiros em minutos do dia (intervalos_expediente),
+com a virada da meia-noite já resolvida; duracao_expediente() é a soma deles, guardada pelos geradores uma vez por jornada.
+"""
+
+import hashlib
+import json
+import logging
+from array import array
+from collections.abc import Mapping
+
+import padroes
+
+CAMPOS_IGNORADOS = frozenset(("key", "NOME_JORNADA", "DESC_JORNADA"))
+CAMPOS_HORARIO = frozenset(("HORAS_CONTRATUAIS", "HORAS_CONTRATUAIS_INTERVALO_EXTRA", "batida_automatica", "TM_HORA_INICIO", "TM_HORA_FIM"))
+_VAZIOS = ("", None, [], {})
+MINUTOS_DIA = 24 * 60
+
+logger = logging.getLogger(__name__)
+
+
+def _canonico(valor, horario=False):
+    """Forma canônica: horários como HHMM, booleanos como '1'/'', números como texto e campos vazios descartados."""
+    if isinstance(valor, dict):
+        canonico = {}
+        for chave in sorted(valor):
+            if (item := _canonico(valor[chave], chave in CAMPOS_HORARIO)) not in _VAZIOS: canonico[chave] = item
+        return canonico
+    if isinstance(valor, (list, tuple)): return [_canonico(item, horario) for item in valor]
+    if isinstance(valor, bool): return "1" if valor else ""
+    if isinstance(valor, (int, float)): return str(valor)
+    if isinstance(valor, str):
+        valor = valor.strip()
+        return padroes.NAO_DIGITO.sub('', valor).zfill(4) if horario and padroes.HORARIO_OPCIONAL_DOIS_PONTOS.fullmatch(valor) else valor
+    return valor
+
+def impressao_jornada(jornada):
+    """Hash (24 caracteres hex) do conteúdo canônico da jornada, sem key e nomes; None se não for um dict (ou registros.Registro)."""
+    if not isinstance(jornada, Mapping): return None
+    conteudo = _canonico({chave: valor for chave, valor in jornada.items() if chave not in CAMPOS_IGNORADOS})
+    return hashlib.blake2b(json.dumps(conteudo, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), digest_size=12).hexdigest()
+
+def deduplicar_jornadas(documento):
+    """
+    Documento com uma única jornada por impressão digital (a primeira de cada uma) e as JORNADAS das escalas
+    apontando para ela. Devolve (documento, {key removida: key mantida}); o original não é alterado.
+    """
+    jornadas = documento.get("jornadas") if isinstance(documento, dict) else None
+    if not isinstance(jornadas, (dict, list)): return documento, {}
+    itens = jornadas.items() if isinstance(jornadas, dict) else ((j.get("key") if isinstance(j, dict) else None, j) for j in jornadas)
+    mantidas, por_impressao, substituidas = [], {}, {}
+    for chave, jornada in itens:
+        impressao = impressao_jornada(jornada) if chave is not None else None
+        if impressao is not None and impressao in por_impressao: substituidas[chave] = por_impressao[impressao]; continue
+        if impressao is not None: por_impressao[impressao] = chave
+        mantidas.append((chave, jornada))
+    if not substituidas: return documento, {}
+    escalas = []
+    for escala in documento.get("escalas", []):
+        chaves = escala.get("JORNADAS") if isinstance(escala, dict) else None
+        if isinstance(chaves, list) and any(isinstance(k, str) and k in substituidas for k in chaves):
+            escala = {**escala, "JORNADAS": [substituidas.get(k, k) if isinstance(k, str) else k for k in chaves]}
+        escalas.append(escala)
+    novas = dict(mantidas) if isinstance(jornadas, dict) else [jornada for _, jornada in mantidas]
+    return {**documento, "escalas": escalas, "jornadas": novas} if "escalas" in documento else {**documento, "jornadas": novas}, substituidas
+
+def minutos(hhmm):
+    """'HHMM' -> minutos desde 00:00 ('2400' = 1440). ValueError se não for numérico."""
+    return int(hhmm[:2]) * 60 + int(hhmm[2:])
+
+def intervalos_expediente(jornada):
+    """
+    array [início, fim, início, fim, ...] em minutos dos PERIODOS de Expediente da jornada; quando o fim é antes do
+    início (período que passa da meia-noite) ele já vem somado de MINUTOS_DIA. Períodos sem horário são ignorados,
+    e os com horário inválido também, com um aviso no logger do módulo.
+    """
+    intervalos = array('i')
+    for periodo in jornada.get('PERIODOS', []):
+        if periodo.get('DESC_TIPO_HORA') != 'Expediente': continue
+        inicio, fim = periodo['TM_HORA_INICIO'], periodo['TM_HORA_FIM']
+        if not inicio or not fim: continue
+        try: inicio, fim = minutos(inicio), minutos(fim)
+        except ValueError as erro: logger.warning("Erro ao analisar horário no período: %s - %s", periodo, erro); continue
+        intervalos.extend((inicio, fim + MINUTOS_DIA if fim < inicio else fim))
+    return intervalos
+
+def duracao_expediente(jornada):
+    """Minutos de expediente da jornada (soma dos intervalos_expediente)."""
+    intervalos = intervalos_expediente(jornada)
+    return sum(intervalos[1::2]) - sum(intervalos[::2])
@@ -1,5 +1,6 @@
 # main.py - Versão Final e Definitiva
 import streamlit.web.cli as stcli
+import multiprocessing
 import os
 import sys
 
@@ -13,6 +14,10 @@ def resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 if __name__ == "__main__":
+    # Necessário no executável do PyInstaller: os processos dos pools (processador._traduzir_em_paralelo e
+    # edicao_em_massa.executar_lote) reexecutam este arquivo; sem isso cada worker abriria outro servidor Streamlit.
+    multiprocessing.freeze_support()
+
     # Define o caminho para o seu script principal do Streamlit
     app_path = resource_path("app.py")
 
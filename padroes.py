@@ -0,0 +1,59 @@
+# padroes.py (Expressões regulares pré-compiladas compartilhadas)
+"""
+Padrões usados por processador.py, gerenciador_escalas_final.py e biblioteca.py, compilados
+uma única vez no import.
+"""
+
+import re
+
+# ==============================================================================
+# HORÁRIOS E LIMPEZA
+# ==============================================================================
+
+HORARIO_TRADUTOR = re.compile(r'(\d{1,2}H|\d{1,2}:\d{2})')  # '7H', '07:00'
+HORARIO_OPCIONAL_DOIS_PONTOS = re.compile(r'(\d{1,2}:?\d{2})')  # '7:00', '0700'
+HORARIO_HH_MM = re.compile(r'(\d{2}:\d{2})')  # '07:00'
+HORARIO_HHMM = re.compile(r'(\d{2}:?\d{2})')  # '07:00' ou '0700'
+NAO_DIGITO = re.compile(r'[^0-9]')
+ESPACOS = re.compile(r'\s+')
+PARENTESES = re.compile(r'[()]')
+RUIDO_DESCRICAO = re.compile(r'IRIS KRAUSE.*|DIARISTA|RECIFE|FEIRA|ÀS', re.IGNORECASE)
+
+# ==============================================================================
+# DIAS DA SEMANA
+# ==============================================================================
+
+MAPA_DIAS = {'SEG':0,'SEGUNDA':0,'2A':0,'2ª':0,'TER':1,'TERCA':1,'TERÇA':1,'3A':1,'3ª':1,'QUA':2,'QUARTA':2,'4A':2,'4ª':2,'QUI':3,'QUINTA':3,'5A':3,'5ª':3,'SEX':4,'SEXTA':4,'6A':4,'6ª':4,'SAB':5,'SABADO':5,'SÁBADO':5,'SÁB':5,'DOM':6,'DOMINGO':6}
+INTERVALO_DIAS = re.compile(r'([A-Z0-9ª]+)\s+(?:A|ATE|ATÉ)\s+([A-Z0-9ª]+)')
+SEPARADOR_DIAS = re.compile(r'[/,]')
+INICIO_BLOCO_DIA = re.compile(r'(?=\b(?:SEG|TER|QUA|QUI|SEX|SAB|DOM|2ª|3ª|4ª|5ª|6ª)\b)', re.IGNORECASE)
+
+# ==============================================================================
+# ESTRUTURAS DE ESCALA (gerenciador_escalas_final)
+# ==============================================================================
+
+CICLO_12X36 = re.compile(r'12\s*X\s*36')
+HORARIO_CICLO_12X36 = re.compile(r'12\s*X\s*36\s*-\s*([0-9:\sASÀS-]+)')
+CICLO_6X1 = re.compile(r'6\s*X\s*1')
+HORARIO_CICLO_6X1 = re.compile(r'6\s*X\s*1\s*-\s*([0-9:\sASÀS-]+)')
+INTERVALO_EXPLICITO_AS = re.compile(r'(.+?)E(\d{2}:?\d{2})AS(\d{2}:?\d{2})$')
+INTERVALO_EXPLICITO_HIFEN = re.compile(r'(.+?)E(\d{2}:?\d{2})-(\d{2}:?\d{2})$')
+SEPARADOR_AS = re.compile(r'AS')
+SEGMENTO_DIAS_HORARIOS = re.compile(
+    r'([A-ZÀÁÂÃÄÈÉÊËÌÍÎÏÒÓÔÕÖÙÚÛÜÇ\s,]+?)'  # Grupo 1: Dias (não guloso)
+    r'(?:\s*-\s*|\s+)'  # Separador opcional ' - ' ou apenas espaço
+    r'('  # Início do Grupo 2: Parte dos horários
+    r'(?:\d{2}:?\d{2}'  # Início de um horário (HHMM ou HH:MM)
+    r'(?:\s*(?:AS|ÀS|\-)?\s*\d{2}:?\d{2})*'  # Continuação de um range ou mais batidas
+    r')'
+    r'(?:\s+E\s+\d{2}:?\d{2}(?:AS|\-)\d{2}:?\d{2})?'  # Possível intervalo explícito no final
+    r')'  # Fim do Grupo 2
+)
+DIAS_SEM_HORARIO = re.compile(r'([A-ZÀÁÂÃÄÈÉÊËÌÍÎÏÒÓÔÕÖÙÚÛÜÇ\s,]+)')
+
+# ==============================================================================
+# NOMES DE MODELOS (biblioteca)
+# ==============================================================================
+
+CODIGO_INICIAL = re.compile(r'^(?!\d+H\b|\d+\s*X\s*\d+)\d{2,5}[A-Z]{0,3}\s+(?!(?:ÀS|AS|ATÉ|ATE|A|-)(?:\s|$))')  # '0132C ', '0006PA ' (não '0800 AS 1700', '24H ', '12X36 ')
+NAO_ALFANUMERICO = re.compile(r'[^0-9A-Z:]+')
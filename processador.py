@@ -2,207 +2,409 @@
 
 import pandas as pd
 import json
-import re
 import uuid
+import hashlib
+import padroes
+from escrita_json import EscritorJsonIncremental
+from jornadas import impressao_jornada, intervalos_expediente
+from registros import CAMPOS_JORNADA, PADRAO_ESCALA, PADRAO_JORNADA, Modelo, expandir_colecao
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 
 # ==============================================================================
 # SEÇÃO 1: TRADUTOR DE HORÁRIOS
 # ==============================================================================
 
+_MAPA_DIAS = padroes.MAPA_DIAS
+
 def get_day_indices(day_str):
     if not isinstance(day_str, str): return []
-    day_map = {'SEG':0,'SEGUNDA':0,'2A':0,'2ª':0,'TER':1,'TERCA':1,'TERÇA':1,'3A':1,'3ª':1,'QUA':2,'QUARTA':2,'4A':2,'4ª':2,'QUI':3,'QUINTA':3,'5A':3,'5ª':3,'SEX':4,'SEXTA':4,'6A':4,'6ª':4,'SAB':5,'SABADO':5,'SÁBADO':5,'SÁB':5,'DOM':6,'DOMINGO':6}
+    day_map = _MAPA_DIAS
     indices, day_str_upper = set(), day_str.upper().strip()
-    range_match = re.search(r'([A-Z0-9ª]+)\s+(?:A|ATE|ATÉ)\s+([A-Z0-9ª]+)', day_str_upper)
+    range_match = padroes.INTERVALO_DIAS.search(day_str_upper)
     if range_match:
         start_day, end_day = day_map.get(range_match.group(1)), day_map.get(range_match.group(2))
         if start_day is not None and end_day is not None: return sorted(list(range(start_day, end_day + 1)))
-    sanitized_str = re.sub(r'[/,]', ' ', day_str_upper)
-    for part in filter(None, re.split(r'\s+', sanitized_str)):
+    sanitized_str = padroes.SEPARADOR_DIAS.sub(' ', day_str_upper)
+    for part in filter(None, padroes.ESPACOS.split(sanitized_str)):
         if (idx := day_map.get(part)) is not None: indices.add(idx)
     return sorted(list(indices))
 
-def traduzir_horarios(df, coluna_origem, dicionario_regras):
-    log_depuracao = []
-    def _limpar_texto(texto):
-        if not isinstance(texto, str): return ""
-        texto_upper = texto.upper().strip()
-        texto_limpo = re.sub(r'IRIS KRAUSE.*|DIARISTA|RECIFE|FEIRA|ÀS', '', texto_upper, flags=re.IGNORECASE)
-        if not any(kw in texto_upper for kw in ['(IMPAR)', '(PAR)']):
-            texto_limpo = texto_limpo.replace('(', ' ').replace(')', ' ')
-        return re.sub(r'\s+', ' ', texto_limpo).strip()
-    def _formatar_batidas(time_tokens, sep=" / "):
-        batidas = []
-        for t in time_tokens:
-            n = re.sub(r'[^0-9]', '', str(t).replace('H',''))
-            if not n: continue
-            if len(n) <= 2: batidas.append(f"{int(n):02d}:00")
-            elif len(n) == 3: batidas.append(f"0{n[0]}:{n[1:]}")
-            elif len(n) >= 4: batidas.append(f"{n[:2]}:{n[2:4]}")
-        return sep.join(batidas)
-    def _formatar_dias(day_indices):
-        if not day_indices: return ""
-        day_map = {0:'SEG', 1:'TER', 2:'QUA', 3:'QUI', 4:'SEX', 5:'SAB', 6:'DOM'}
-        dias_ordenados = sorted(list(set(day_indices)))
-        grupos, grupo_atual = [], []
-        for idx in dias_ordenados:
-            if not grupo_atual or idx == grupo_atual[-1] + 1: grupo_atual.append(idx)
-            else: grupos.append(grupo_atual); grupo_atual = [idx]
-        if grupo_atual: grupos.append(grupo_atual)
-        if not any(len(g) > 2 for g in grupos): return " ".join([day_map[idx] for idx in dias_ordenados])
-        partes_dias = []
-        for grupo in grupos:
-            if len(grupo) > 2: partes_dias.append(f"{day_map[grupo[0]]} A {day_map[grupo[-1]]}")
-            else: partes_dias.append(" ".join([day_map[idx] for idx in grupo]))
-        return " E ".join(partes_dias)
-    def _calcular_duracao(horarios_tokens):
-        if len(horarios_tokens) < 2: return None
-        try:
-            t1_str = _formatar_batidas([horarios_tokens[0]], sep='').replace(':', ''); t2_str = _formatar_batidas([horarios_tokens[-1]], sep='').replace(':', '')
-            h1, h2 = datetime.strptime(t1_str, "%H%M"), datetime.strptime(t2_str, "%H%M")
-            if h2 < h1: h2 += timedelta(days=1)
-            return h2 - h1
-        except: return None
-    def _parser_generico_fallback(texto):
-        partes = re.split(r'(?=\b(?:SEG|TER|QUA|QUI|SEX|SAB|DOM|2ª|3ª|4ª|5ª|6ª)\b)', texto, flags=re.IGNORECASE)
-        resultados_partes = []
-        for parte in filter(None, partes):
-            parte_strip = parte.strip()
-            if not parte_strip: continue
-            dias, horarios = get_day_indices(parte_strip), re.findall(r'(\d{1,2}:?\d{2})', parte_strip)
-            if not dias and horarios: dias = list(range(5))
-            if dias and horarios:
-                dias_formatados = _formatar_dias(dias)
-                separador_horario = ' AS ' if len(horarios) == 2 else ' / '
-                horarios_formatados = _formatar_batidas(horarios, sep=separador_horario)
-                resultados_partes.append(f"{dias_formatados} {horarios_formatados}")
-        if resultados_partes: return " E ".join(resultados_partes)
-        return None
-    def _traduzir_linha(texto_original, index_linha):
-        log_depuracao.append(f"\n--- [Linha {index_linha+2}] Analisando: '{texto_original}'")
-        if not isinstance(texto_original, str) or not texto_original.strip(): log_depuracao.append("    --> FALHA: Descrição vazia."); return "SEM INTERPRETAÇÃO"
-        texto_upper, texto_limpo = texto_original.upper().strip(), _limpar_texto(texto_original)
-        log_depuracao.append(f"    Texto Limpo para Análise: '{texto_limpo}'")
-        horarios_tokens = re.findall(r'(\d{1,2}H|\d{1,2}:\d{2})', texto_upper)
-        for regra in dicionario_regras:
-            log_depuracao.append(f"    - Testando Regra (Prioridade {regra['prioridade']}): '{regra['nome_regra']}'")
-            if regra['tipo_regra'] == 'EXATA' and regra['condicao_texto'].upper() == texto_upper: log_depuracao.append(f"    --> SUCESSO: Regra 'EXATA'."); return regra['formato_saida']
-            elif regra['tipo_regra'] == 'QUANTIDADE' and len(horarios_tokens) == regra['condicao_qtde_horarios']:
-                cond_sem_dia_ok = not (regra['condicao_sem_dia'] and get_day_indices(texto_limpo))
-                if cond_sem_dia_ok:
-                    format_dict = {f"h{i+1}": _formatar_batidas([h], sep='') for i, h in enumerate(horarios_tokens)}; log_depuracao.append(f"    --> SUCESSO: Regra 'QUANTIDADE'."); return regra['formato_saida'].format(**format_dict)
-            elif regra['tipo_regra'] == 'DURACAO':
-                palavras_chave = [kw.strip().upper() for kw in (regra['condicao_texto'] or "").split(',') if kw.strip()]
-                if palavras_chave and not all(kw in texto_upper for kw in palavras_chave): continue
-                duracao_ok = False
-                if not regra['condicao_duracao']: duracao_ok = True
-                else:
-                    duracao_total = _calcular_duracao(horarios_tokens)
-                    if duracao_total:
-                        try:
-                            h, m = map(int, regra['condicao_duracao'].split(':'))
-                            if duracao_total == timedelta(hours=h, minutes=m): duracao_ok = True
-                        except: pass
-                if duracao_ok:
-                    format_dict = {f"h{i+1}": _formatar_batidas([h], sep='') for i, h in enumerate(horarios_tokens)}; log_depuracao.append(f"    --> SUCESSO: Regra 'DURACAO'."); return regra['formato_saida'].format(**format_dict)
-        resultado_fallback = _parser_generico_fallback(texto_limpo)
-        if resultado_fallback: return resultado_fallback
-        log_depuracao.append("    --> FALHA: Nenhuma regra ou análise conseguiu interpretar o texto.")
-        return "SEM INTERPRETAÇÃO"
+class RegraCompilada:
+    """Regra de tradução com as condições normalizadas uma única vez (texto, palavras-chave, duração)."""
+    __slots__ = ('id', 'nome_regra', 'tipo_regra', 'prioridade', 'ordem', 'texto', 'palavras_chave', 'qtde_horarios', 'sem_dia', 'exige_duracao', 'duracao', 'formato_saida')
+    def __init__(self, regra, ordem):
+        self.id, self.nome_regra, self.tipo_regra, self.prioridade, self.ordem = regra.get('id'), regra.get('nome_regra'), regra.get('tipo_regra'), regra.get('prioridade'), ordem
+        condicao_texto = regra.get('condicao_texto') or ""
+        self.texto = condicao_texto.upper()
+        self.palavras_chave = tuple(kw.strip().upper() for kw in condicao_texto.split(',') if kw.strip())
+        self.qtde_horarios, self.sem_dia = regra.get('condicao_qtde_horarios'), bool(regra.get('condicao_sem_dia'))
+        self.exige_duracao, self.duracao = bool(regra.get('condicao_duracao')), None
+        if self.exige_duracao:
+            try:
+                h, m = map(int, regra['condicao_duracao'].split(':'))
+                self.duracao = timedelta(hours=h, minutes=m)
+            except: pass
+        self.formato_saida = regra.get('formato_saida')
+
+class MotorRegras:
+    """Regras de tradução compiladas e indexadas: cada linha só é testada contra as regras candidatas, na ordem em que foram recebidas."""
+    def __init__(self, dicionario_regras):
+        self.regras = tuple(RegraCompilada(regra, i) for i, regra in enumerate(dicionario_regras))
+        self.exatas = {}
+        for regra in self.regras:
+            if regra.tipo_regra == 'EXATA': self.exatas.setdefault(regra.texto, regra)
+        self.duracao = tuple(r for r in self.regras if r.tipo_regra == 'DURACAO')
+        self.quantidade = {}
+        for regra in self.regras:
+            if regra.tipo_regra == 'QUANTIDADE': self.quantidade.setdefault(regra.qtde_horarios, []).append(regra)
+        self._candidatas_por_qtde = {}
+        assinatura = [(r.tipo_regra, r.texto, r.qtde_horarios, r.sem_dia, r.exige_duracao, str(r.duracao), r.formato_saida) for r in self.regras]
+        self.assinatura = hashlib.sha1(json.dumps(assinatura, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+    def __len__(self): return len(self.regras)
+    def exata(self, texto_upper): return self.exatas.get(texto_upper)
+    def candidatas(self, qtde_horarios):
+        if (candidatas := self._candidatas_por_qtde.get(qtde_horarios)) is None:
+            candidatas = tuple(sorted(tuple(self.quantidade.get(qtde_horarios, ())) + self.duracao, key=lambda r: r.ordem))
+            self._candidatas_por_qtde[qtde_horarios] = candidatas
+        return candidatas
+
+def _pre_processar_descricoes(serie):
+    """Limpa e tokeniza a coluna inteira de uma vez com os acessores .str; o estágio de regras só consome as colunas geradas."""
+    textos = serie.where(serie.map(lambda v: isinstance(v, str)), "").astype(object)
+    texto_upper = textos.str.upper().str.strip()
+    texto_limpo = texto_upper.str.replace(padroes.RUIDO_DESCRICAO, '', regex=True)
+    tem_paridade = texto_upper.str.contains('(IMPAR)', regex=False) | texto_upper.str.contains('(PAR)', regex=False)
+    texto_limpo = texto_limpo.where(tem_paridade, texto_limpo.str.replace(padroes.PARENTESES, ' ', regex=True))
+    texto_limpo = texto_limpo.str.replace(padroes.ESPACOS, ' ', regex=True).str.strip()
+    horarios_tokens = texto_upper.str.findall(padroes.HORARIO_TRADUTOR)
+    return pd.DataFrame({"texto_upper": texto_upper, "texto_limpo": texto_limpo, "horarios_tokens": horarios_tokens, "qtde_horarios": horarios_tokens.str.len()}, index=serie.index)
+
+LOG_DESLIGADO, LOG_RESUMO, LOG_COMPLETO = "desligado", "resumo", "completo"
+
+class LogTraducao:
+    """Trilha estruturada da tradução: arrays paralelos de (posição da linha, código do evento, regra/linha de origem).
+    O texto só é montado em renderizar(), quando o usuário baixa a análise."""
+    ANALISANDO, TEXTO_LIMPO, TESTANDO, SUCESSO, GENERICO, VAZIA, FALHA, REUSO_LINHA, REUSO_CACHE = range(9)
+    def __init__(self, modo, regras, textos_originais, textos_limpos, rotulos):
+        self.modo, self.regras = modo, regras
+        self.textos_originais, self.textos_limpos, self.rotulos = textos_originais, textos_limpos, rotulos
+        self.posicoes, self.eventos, self.valores = array('l'), array('b'), array('l')
+        self._ativo, self.completo = modo != LOG_DESLIGADO, modo == LOG_COMPLETO
+    def registrar(self, posicao, evento, valor=-1):
+        if self._ativo: self.posicoes.append(posicao); self.eventos.append(evento); self.valores.append(valor)
+    def __len__(self): return len(self.eventos)
+    def _linha(self, posicao): return f"{self.rotulos[posicao]+2}"
+    def _mensagem(self, posicao, evento, valor):
+        if evento == self.ANALISANDO: return f"\n--- [Linha {self._linha(posicao)}] Analisando: '{self.textos_originais[posicao]}'"
+        if evento == self.TEXTO_LIMPO: return f"    Texto Limpo para Análise: '{self.textos_limpos[posicao]}'"
+        if evento == self.TESTANDO: return f"    - Testando Regra (Prioridade {self.regras[valor].prioridade}): '{self.regras[valor].nome_regra}'"
+        if evento == self.SUCESSO: return f"    --> SUCESSO: Regra '{self.regras[valor].tipo_regra}'." if self.completo else f"    --> SUCESSO: Regra '{self.regras[valor].tipo_regra}' ('{self.regras[valor].nome_regra}')."
+        if evento == self.GENERICO: return "    --> SUCESSO: Análise genérica (nenhuma regra aplicada)."
+        if evento == self.VAZIA: return "    --> FALHA: Descrição vazia."
+        if evento == self.FALHA: return "    --> FALHA: Nenhuma regra ou análise conseguiu interpretar o texto."
+        if evento == self.REUSO_LINHA: return f"    --> Reaproveitado da Linha {self._linha(valor)}."
+        return "    --> Reaproveitado de uma tradução anterior com as mesmas regras."
+    def __iter__(self):
+        for posicao, evento, valor in zip(self.posicoes, self.eventos, self.valores):
+            if self.completo: yield self._mensagem(posicao, evento, valor)
+            else: yield f"[Linha {self._linha(posicao)}] '{self.textos_originais[posicao]}' {self._mensagem(posicao, evento, valor).strip()}"
+    def incorporar(self, posicao, eventos, valores):
+        """Anexa os eventos de uma linha traduzida em outro processo (ver _traduzir_lote)."""
+        if self._ativo: self.posicoes.extend([posicao] * len(eventos)); self.eventos.extend(eventos); self.valores.extend(valores)
+    def renderizar(self): return "\n".join(self)
+
+def _formatar_batidas(time_tokens, sep=" / "):
+    batidas = []
+    for t in time_tokens:
+        n = padroes.NAO_DIGITO.sub('', str(t).replace('H',''))
+        if not n: continue
+        if len(n) <= 2: batidas.append(f"{int(n):02d}:00")
+        elif len(n) == 3: batidas.append(f"0{n[0]}:{n[1:]}")
+        elif len(n) >= 4: batidas.append(f"{n[:2]}:{n[2:4]}")
+    return sep.join(batidas)
+
+def _formatar_dias(day_indices):
+    if not day_indices: return ""
+    day_map = {0:'SEG', 1:'TER', 2:'QUA', 3:'QUI', 4:'SEX', 5:'SAB', 6:'DOM'}
+    dias_ordenados = sorted(list(set(day_indices)))
+    grupos, grupo_atual = [], []
+    for idx in dias_ordenados:
+        if not grupo_atual or idx == grupo_atual[-1] + 1: grupo_atual.append(idx)
+        else: grupos.append(grupo_atual); grupo_atual = [idx]
+    if grupo_atual: grupos.append(grupo_atual)
+    if not any(len(g) > 2 for g in grupos): return " ".join([day_map[idx] for idx in dias_ordenados])
+    partes_dias = []
+    for grupo in grupos:
+        if len(grupo) > 2: partes_dias.append(f"{day_map[grupo[0]]} A {day_map[grupo[-1]]}")
+        else: partes_dias.append(" ".join([day_map[idx] for idx in grupo]))
+    return " E ".join(partes_dias)
+
+def _calcular_duracao(horarios_tokens):
+    if len(horarios_tokens) < 2: return None
+    try:
+        t1_str = _formatar_batidas([horarios_tokens[0]], sep='').replace(':', ''); t2_str = _formatar_batidas([horarios_tokens[-1]], sep='').replace(':', '')
+        h1, h2 = datetime.strptime(t1_str, "%H%M"), datetime.strptime(t2_str, "%H%M")
+        if h2 < h1: h2 += timedelta(days=1)
+        return h2 - h1
+    except: return None
+
+def _parser_generico_fallback(texto):
+    partes = padroes.INICIO_BLOCO_DIA.split(texto)
+    resultados_partes = []
+    for parte in filter(None, partes):
+        parte_strip = parte.strip()
+        if not parte_strip: continue
+        dias, horarios = get_day_indices(parte_strip), padroes.HORARIO_OPCIONAL_DOIS_PONTOS.findall(parte_strip)
+        if not dias and horarios: dias = list(range(5))
+        if dias and horarios:
+            dias_formatados = _formatar_dias(dias)
+            separador_horario = ' AS ' if len(horarios) == 2 else ' / '
+            horarios_formatados = _formatar_batidas(horarios, sep=separador_horario)
+            resultados_partes.append(f"{dias_formatados} {horarios_formatados}")
+    if resultados_partes: return " E ".join(resultados_partes)
+    return None
+
+def _traduzir_linha(motor, log_depuracao, texto_upper, texto_limpo, horarios_tokens, qtde_horarios, posicao):
+    completo = log_depuracao.completo
+    if completo: log_depuracao.registrar(posicao, LogTraducao.ANALISANDO)
+    if not texto_upper: log_depuracao.registrar(posicao, LogTraducao.VAZIA); return "SEM INTERPRETAÇÃO"
+    if completo: log_depuracao.registrar(posicao, LogTraducao.TEXTO_LIMPO)
+    format_dict, duracao_total, tem_dia = None, False, None
+    regra_exata = motor.exata(texto_upper)
+    for regra in motor.candidatas(qtde_horarios):
+        if regra_exata and regra.ordem > regra_exata.ordem: break
+        if completo: log_depuracao.registrar(posicao, LogTraducao.TESTANDO, regra.ordem)
+        if regra.tipo_regra == 'QUANTIDADE':
+            if regra.sem_dia:
+                if tem_dia is None: tem_dia = bool(get_day_indices(texto_limpo))
+                if tem_dia: continue
+            if format_dict is None: format_dict = {f"h{i+1}": _formatar_batidas([h], sep='') for i, h in enumerate(horarios_tokens)}
+            log_depuracao.registrar(posicao, LogTraducao.SUCESSO, regra.ordem); return regra.formato_saida.format(**format_dict)
+        if regra.palavras_chave and not all(kw in texto_upper for kw in regra.palavras_chave): continue
+        if regra.exige_duracao:
+            if duracao_total is False: duracao_total = _calcular_duracao(horarios_tokens)
+            if regra.duracao is None or not duracao_total or duracao_total != regra.duracao: continue
+        if format_dict is None: format_dict = {f"h{i+1}": _formatar_batidas([h], sep='') for i, h in enumerate(horarios_tokens)}
+        log_depuracao.registrar(posicao, LogTraducao.SUCESSO, regra.ordem); return regra.formato_saida.format(**format_dict)
+    if regra_exata:
+        if completo: log_depuracao.registrar(posicao, LogTraducao.TESTANDO, regra_exata.ordem)
+        log_depuracao.registrar(posicao, LogTraducao.SUCESSO, regra_exata.ordem); return regra_exata.formato_saida
+    resultado_fallback = _parser_generico_fallback(texto_limpo)
+    if resultado_fallback: log_depuracao.registrar(posicao, LogTraducao.GENERICO); return resultado_fallback
+    log_depuracao.registrar(posicao, LogTraducao.FALHA)
+    return "SEM INTERPRETAÇÃO"
+# Estado de cada processo do pool de tradução, preenchido uma única vez pelo initializer.
+_MOTOR_PROCESSO, _MODO_LOG_PROCESSO = None, LOG_DESLIGADO
+
+def _iniciar_processo_traducao(motor, modo_log):
+    global _MOTOR_PROCESSO, _MODO_LOG_PROCESSO
+    _MOTOR_PROCESSO, _MODO_LOG_PROCESSO = motor, modo_log
+
+def _traduzir_lote(lote):
+    """Executado no pool: traduz as linhas (texto_upper, texto_limpo, horarios_tokens, qtde_horarios, posicao) de um lote."""
+    log_lote = LogTraducao(_MODO_LOG_PROCESSO, None, None, None, None)
+    resultados = [_traduzir_linha(_MOTOR_PROCESSO, log_lote, *linha) for linha in lote]
+    return resultados, log_lote.posicoes, log_lote.eventos, log_lote.valores
+
+def _traduzir_em_paralelo(motor, modo_log, pendentes, processos, tamanho_lote):
+    """Distribui as linhas pendentes em lotes por um ProcessPoolExecutor e devolve {posicao: (resultado, eventos, valores)}."""
+    lotes = [pendentes[i:i + tamanho_lote] for i in range(0, len(pendentes), tamanho_lote)]
+    traduzidas = {}
+    with ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_processo_traducao, initargs=(motor, modo_log)) as executor:
+        for lote, (resultados, posicoes, eventos, valores) in zip(lotes, executor.map(_traduzir_lote, lotes)):
+            inicio = 0
+            for linha, resultado in zip(lote, resultados):
+                posicao, fim = linha[-1], inicio
+                while fim < len(posicoes) and posicoes[fim] == posicao: fim += 1
+                traduzidas[posicao] = (resultado, eventos[inicio:fim], valores[inicio:fim]); inicio = fim
+    return traduzidas
+
+def traduzir_horarios(df, coluna_origem, dicionario_regras, cache=None, modo_log=LOG_COMPLETO, processos=1, tamanho_lote=2000):
+    """
+    Preenche DESCRICAO_TRADUZIDA a partir de coluna_origem e devolve (df, LogTraducao).
+    processos > 1 (ou None, para usar todos os núcleos) traduz as descrições distintas em lotes de tamanho_lote
+    em paralelo; o resultado e a análise saem na mesma ordem das linhas da execução sequencial.
+    """
+    motor = dicionario_regras if isinstance(dicionario_regras, MotorRegras) else MotorRegras(dicionario_regras)
     nome_coluna_destino = "DESCRICAO_TRADUZIDA"
     if nome_coluna_destino in df.columns: df = df.drop(columns=[nome_coluna_destino])
-    resultados = [ _traduzir_linha(row[coluna_origem], i) for i, row in df.iterrows() ]
-    df[nome_coluna_destino] = resultados
+    pre = _pre_processar_descricoes(df[coluna_origem])
+    log_depuracao = LogTraducao(modo_log, motor.regras, df[coluna_origem].tolist(), pre["texto_limpo"].tolist(), df.index.tolist())
+    # Cada descrição distinta é traduzida uma única vez; o cache (opcional) guarda as traduções por conjunto de regras entre execuções.
+    if cache is not None:
+        for assinatura_antiga in [k for k in cache if k != motor.assinatura]: del cache[assinatura_antiga]
+        memo = cache.setdefault(motor.assinatura, {})
+    else: memo = {}
+    codigos, unicos = pd.factorize(pre["texto_upper"])
+    linhas = list(zip(pre["texto_upper"], pre["texto_limpo"], pre["horarios_tokens"], pre["qtde_horarios"]))
+    traduzidas = {}
+    if processos is None or processos > 1:
+        primeiras = pd.Series(codigos).drop_duplicates().index
+        pendentes = [(*linhas[posicao], posicao) for posicao in primeiras if not (linhas[posicao][0] and linhas[posicao][0] in memo)]
+        if len(pendentes) > tamanho_lote: traduzidas = _traduzir_em_paralelo(motor, modo_log, pendentes, processos, tamanho_lote)
+    resultados_unicos, posicao_origem = [None] * len(unicos), [None] * len(unicos)
+    for posicao, (codigo, valores) in enumerate(zip(codigos, linhas)):
+        texto_upper = valores[0]
+        if posicao_origem[codigo] is not None:
+            if log_depuracao.completo: log_depuracao.registrar(posicao, LogTraducao.ANALISANDO)
+            log_depuracao.registrar(posicao, LogTraducao.REUSO_LINHA, posicao_origem[codigo]); continue
+        if texto_upper and texto_upper in memo:
+            if log_depuracao.completo: log_depuracao.registrar(posicao, LogTraducao.ANALISANDO)
+            log_depuracao.registrar(posicao, LogTraducao.REUSO_CACHE)
+            resultado = memo[texto_upper]
+        else:
+            if posicao in traduzidas:
+                resultado, eventos, valores_log = traduzidas.pop(posicao)
+                log_depuracao.incorporar(posicao, eventos, valores_log)
+            else: resultado = _traduzir_linha(motor, log_depuracao, *valores, posicao)
+            if texto_upper: memo[texto_upper] = resultado
+        resultados_unicos[codigo], posicao_origem[codigo] = resultado, posicao
+    df[nome_coluna_destino] = pd.Series(resultados_unicos, dtype=object).to_numpy()[codigos]
     return df, log_depuracao
 
 # ==============================================================================
 # SEÇÃO 2: PROCESSADOR DE ESCALAS
 # ==============================================================================
 
+# Escalas e jornadas geradas são registros compactos (registros.Modelo): só os campos variáveis ficam em cada objeto.
+ESCALA = Modelo("EscalaGerada", ("NOME", "DESC_ESCALA", "COD", "carga_horaria", *PADRAO_ESCALA, "key", "TIPO", "JORNADAS"), PADRAO_ESCALA)
+JORNADA = Modelo("JornadaGerada", CAMPOS_JORNADA, PADRAO_JORNADA)
+
 def _criar_jornada_padrao(horarios):
     nome_jornada = " / ".join(horarios)
     batidas_formatadas = [h.replace(":", "") for h in horarios]
     periodos_expediente = []
     if len(batidas_formatadas) >= 2: periodos_expediente.append({"TM_HORA_INICIO": batidas_formatadas[0], "TM_HORA_FIM": batidas_formatadas[1], "DESC_TIPO_HORA": "Expediente"})
     if len(batidas_formatadas) == 4: periodos_expediente.append({"TM_HORA_INICIO": batidas_formatadas[2], "TM_HORA_FIM": batidas_formatadas[3], "DESC_TIPO_HORA": "Expediente"})
-    return {"NOME_JORNADA": nome_jornada,"DESC_JORNADA": "","HORAS_CONTRATUAIS": horarios,"TRATAMENTO_EXPEDIENTE_EXTRA": "","TRATAMENTO_ADICIONAL_PARA_PERIODO_DO_DIA": "","FL_HORA_COMPENSAVEL": "1","FL_ADICIONAL_NOTURNO_SOBRE_EXTRA": "","FL_FATOR_POSTERIOR": "1","FL_TRATAMENTO_CARGA_INFERIOR": "FALTA","FL_TRATAMENTO_CARGA_SUPERIOR": "Hora Extra 50%","PREASSINALA_SOMENTE_BATIDAS_PARES": False,"batida_automatica": [],"PERIODOS": periodos_expediente, "key": uuid.uuid4().hex,"HORAS_CONTRATUAIS_INTERVALO_EXTRA": ["", ""]}
+    return JORNADA.criar(NOME_JORNADA=nome_jornada, HORAS_CONTRATUAIS=horarios, PERIODOS=periodos_expediente, key=uuid.uuid4().hex)
+
+def indice_jornadas_biblioteca(biblioteca):
+    """Mapeia o nome padronizado da jornada (" / ".join(HORAS_CONTRATUAIS), o mesmo formato de NOME_JORNADA em _criar_jornada_padrao) para a jornada da biblioteca."""
+    indice = {}
+    for jornada in (biblioteca or {}).get("jornadas", {}).values():
+        if (horas := jornada.get("HORAS_CONTRATUAIS")): indice.setdefault(" / ".join(horas), jornada)
+    return indice
+
+def _partes_semanais(descricao_escala):
+    """Partes de uma descrição semanal ('SEG A SEX 08:00 AS 17:00 E SAB ...') como (horários, dias 0-6), na ordem da descrição; partes sem horário ou sem dia ficam de fora."""
+    partes = []
+    for parte in descricao_escala.split(' E '):
+        horarios = padroes.HORARIO_HH_MM.findall(parte)
+        if not horarios: continue
+        # Os dias são o que sobra da parte sem os horários e sem 'AS' ('SEG-SEX' não é intervalo de dias).
+        indices_dias = [idx for idx in get_day_indices(padroes.HORARIO_HH_MM.sub('', parte).replace('AS', '').strip()) if 0 <= idx < 7]
+        if indices_dias: partes.append((horarios, indices_dias))
+    return partes
+
+def _semana_da_descricao(partes_semana, indice_biblioteca):
+    """Expediente (jornadas.intervalos_expediente) de cada dia da semana gerada a partir das partes; dias sem horário ficam vazios."""
+    semana = [()] * 7
+    for horarios, indices_dias in partes_semana:
+        chave_jornada = " / ".join(horarios)
+        expediente = tuple(intervalos_expediente(indice_biblioteca[chave_jornada] if chave_jornada in indice_biblioteca else _criar_jornada_padrao(horarios)))
+        for idx in indices_dias: semana[idx] = expediente
+    return semana
+
+def _semana_do_modelo(modelo, modelos):
+    """Expediente de cada jornada de um modelo da biblioteca, no mesmo formato de _semana_da_descricao."""
+    return [tuple(intervalos_expediente(modelos.jornada(chave))) for chave in modelo.jornadas]
 
-def process_file(df, output_path):
+def process_file(df, output_path, biblioteca=None, compacto=False, retornar_dados=True, modelos=None):
     log_unificacao = []
     data = {"escalas": [],"jornadas": {}, "horas_adicionais": {}}
     data["jornadas"]["ID_FOLGA"] = {"NOME_JORNADA": "FOLGA", "key": "ID_FOLGA", "sem_expediente": "1"}
     data["jornadas"]["ID_DSR"] = {"NOME_JORNADA": "DSR", "key": "ID_DSR", "FL_DSR": "1", "sem_expediente": "1"}
     data['horas_adicionais'] = {"Hora Extra 50%": {"TIPO": "HE", "VALOR": "50"},"Hora Extra 100%": {"TIPO": "HE", "VALOR": "100"}, "Banco de Horas 50%": {"TIPO": "BH", "VALOR": "1"},"Banco de Horas 100%": {"TIPO": "BH", "VALOR": "1"}}
     mapa_escalas_existentes = {}
+    # Índice NOME_JORNADA -> key mantido junto com data["jornadas"]; com biblioteca, as jornadas dela são reaproveitadas pela mesma chave.
+    indice_jornadas = {j["NOME_JORNADA"]: k for k, j in data["jornadas"].items()}
+    # Índice impressão digital -> key: uma jornada nova equivalente a uma já incluída (jornadas.impressao_jornada) usa a existente;
+    # com modelos, uma equivalente a uma jornada da biblioteca (IndiceModelos.por_impressao) entra com a key e os dados de lá.
+    por_impressao = {impressao_jornada(j): k for k, j in data["jornadas"].items()}
+    indice_biblioteca = indice_jornadas_biblioteca(biblioteca) if biblioteca else {}
+    def _incluir_jornada(jornada):
+        if (id_jornada := por_impressao.get(impressao := impressao_jornada(jornada))) is None:
+            if modelos is not None and (chave := modelos.por_impressao.get(impressao)) is not None: jornada = dict(modelos.jornada(chave))
+            data["jornadas"][jornada['key']] = jornada
+            id_jornada = por_impressao[impressao] = jornada['key']
+        return id_jornada
+    def _obter_jornada(horarios):
+        chave_jornada = " / ".join(horarios)
+        if (id_jornada := indice_jornadas.get(chave_jornada)) is None:
+            jornada = dict(indice_biblioteca[chave_jornada]) if chave_jornada in indice_biblioteca else _criar_jornada_padrao(horarios)
+            id_jornada = indice_jornadas[chave_jornada] = _incluir_jornada(jornada)
+        return id_jornada
+    def _jornada_modelo(chave):
+        # Jornada de um modelo da biblioteca: com horários contratuais, entra no mesmo índice das demais (uma por horário).
+        jornada = modelos.jornada(chave)
+        if not (horas := jornada.get("HORAS_CONTRATUAIS")): return _incluir_jornada(dict(jornada))
+        if (id_jornada := indice_jornadas.get(" / ".join(horas))) is None:
+            id_jornada = indice_jornadas[" / ".join(horas)] = _incluir_jornada(dict(jornada))
+        return id_jornada
 
     col_descricao_traduzida = "DESCRICAO_TRADUZIDA"
     col_nome = "NOME" if "NOME" in df.columns else col_descricao_traduzida
     col_codigo = "COD" if "COD" in df.columns else "CODIGO"
     col_carga_horaria = "CARGA_HORARIA" if "CARGA_HORARIA" in df.columns else "carga_horaria"
     
-    for index, row in df.iterrows():
-        descricao_escala = str(row.get(col_descricao_traduzida, "")).upper()
-        if not descricao_escala or "SEM INTERPRETAÇÃO" in descricao_escala: continue
-        if descricao_escala in mapa_escalas_existentes: log_unificacao.append(f"Escala '{row[col_nome]}' (Linha {index + 2}) unificada com '{mapa_escalas_existentes[descricao_escala]}'."); continue
+    # As escalas são gravadas em lotes à medida que são geradas; com retornar_dados=False elas não ficam em memória
+    # e a função devolve um ArquivoJsonGerado no lugar do dicionário.
+    with EscritorJsonIncremental(output_path, compacto=compacto) as escritor:
+        for index, row in df.iterrows():
+            descricao_escala = str(row.get(col_descricao_traduzida, "")).upper()
+            if not descricao_escala or "SEM INTERPRETAÇÃO" in descricao_escala: continue
+            if descricao_escala in mapa_escalas_existentes: log_unificacao.append(f"Escala '{row[col_nome]}' (Linha {index + 2}) unificada com '{mapa_escalas_existentes[descricao_escala]}'."); continue
 
-        escala = {"NOME": str(row.get(col_nome, descricao_escala)),"DESC_ESCALA": row.get(col_descricao_traduzida, ""),"COD": str(row.get(col_codigo, index + 1)),"carga_horaria": str(row.get(col_carga_horaria, "0")),"tipo_escala": "","dsr": { "ativo": "1", "dia_completo": "1", "desconto_valor_falta": "1", "apuracao": { "semanal": "1" } },"TIPO_HORA_ADICIONAL": "", "TIPO_HORA_ADICIONAL_NOTURNO": "", "COD_ADICIONAL_NOTURNO": "","excedente_apuracao_semanal": "", "deficit_apuracao_semanal": "", "excedente_apuracao_mensal": "","deficit_apuracao_mensal": "", "key": uuid.uuid4().hex}
+            escala = ESCALA.criar(NOME=str(row.get(col_nome, descricao_escala)), DESC_ESCALA=row.get(col_descricao_traduzida, ""), COD=str(row.get(col_codigo, index + 1)), carga_horaria=str(row.get(col_carga_horaria, "0")), key=uuid.uuid4().hex)
         
-        is_12x36 = '12X36' in descricao_escala or '12X35' in descricao_escala
-        is_24h = '24:00' in descricao_escala or '23:59' in descricao_escala
-        
-        if is_12x36:
-            escala["TIPO"] = "12X36"
-            horarios = re.findall(r'(\d{2}:\d{2})', descricao_escala)
-            if horarios:
-                chave_jornada = " / ".join(horarios)
-                jornada_existente = next((j for j in data["jornadas"].values() if j.get("NOME_JORNADA") == chave_jornada), None)
-                if not jornada_existente:
-                    nova_jornada = _criar_jornada_padrao(horarios); data["jornadas"][nova_jornada['key']] = nova_jornada
-                    id_jornada_trabalho = nova_jornada['key']
-                else: id_jornada_trabalho = jornada_existente['key']
-                escala["JORNADAS"] = [id_jornada_trabalho, "ID_FOLGA"]
-            else: escala["JORNADAS"] = ["ID_FOLGA", "ID_FOLGA"]
-        elif is_24h:
-            escala["TIPO"] = "DIARIA"
-            horarios = re.findall(r'(\d{2}:\d{2})', descricao_escala)
-            if horarios:
-                chave_jornada = " / ".join(horarios)
-                jornada_existente = next((j for j in data["jornadas"].values() if j.get("NOME_JORNADA") == chave_jornada), None)
-                if not jornada_existente:
-                    nova_jornada = _criar_jornada_padrao(horarios); data["jornadas"][nova_jornada['key']] = nova_jornada
-                    id_jornada_trabalho = nova_jornada['key']
-                else: id_jornada_trabalho = jornada_existente['key']
-                escala["JORNADAS"] = [id_jornada_trabalho]
-            else: escala["JORNADAS"] = ["ID_FOLGA"]
-        else:
-            escala["TIPO"] = "SEMANAL"
-            jornadas_semana = ["ID_FOLGA"] * 7
-            partes_escala = descricao_escala.split(' E ')
-            for parte in partes_escala:
-                horarios = re.findall(r'(\d{2}:\d{2})', parte)
-                if not horarios: continue
-                dias_str = re.sub(r'\d{2}:\d{2}', '', parte).replace('AS', '').strip()
-                indices_dias = get_day_indices(dias_str)
-                if not indices_dias: continue
-                chave_jornada = " / ".join(horarios)
-                jornada_existente = next((j for j in data["jornadas"].values() if j.get("NOME_JORNADA") == chave_jornada), None)
-                if not jornada_existente:
-                    nova_jornada = _criar_jornada_padrao(horarios); data["jornadas"][nova_jornada['key']] = nova_jornada
-                    id_jornada = nova_jornada['key']
-                else: id_jornada = jornada_existente['key']
-                for idx in indices_dias:
-                    if 0 <= idx < 7: jornadas_semana[idx] = id_jornada
-            if jornadas_semana[6] == "ID_FOLGA": jornadas_semana[6] = "ID_DSR"
+            is_12x36 = '12X36' in descricao_escala or '12X35' in descricao_escala
+            is_24h = '24:00' in descricao_escala or '23:59' in descricao_escala
+
+            if is_12x36:
+                escala["TIPO"] = "12X36"
+                horarios = padroes.HORARIO_HH_MM.findall(descricao_escala)
+                if horarios:
+                    id_jornada_trabalho = _obter_jornada(horarios)
+                    escala["JORNADAS"] = [id_jornada_trabalho, "ID_FOLGA"]
+                else: escala["JORNADAS"] = ["ID_FOLGA", "ID_FOLGA"]
+            elif is_24h:
+                escala["TIPO"] = "DIARIA"
+                horarios = padroes.HORARIO_HH_MM.findall(descricao_escala)
+                if horarios:
+                    id_jornada_trabalho = _obter_jornada(horarios)
+                    escala["JORNADAS"] = [id_jornada_trabalho]
+                else: escala["JORNADAS"] = ["ID_FOLGA"]
             else:
-                try: primeira_folga_idx = jornadas_semana.index("ID_FOLGA"); jornadas_semana[primeira_folga_idx] = "ID_DSR"
-                except ValueError: pass
-            escala["JORNADAS"] = jornadas_semana
+                partes_semana = _partes_semanais(descricao_escala)
+                # Com modelos (biblioteca.IndiceModelos), uma descrição semanal equivalente a um modelo da biblioteca usa o TIPO e as JORNADAS dele,
+                # desde que o expediente de cada dia do modelo seja o da descrição (há modelos cujas jornadas não correspondem ao nome);
+                # 12X36 e 24h acima seguem sempre o padrão explícito da descrição.
+                modelo = modelos.buscar(descricao_escala) if modelos is not None else None
+                if modelo is not None and _semana_do_modelo(modelo, modelos) != _semana_da_descricao(partes_semana, indice_biblioteca):
+                    log_unificacao.append(f"Escala '{row[col_nome]}' (Linha {index + 2}): modelo '{modelo.nome}' ignorado, as jornadas dele não correspondem aos horários da descrição.")
+                    modelo = None
+                if modelo is not None:
+                    escala["TIPO"], escala["JORNADAS"] = modelo.tipo, [_jornada_modelo(chave) for chave in modelo.jornadas]
+                    log_unificacao.append(f"Escala '{row[col_nome]}' (Linha {index + 2}) gerada a partir do modelo '{modelo.nome}' (similaridade {modelo.pontuacao:.0f}).")
+                else:
+                    escala["TIPO"] = "SEMANAL"
+                    jornadas_semana = ["ID_FOLGA"] * 7
+                    for horarios, indices_dias in partes_semana:
+                        id_jornada = _obter_jornada(horarios)
+                        for idx in indices_dias: jornadas_semana[idx] = id_jornada
+                    if jornadas_semana[6] == "ID_FOLGA": jornadas_semana[6] = "ID_DSR"
+                    else:
+                        try: primeira_folga_idx = jornadas_semana.index("ID_FOLGA"); jornadas_semana[primeira_folga_idx] = "ID_DSR"
+                        except ValueError: pass
+                    escala["JORNADAS"] = jornadas_semana
 
-        data["escalas"].append(escala)
-        mapa_escalas_existentes[descricao_escala] = row[col_nome]
-    
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
-        
-    return data, log_unificacao
+            escritor.adicionar_escala(escala)
+            if retornar_dados: data["escalas"].append(escala)
+            mapa_escalas_existentes[descricao_escala] = row[col_nome]
+        arquivo = escritor.finalizar(jornadas=data["jornadas"], horas_adicionais=data["horas_adicionais"])
+
+    # Quem recebe os dados recebe dicts comuns, como sempre.
+    if retornar_dados: expandir_colecao(data["escalas"]); expandir_colecao(data["jornadas"])
+    return (data if retornar_dados else arquivo), log_unificacao
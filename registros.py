@@ -0,0 +1,101 @@
+# registros.py (Registros compactos de escalas e jornadas geradas)
+"""
+As escalas e jornadas geradas repetem os mesmos campos padrão (dsr, TIPO_HORA_ADICIONAL, excedente_apuracao_*,
+o bloco de flags das jornadas...). Um Modelo guarda esses valores uma única vez, junto com a ordem das chaves
+no JSON; cada registro criado por ele só tem os campos variáveis, em __slots__. O registro é lido como um dict
+(registro["NOME"], registro.get("PERIODOS", [])) e vira o dict completo só na serialização: registro.expandir(), ou
+json.dumps(..., default=para_json), que dá o mesmo texto do dict equivalente.
+"""
+
+import copy
+from collections.abc import Mapping
+
+_AUSENTE = object()
+
+# Campos padrão das escalas e do bloco de flags das jornadas, iguais em processador e gerenciador_escalas_final.
+PADRAO_ESCALA = {
+    "tipo_escala": "", "dsr": {"ativo": "1", "dia_completo": "1", "desconto_valor_falta": "1", "apuracao": {"semanal": "1"}},
+    "TIPO_HORA_ADICIONAL": "", "TIPO_HORA_ADICIONAL_NOTURNO": "", "COD_ADICIONAL_NOTURNO": "",
+    "excedente_apuracao_semanal": "", "deficit_apuracao_semanal": "", "excedente_apuracao_mensal": "", "deficit_apuracao_mensal": ""}
+PADRAO_JORNADA = {
+    "DESC_JORNADA": "", "TRATAMENTO_EXPEDIENTE_EXTRA": "", "TRATAMENTO_ADICIONAL_PARA_PERIODO_DO_DIA": "", "FL_HORA_COMPENSAVEL": "1",
+    "FL_ADICIONAL_NOTURNO_SOBRE_EXTRA": "", "FL_FATOR_POSTERIOR": "1", "FL_TRATAMENTO_CARGA_INFERIOR": "FALTA",
+    "FL_TRATAMENTO_CARGA_SUPERIOR": "Hora Extra 50%", "PREASSINALA_SOMENTE_BATIDAS_PARES": False, "batida_automatica": [],
+    "HORAS_CONTRATUAIS_INTERVALO_EXTRA": ["", ""]}
+# Ordem das chaves de uma jornada gerada.
+CAMPOS_JORNADA = ("NOME_JORNADA", "DESC_JORNADA", "HORAS_CONTRATUAIS", "TRATAMENTO_EXPEDIENTE_EXTRA", "TRATAMENTO_ADICIONAL_PARA_PERIODO_DO_DIA",
+                  "FL_HORA_COMPENSAVEL", "FL_ADICIONAL_NOTURNO_SOBRE_EXTRA", "FL_FATOR_POSTERIOR", "FL_TRATAMENTO_CARGA_INFERIOR", "FL_TRATAMENTO_CARGA_SUPERIOR",
+                  "PREASSINALA_SOMENTE_BATIDAS_PARES", "batida_automatica", "PERIODOS", "key", "HORAS_CONTRATUAIS_INTERVALO_EXTRA")
+
+
+class Registro(Mapping):
+    """Base das classes geradas por Modelo; campos do modelo alterados depois da criação ficam em _alterados."""
+    __slots__ = ("_alterados",)
+    _modelo = None
+
+    def __getitem__(self, chave):
+        modelo = self._modelo
+        if chave in modelo.atributos:
+            if (valor := getattr(self, modelo.atributos[chave], _AUSENTE)) is not _AUSENTE: return valor
+        elif (alterados := getattr(self, "_alterados", None)) and chave in alterados: return alterados[chave]
+        elif chave in modelo.padrao: return modelo.padrao[chave]
+        raise KeyError(chave)
+
+    def __setitem__(self, chave, valor):
+        if chave in self._modelo.atributos: setattr(self, self._modelo.atributos[chave], valor)
+        elif chave in self._modelo.padrao:
+            if getattr(self, "_alterados", None) is None: self._alterados = {}
+            self._alterados[chave] = valor
+        else: raise KeyError(f"{chave!r} não faz parte do modelo")
+
+    def __iter__(self): return (chave for chave in self._modelo.campos if chave in self)
+
+    def __len__(self): return sum(1 for _ in self)
+
+    def __contains__(self, chave):
+        atributo = self._modelo.atributos.get(chave)
+        return getattr(self, atributo, _AUSENTE) is not _AUSENTE if atributo else chave in self._modelo.padrao
+
+    def __repr__(self): return f"{type(self).__name__}({dict(self)!r})"
+
+    def expandir(self, copiar=True):
+        """Dict completo, na ordem do modelo; com copiar, os valores padrão mutáveis (listas, dicts) são cópias próprias."""
+        modelo, alterados = self._modelo, getattr(self, "_alterados", None) or {}
+        completo = {}
+        for chave in modelo.campos:
+            if chave in modelo.atributos:
+                if (valor := getattr(self, modelo.atributos[chave], _AUSENTE)) is not _AUSENTE: completo[chave] = valor
+            elif chave in alterados: completo[chave] = alterados[chave]
+            else: completo[chave] = copy.deepcopy(modelo.padrao[chave]) if copiar else modelo.padrao[chave]
+        return completo
+
+
+class Modelo:
+    """
+    Uso:
+        ESCALA = Modelo("Escala", ("NOME", "COD", "dsr", "key", "TIPO"), {"dsr": {"ativo": "1"}})
+        escala = ESCALA.criar(NOME="X", COD="1", key="...")  # campos fora de `padrao` são os variáveis
+        escala["TIPO"] = "SEMANAL"                           # variável ainda não preenchida fica fora do JSON
+        escala.expandir()                                    # {"NOME": "X", "COD": "1", "dsr": {...}, "key": "...", "TIPO": "SEMANAL"}
+    """
+    def __init__(self, nome, campos, padrao):
+        self.campos, self.padrao = tuple(campos), dict(padrao)
+        self.atributos = {campo: f"_{campo}" for campo in self.campos if campo not in self.padrao}
+        self.classe = type(nome, (Registro,), {"__slots__": tuple(self.atributos.values()), "_modelo": self})
+
+    def criar(self, **campos):
+        registro = self.classe()
+        for chave, valor in campos.items(): registro[chave] = valor
+        return registro
+
+
+def para_json(valor):
+    """Para json.dumps(..., default=para_json): registros saem como o dict completo (sem cópias, só para serializar)."""
+    if isinstance(valor, Registro): return valor.expandir(copiar=False)
+    raise TypeError(f"Object of type {type(valor).__name__} is not JSON serializable")
+
+def expandir_colecao(colecao):
+    """Troca, no próprio dict ou lista, os registros pelo dict completo (um por vez, sem manter as duas formas da coleção inteira)."""
+    for chave, valor in (colecao.items() if isinstance(colecao, dict) else enumerate(colecao)):
+        if isinstance(valor, Registro): colecao[chave] = valor.expandir()
+    return colecao
@@ -0,0 +1,31 @@
+# conftest.py (Configuração comum dos testes)
+"""
+Os módulos do projeto ficam na raiz do repositório, fora de um pacote: a raiz entra no sys.path aqui.
+banco_teste cria um banco SQLite vazio com a tabela jsons como o app.py cria, já inicializado.
+"""
+
+import os
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import banco  # noqa: E402
+
+
+def criar_tabela_jsons(conn):
+    conn.execute('CREATE TABLE IF NOT EXISTS jsons (id INTEGER PRIMARY KEY, name TEXT UNIQUE, data TEXT)')
+    conn.commit()
+
+
+@pytest.fixture
+def banco_teste(tmp_path):
+    """(caminho, conexão) de um banco novo, com as tabelas normalizadas já criadas."""
+    caminho = str(tmp_path / "database.db")
+    conn = banco.conectar(caminho)
+    criar_tabela_jsons(conn)
+    banco.inicializar(conn)
+    yield caminho, conn
+    conn.close()
@@ -0,0 +1,184 @@
+# test_banco.py (Migração dos arquivos antigos, exportação e recodificação do conteúdo)
+
+import contextlib
+import json
+import sqlite3
+
+import pytest
+
+import banco
+from conftest import criar_tabela_jsons
+
+DOCUMENTOS = {
+    "normal": {"escalas": [{"NOME": "Escala ç", "COD": "1", "key": "e1", "JORNADAS": ["j1", "ID_FOLGA", "j1"]}, {"NOME": "Sem key"}],
+               "jornadas": {"j1": {"NOME_JORNADA": "08:00 / 17:00", "key": "j1", "HORAS_CONTRATUAIS": ["08:00", "17:00"]}},
+               "horas_adicionais": {"Hora Extra 50%": {"TIPO": "HE", "VALOR": "50"}}},
+    "listas_e_extras": {"versao": 2, "jornadas": [{"NOME_JORNADA": "FOLGA", "key": "ID_FOLGA"}], "escalas": [], "horas_adicionais": [], "origem": "importado"},
+    "so_escalas": {"escalas": [{"NOME": "X", "JORNADAS": []}]},
+    "bruto": [1, 2, {"a": "b"}],
+    "escalas_nao_lista": {"escalas": "x"},
+    "campos_nao_texto": {"escalas": [{"NOME": ["A", "B"], "COD": 7, "key": {"id": 1}}],
+                         "jornadas": {"j1": {"NOME_JORNADA": ["08:00", "17:00"], "key": {"id": "j1"}}, "j2": {"NOME_JORNADA": 5, "key": None}}},
+}
+
+
+def _texto(documento): return json.dumps(documento, ensure_ascii=False, indent=4)
+
+
+@pytest.fixture
+def banco_antigo(tmp_path):
+    """Banco no formato antigo (cada arquivo inteiro em jsons.data), inicializado como o app faz na primeira execução."""
+    conn = banco.conectar(str(tmp_path / "database.db"))
+    criar_tabela_jsons(conn)
+    ids = {nome: conn.execute("INSERT INTO jsons (name, data) VALUES (?, ?)", (nome, _texto(doc))).lastrowid for nome, doc in DOCUMENTOS.items()}
+    ids["ilegivel"] = conn.execute("INSERT INTO jsons (name, data) VALUES ('ilegivel', 'x{')").lastrowid
+    conn.commit()
+    banco.inicializar(conn)
+    yield conn, ids
+    conn.close()
+
+
+def _exportacoes(conn, ids): return {nome: banco.exportar_json(conn, ids[nome]) for nome in DOCUMENTOS}
+
+
+def test_migracao_e_exportacao_reproduzem_o_arquivo(banco_antigo):
+    conn, ids = banco_antigo
+    for nome, documento in DOCUMENTOS.items():
+        assert banco.exportar_json(conn, ids[nome]) == _texto(documento), nome
+        assert banco.exportar_documento(conn, ids[nome]) == documento, nome
+    assert conn.execute("SELECT COUNT(*) FROM escalas WHERE json_id = ?", (ids["normal"],)).fetchone()[0] == 2
+    assert banco.chaves_escalas(conn, ids["normal"]) == ["e1"]
+    assert [tuple(row) for row in conn.execute("SELECT key, nome FROM jornadas WHERE json_id = ? ORDER BY posicao", (ids["campos_nao_texto"],))] == [("{'id': 'j1'}", "['08:00', '17:00']"), (None, "5")]
+    with pytest.raises(ValueError): banco.exportar_documento(conn, ids["ilegivel"])
+    banco.inicializar(conn)  # segunda inicialização não muda nada
+    assert _exportacoes(conn, ids) == {nome: _texto(doc) for nome, doc in DOCUMENTOS.items()}
+
+
+def test_salvar_e_exportar(banco_teste):
+    _, conn = banco_teste
+    json_id = banco.salvar_documento(conn, DOCUMENTOS["normal"], "novo")
+    assert banco.exportar_json(conn, json_id) == _texto(DOCUMENTOS["normal"])
+    assert conn.execute("SELECT formato FROM jsons WHERE id = ?", (json_id,)).fetchone()[0] == banco.FORMATO_ATUAL
+    banco.salvar_documento(conn, DOCUMENTOS["so_escalas"], "novo", json_id)
+    assert banco.exportar_documento(conn, json_id) == DOCUMENTOS["so_escalas"]
+
+
+def test_exportar_documento_distingue_arquivo_inexistente_de_null(banco_teste):
+    _, conn = banco_teste
+    json_id = banco.salvar_documento(conn, None, "nulo.json")
+    assert banco.exportar_documento(conn, json_id) is None and banco.exportar_json(conn, json_id) == "null"
+    assert banco.carregar_documento_versionado(conn, json_id)[0] is None
+    with pytest.raises(KeyError): banco.exportar_documento(conn, json_id + 1)
+    with pytest.raises(KeyError): banco.carregar_documento_versionado(conn, json_id + 1)
+
+
+def test_estatisticas_sem_serializar_de_novo(banco_teste):
+    _, conn = banco_teste
+    estatisticas = lambda json_id: tuple(conn.execute("SELECT n_escalas, n_jornadas, tamanho, hash FROM jsons_stats WHERE json_id = ?", (json_id,)).fetchone())
+    json_id = banco.salvar_documento(conn, DOCUMENTOS["normal"], "a.json")
+    n_escalas, n_jornadas, tamanho, hash_conteudo = estatisticas(json_id)
+    assert (n_escalas, n_jornadas) == (2, 1) and tamanho >= len(json.dumps(DOCUMENTOS["normal"], ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+    banco.salvar_documento(conn, DOCUMENTOS["normal"], "a.json", json_id)
+    assert estatisticas(json_id)[3] == hash_conteudo
+    outras_jornadas = {**DOCUMENTOS["normal"], "escalas": [{**DOCUMENTOS["normal"]["escalas"][0], "JORNADAS": ["j1", "j1", "j1"]}, DOCUMENTOS["normal"]["escalas"][1]]}
+    banco.salvar_documento(conn, outras_jornadas, "a.json", json_id)
+    assert estatisticas(json_id)[3] != hash_conteudo
+
+
+def _selecao_como_antes(documento, chaves):
+    """O JSON personalizado de antes, montado sobre o documento inteiro."""
+    escalas = [s for s in documento.get("escalas", []) if s.get("key") in chaves]
+    usadas = set()
+    for escala in escalas: usadas.update(escala.get("JORNADAS", []))
+    return {"escalas": escalas, "jornadas": {k: v for k, v in documento.get("jornadas", {}).items() if k in usadas}, "horas_adicionais": documento.get("horas_adicionais", {})}
+
+SELECAO = {"versao": 2, "jornadas": {f"j{i}": {"NOME_JORNADA": f"J{i}", "key": f"j{i}"} for i in range(1, 4)},
+           "escalas": [{"NOME": "A", "key": "a", "JORNADAS": ["j2", 5]}, {"NOME": "B", "key": "b", "JORNADAS": ["j1"]}, {"NOME": "C", "key": "c", "JORNADAS": ["j3", "j1"]}, {"NOME": "D", "key": "d"}],
+           "origem": "importado"}
+
+
+@pytest.mark.parametrize("documento", [SELECAO, DOCUMENTOS["normal"], DOCUMENTOS["so_escalas"]], ids=["selecao", "normal", "so_escalas"])
+@pytest.mark.parametrize("chaves", [["a"], ["b"], ["c", "a"], ["a", "b", "c", "d"], ["e1"], ["inexistente"]])
+def test_exportar_selecao_como_antes(banco_teste, documento, chaves):
+    _, conn = banco_teste
+    json_id = banco.salvar_documento(conn, documento, "selecao")
+    esperado = _selecao_como_antes(documento, chaves)
+    assert banco.exportar_documento(conn, json_id, chaves) == esperado
+    assert banco.exportar_json(conn, json_id, chaves) == _texto(esperado)
+
+
+def test_recodificar_ida_e_volta(banco_antigo):
+    conn, ids = banco_antigo
+    esperado = _exportacoes(conn, ids)
+    assert banco.recodificar(conn, banco.FORMATO_TEXTO) == len(DOCUMENTOS)
+    assert all(isinstance(row[0], str) for row in conn.execute("SELECT dados FROM escalas UNION ALL SELECT dados FROM jornadas"))
+    assert _exportacoes(conn, ids) == esperado
+    assert banco.recodificar(conn, banco.FORMATO_ZLIB) == len(DOCUMENTOS)  # o arquivo ilegível fica como está
+    assert all(isinstance(row[0], bytes) for row in conn.execute("SELECT dados FROM escalas UNION ALL SELECT dados FROM jornadas"))
+    assert _exportacoes(conn, ids) == esperado
+    assert conn.execute("SELECT data, formato FROM jsons WHERE id = ?", (ids["ilegivel"],)).fetchone()[:] == ("x{", banco.FORMATO_TEXTO)
+
+
+def test_recodificar_ignora_conteudo_corrompido(banco_teste):
+    _, conn = banco_teste
+    bom, ruim = banco.salvar_documento(conn, DOCUMENTOS["normal"], "bom"), banco.salvar_documento(conn, DOCUMENTOS["normal"], "ruim")
+    conn.execute("UPDATE escalas SET dados = ? WHERE json_id = ? AND posicao = 0", (b"\x00lixo", ruim)); conn.commit()
+    with pytest.raises(ValueError): banco.exportar_documento(conn, ruim)
+    assert banco.recodificar(conn, banco.FORMATO_TEXTO) == 1
+    assert [tuple(row) for row in conn.execute("SELECT id, formato FROM jsons ORDER BY id")] == [(bom, banco.FORMATO_TEXTO), (ruim, banco.FORMATO_ZLIB)]
+    assert banco.exportar_json(conn, bom) == _texto(DOCUMENTOS["normal"])
+
+
+def test_decodificar_sempre_gera_value_error():
+    assert banco.decodificar(banco.codificar({"a": [1, "ç"]}), banco.FORMATO_ZLIB) == {"a": [1, "ç"]}
+    assert banco.decodificar(banco.codificar({"a": 1}, banco.FORMATO_TEXTO), banco.FORMATO_TEXTO) == {"a": 1}
+    for dados, formato in ((b"\xff\xfe lixo", banco.FORMATO_ZLIB), (None, banco.FORMATO_ZLIB), ("x{", banco.FORMATO_TEXTO)):
+        with pytest.raises(ValueError): banco.decodificar(dados, formato)
+
+
+def test_deduplicar_arquivos_usa_o_indice_de_impressoes(banco_teste):
+    _, conn = banco_teste
+    documento = {"escalas": [{"NOME": "A", "JORNADAS": ["j1", "j2"]}], "jornadas": {"j1": {"key": "j1", "HORAS_CONTRATUAIS": ["08:00", "17:00"]}, "j2": {"key": "j2", "HORAS_CONTRATUAIS": ["08:00", "17:00"]}}}
+    json_id = banco.salvar_documento(conn, documento, "a.json")
+    plano = " ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN SELECT DISTINCT json_id FROM jornadas WHERE impressao IS NOT NULL GROUP BY json_id, impressao HAVING COUNT(*) > 1"))
+    assert "idx_jornadas_json_impressao" in plano
+    assert banco.deduplicar_arquivos(conn) == 1
+    assert banco.exportar_documento(conn, json_id)["escalas"][0]["JORNADAS"] == ["j1", "j1"]
+
+
+def test_buscar_escalas_por_prefixo_usa_os_indices(banco_teste):
+    _, conn = banco_teste
+    escalas = [{"NOME": "ADM 01", "COD": "7"}, {"NOME": "oper", "COD": "adm9"}, {"NOME": "Adm 02", "COD": "8"}, {"NOME": None, "COD": "1"}, {"NOME": "X_1", "COD": "ad%"}]
+    json_id = banco.salvar_documento(conn, {"escalas": [{**escala, "key": f"k{i}"} for i, escala in enumerate(escalas)], "jornadas": {}}, "a.json")
+    linhas, total = banco.buscar_escalas(conn, json_id, "adm", limite=2)
+    assert [tuple(linha) for linha in linhas] == [("k0", "ADM 01", "7"), ("k1", "oper", "adm9")] and total == 3
+    assert [linha["key"] for linha in banco.buscar_escalas(conn, json_id, "adm", limite=2, deslocamento=2)[0]] == ["k2"]
+    assert [linha["key"] for linha in banco.buscar_escalas(conn, json_id, "AD%")[0]] == ["k4"]
+    assert banco.buscar_escalas(conn, json_id)[1] == 5
+    plano = " ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN SELECT id FROM escalas WHERE json_id = ? AND nome LIKE ? ESCAPE '\\'"
+                                                      " UNION SELECT id FROM escalas WHERE json_id = ? AND cod LIKE ? ESCAPE '\\'", (json_id, "ADM%", json_id, "ADM%")))
+    assert "idx_escalas_nome" in plano and "idx_escalas_cod" in plano
+
+
+def test_listar_escalas_so_troca_nome_ausente_por_sem_nome(banco_teste):
+    _, conn = banco_teste
+    banco.salvar_documento(conn, {"escalas": [{"NOME": "A"}, {"NOME": None}, {"COD": "1"}, {"NOME": None, "JORNADAS": ["j1"]}], "jornadas": {}}, "a.json")
+    assert list(banco.listar_escalas(conn)) == [("a.json", "A"), ("a.json", None), ("a.json", "Sem nome"), ("a.json", None)]
+    assert list(banco.listar_escalas(conn, limite=2, deslocamento=1)) == [("a.json", None), ("a.json", "Sem nome")]
+
+
+def test_pool_reaproveita_conexoes(tmp_path):
+    pool = banco.PoolConexoes(str(tmp_path / "database.db"), tamanho=2)
+    with pool.conexao() as primeira: primeira.execute("BEGIN"); primeira.execute("CREATE TABLE t (x)")
+    assert not primeira.in_transaction  # devolvida com a transação desfeita
+    with pool.conexao() as segunda: assert segunda is primeira
+    assert segunda.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 't'").fetchone()[0] == 0
+
+
+def test_pool_esgotado_abre_conexao_temporaria(tmp_path):
+    pool = banco.PoolConexoes(str(tmp_path / "database.db"), tamanho=2)
+    with contextlib.ExitStack() as pilha:
+        conexoes = [pilha.enter_context(pool.conexao()) for _ in range(5)]  # não espera por uma conexão livre
+        assert len({id(conn) for conn in conexoes}) == 5
+    assert pool._livres.qsize() == 2
+    with pytest.raises(sqlite3.ProgrammingError): conexoes[-1].execute("SELECT 1")  # temporária, já fechada
@@ -0,0 +1,76 @@
+# test_biblioteca.py (Normalização dos nomes e uso dos modelos da biblioteca no process_file)
+
+import json
+import os
+import pickle
+
+import pandas as pd
+import pytest
+
+from biblioteca import VERSAO_SNAPSHOT, IndiceModelos, normalizar_nome
+from processador import process_file
+
+
+def _jornada(chave, inicio, fim):
+    return {"NOME_JORNADA": f"{inicio} / {fim}", "key": chave, "HORAS_CONTRATUAIS": [inicio, fim],
+            "PERIODOS": [{"TM_HORA_INICIO": inicio.replace(":", ""), "TM_HORA_FIM": fim.replace(":", ""), "DESC_TIPO_HORA": "Expediente"}]}
+
+SEMANA = lambda chave: [chave] * 5 + ["ID_FOLGA", "ID_DSR"]
+BIBLIOTECA = {
+    "jornadas": {"ID_FOLGA": {"NOME_JORNADA": "FOLGA", "key": "ID_FOLGA", "sem_expediente": "1"}, "ID_DSR": {"NOME_JORNADA": "DSR", "key": "ID_DSR", "FL_DSR": "1", "sem_expediente": "1"},
+                 "comercial": _jornada("comercial", "08:00", "17:00"), "dia": _jornada("dia", "07:00", "19:00"), "virada": _jornada("virada", "00:00", "24:00")},
+    "templates": {"0132C SEG A SEX 08:00 AS 17:00": {"TIPO": "SEMANAL", "JORNADAS": SEMANA("comercial")},
+                  "12X36 07:00 AS 19:00": {"TIPO": "SEMANAL", "JORNADAS": SEMANA("dia")},
+                  "24H 07:00 AS 07:00": {"TIPO": "SEMANAL", "JORNADAS": SEMANA("dia")},
+                  "SEG A SEX 00:00 AS 24:00": {"TIPO": "SEMANAL", "JORNADAS": SEMANA("virada")},
+                  # Como '0002PA SEG A SEX 08:00 AS 17:00 E SAB 08:00 AS 12:00' da biblioteca real: o sábado do modelo é folga.
+                  "0002PA SEG A SEX 08:00 AS 17:00 E SAB 08:00 AS 12:00": {"TIPO": "SEMANAL", "JORNADAS": SEMANA("comercial")}},
+}
+
+
+@pytest.mark.parametrize("nome, esperado", [
+    ("0132C SEG A SEX 08:00 AS 17:00", "SEG A SEX 08:00 AS 17:00"), ("0006PA 2ª a 6ª - 08:00", "2A A 6A 08:00"),
+    ("0800 AS 1700", "0800 AS 1700"), ("24H 07:00 AS 07:00", "24H 07:00 AS 07:00"), ("12X36 07:00 AS 19:00", "12X36 07:00 AS 19:00"),
+    ("12X 36 DIURNO", "12X 36 DIURNO"),
+])
+def test_normalizar_nome_tira_so_o_codigo_inicial(nome, esperado):
+    assert normalizar_nome(nome) == esperado
+
+
+def test_buscar_nao_confunde_24h_com_codigo():
+    indice = IndiceModelos(BIBLIOTECA)
+    assert indice.buscar("24H 07:00 AS 07:00").nome == "24H 07:00 AS 07:00"
+    assert indice.buscar("07:00 AS 07:00") is None
+    assert indice.buscar("SEG A SEX 08:00 AS 17:00").nome == "0132C SEG A SEX 08:00 AS 17:00"
+
+
+def test_process_file_12x36_e_24h_seguem_a_descricao(tmp_path):
+    descricoes = ["12X36 07:00 AS 19:00", "SEG A SEX 00:00 AS 24:00", "SEG A SEX 08:00 AS 17:00"]
+    dados, log = process_file(pd.DataFrame({"DESCRICAO_TRADUZIDA": descricoes, "NOME": descricoes}), str(tmp_path / "saida.json"), modelos=IndiceModelos(BIBLIOTECA))
+    nomes = [(e["TIPO"], [dados["jornadas"][chave]["NOME_JORNADA"] for chave in e["JORNADAS"]]) for e in dados["escalas"]]
+    assert nomes == [("12X36", ["07:00 / 19:00", "FOLGA"]), ("DIARIA", ["00:00 / 24:00"]), ("SEMANAL", ["08:00 / 17:00"] * 5 + ["FOLGA", "DSR"])]
+    assert len(log) == 1 and "0132C SEG A SEX 08:00 AS 17:00" in log[0]
+
+
+def test_process_file_ignora_modelo_com_jornadas_diferentes_do_nome(tmp_path):
+    descricao = "SEG A SEX 08:00 AS 17:00 E SAB 08:00 AS 12:00"
+    dados, log = process_file(pd.DataFrame({"DESCRICAO_TRADUZIDA": [descricao], "NOME": [descricao]}), str(tmp_path / "saida.json"), modelos=IndiceModelos(BIBLIOTECA))
+    assert IndiceModelos(BIBLIOTECA).buscar(descricao).pontuacao == 100
+    escala, = dados["escalas"]
+    assert [dados["jornadas"][chave]["NOME_JORNADA"] for chave in escala["JORNADAS"]] == ["08:00 / 17:00"] * 5 + ["08:00 / 12:00", "DSR"]
+    assert len(log) == 1 and "ignorado" in log[0]
+
+
+# Índices gravados depois de um cabeçalho válido: classe de um módulo que não existe mais, construtor com argumentos
+# que não servem e bytes quaisquer.
+@pytest.mark.parametrize("indice_gravado", [b"cmodulo_que_nao_existe\nIndiceModelos\n.", b"cbuiltins\nint\n(S'1'\nS'2'\nS'3'\ntR.", b"lixo"])
+def test_carregar_refaz_o_indice_de_snapshot_ilegivel(tmp_path, caplog, indice_gravado):
+    caminho = tmp_path / "biblioteca.json"
+    caminho.write_text(json.dumps(BIBLIOTECA), encoding="utf-8")
+    info = os.stat(caminho)
+    (tmp_path / "biblioteca.snapshot").write_bytes(pickle.dumps({"versao": VERSAO_SNAPSHOT, "arquivo": (info.st_mtime_ns, info.st_size)}) + indice_gravado)
+    assert IndiceModelos.carregar(str(caminho)).buscar("24H 07:00 AS 07:00").nome == "24H 07:00 AS 07:00"
+    assert "Snapshot da biblioteca ignorado" in caplog.text
+    caplog.clear()
+    assert IndiceModelos.carregar(str(caminho)).buscar("24H 07:00 AS 07:00").nome == "24H 07:00 AS 07:00"
+    assert not caplog.text
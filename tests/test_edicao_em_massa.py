@@ -0,0 +1,124 @@
+# test_edicao_em_massa.py (Busca por prefixo do IndiceTags e gravação em lote do executar_lote)
+
+import sqlite3
+
+import pytest
+
+import banco
+import edicao_em_massa
+from edicao_em_massa import IndiceTags, executar_lote, gerar_sobreposicoes
+
+ESCALAS = [{"NOME": "ADM 01", "COD": "10"}, {"NOME": "ADM 02", "COD": 11}, {"NOME": "adm 03"}, {"NOME": "ADMINISTRATIVO", "COD": "100"},
+           {"NOME": "OPER 01", "COD": "20"}, {"NOME": "AD"}, {"COD": "1"}, {"NOME": None}, {"NOME": "ADM\U0010ffff"}, {"NOME": "ÁDM"}]
+
+
+@pytest.mark.parametrize("tag", ["NOME", "COD", "INEXISTENTE"])
+@pytest.mark.parametrize("prefixo", ["", "A", "AD", "ADM", "ADM 0", "ADM\U0010ffff", "adm", "1", "10", "Á", "Z"])
+def test_indice_tags_prefixo_igual_a_varredura(tag, prefixo):
+    esperado = [i for i, esc in enumerate(ESCALAS) if isinstance(esc.get(tag), str) and esc[tag].startswith(prefixo)]
+    assert IndiceTags(ESCALAS).posicoes_com_prefixo(tag, prefixo) == esperado
+
+
+def test_gerar_sobreposicoes_com_e_sem_indice():
+    com_indice = gerar_sobreposicoes(ESCALAS, "NOME", "ADM", "RH", "{nome_antigo} ({valor_substituir})", indice=IndiceTags(ESCALAS))
+    sem_indice = gerar_sobreposicoes(ESCALAS, "NOME", "ADM", "RH", "{nome_antigo} ({valor_substituir})")
+    sem_keys = lambda sobreposicoes: [(posicao, {k: v for k, v in alteracoes.items() if k != "key"}) for posicao, alteracoes in sobreposicoes]
+    assert sem_keys(com_indice[0]) == sem_keys(sem_indice[0]) and com_indice[1] == sem_indice[1]
+    assert [alteracoes["NOME"] for _, alteracoes in com_indice[0]] == ["RH 01 (RH)", "RH 02 (RH)", "RHINISTRATIVO (RH)", "RH\U0010ffff (RH)"]
+
+
+def test_indice_tags_sai_do_cache_com_o_documento(monkeypatch):
+    cache = banco.CacheDocumentos(limite_bytes=150)
+    monkeypatch.setattr(banco, "CACHE_DOCUMENTOS", cache)
+    cache.guardar((1, "v1"), {"escalas": ESCALAS}, 40)
+    indice = edicao_em_massa.indice_tags(1, "v1", ESCALAS)
+    assert edicao_em_massa.indice_tags(1, "v1", ESCALAS) is indice
+    cache.guardar((2, "v1"), {"escalas": []}, 40)  # (1, "v1") sai do cache e o índice com ele
+    assert cache.obter((1, "v1")) is None and edicao_em_massa.indice_tags(1, "v1", ESCALAS) is not indice
+
+
+def _documento(prefixo): return {"escalas": [{"NOME": f"{prefixo} {i}", "COD": str(i), "key": f"{prefixo}{i}"} for i in range(3)], "jornadas": {}}
+
+REGRAS = [("NOME", "ADM", "RH")]
+FORMATO = "{nome_antigo}"
+
+
+@pytest.fixture
+def arquivos(banco_teste):
+    caminho, conn = banco_teste
+    ids = {nome: banco.salvar_documento(conn, _documento(prefixo), nome) for nome, prefixo in (("a.json", "ADM"), ("b.json", "ADM"), ("c.json", "OPER"))}
+    return caminho, conn, ids
+
+
+def _conteudo(conn): return {row[0]: banco.exportar_json(conn, row[1]) for row in conn.execute("SELECT name, id FROM jsons ORDER BY name")}
+
+
+def test_executar_lote_sobrescreve_e_cria_arquivos(arquivos):
+    caminho, conn, ids = arquivos
+    gravados, falhas = executar_lote(caminho, conn, list(ids.values()), REGRAS, FORMATO, processos=1)
+    assert falhas == [] and sorted(gravados) == [(ids["a.json"], "a.json", 3), (ids["b.json"], "b.json", 3)]
+    assert [e["NOME"] for e in banco.exportar_documento(conn, ids["a.json"])["escalas"]] == ["ADM 0", "ADM 1", "ADM 2", "RH 0", "RH 1", "RH 2"]
+    gravados, _ = executar_lote(caminho, conn, [ids["c.json"], ids["b.json"]], REGRAS, FORMATO, sufixo_arquivo_novo="rh", processos=1)
+    assert [nome for _, nome, _ in gravados] == ["b_rh.json"]
+    assert len(banco.exportar_documento(conn, gravados[0][0])["escalas"]) == 9
+
+
+def test_executar_lote_conflito_desfaz_tudo(arquivos):
+    caminho, conn, ids = arquivos
+    antes = _conteudo(conn)
+    def alterar_durante(feitos, total):
+        # O segundo arquivo muda depois de lido: a versão gravada não confere com a lida.
+        if feitos == 2: banco.salvar_documento(conn, _documento("ADM X"), "b.json", ids["b.json"])
+    with pytest.raises(ValueError, match="b.json"):
+        executar_lote(caminho, conn, [ids["a.json"], ids["b.json"]], REGRAS, FORMATO, processos=1, progresso=alterar_durante)
+    assert _conteudo(conn) == {**antes, "b.json": banco.exportar_json(conn, ids["b.json"])}
+    assert [e["NOME"] for e in banco.exportar_documento(conn, ids["a.json"])["escalas"]] == ["ADM 0", "ADM 1", "ADM 2"]
+
+
+def test_executar_lote_arquivo_excluido_e_conflito(arquivos):
+    caminho, conn, ids = arquivos
+    def excluir_durante(feitos, total):
+        if feitos == 2: banco.excluir_arquivo(conn, ids["b.json"])
+    with pytest.raises(ValueError, match="excluído"):
+        executar_lote(caminho, conn, [ids["a.json"], ids["b.json"]], REGRAS, FORMATO, processos=1, progresso=excluir_durante)
+    assert list(_conteudo(conn)) == ["a.json", "c.json"]
+    assert len(banco.exportar_documento(conn, ids["a.json"])["escalas"]) == 3
+
+
+def test_executar_lote_nome_repetido_desfaz_tudo(arquivos):
+    caminho, conn, ids = arquivos
+    banco.salvar_documento(conn, {"escalas": []}, "b_rh.json")
+    antes = _conteudo(conn)
+    with pytest.raises(sqlite3.IntegrityError):
+        executar_lote(caminho, conn, [ids["a.json"], ids["b.json"]], REGRAS, FORMATO, sufixo_arquivo_novo="rh", processos=1)
+    assert _conteudo(conn) == antes
+
+
+def test_executar_lote_informa_arquivo_ilegivel_e_grava_os_demais(arquivos):
+    caminho, conn, ids = arquivos
+    conn.execute("UPDATE escalas SET dados = ? WHERE json_id = ? AND posicao = 0", (b"\x00lixo", ids["b.json"])); conn.commit()
+    gravados, falhas = executar_lote(caminho, conn, [ids["a.json"], ids["b.json"]], REGRAS, FORMATO, processos=1)
+    assert [nome for _, nome, _ in gravados] == ["a.json"]
+    assert [(json_id, nome) for json_id, nome, _ in falhas] == [(ids["b.json"], "b.json")] and falhas[0][2].startswith("ValueError")
+    assert len(banco.exportar_documento(conn, ids["a.json"])["escalas"]) == 6
+
+
+def test_executar_lote_em_processos(arquivos):
+    caminho, conn, ids = arquivos
+    gravados, falhas = executar_lote(caminho, conn, list(ids.values()), REGRAS, FORMATO, processos=2)
+    assert falhas == [] and sorted(nome for _, nome, _ in gravados) == ["a.json", "b.json"]
+
+
+@pytest.mark.parametrize("interromper", [False, True])
+def test_executar_lote_no_proprio_processo_fecha_a_conexao(arquivos, monkeypatch, interromper):
+    caminho, conn, ids = arquivos
+    abertas, conectar = [], banco.conectar
+    monkeypatch.setattr(banco, "conectar", lambda caminho_banco: abertas.append(conectar(caminho_banco)) or abertas[-1])
+    def progresso(feitos, total):
+        if interromper: raise RuntimeError("interrompido")
+    executar = lambda: executar_lote(caminho, conn, list(ids.values()), REGRAS, FORMATO, processos=1, progresso=progresso)
+    if interromper:
+        with pytest.raises(RuntimeError): executar()
+    else: executar()
+    assert len(abertas) == 1 and edicao_em_massa._CONEXAO_PROCESSO is None
+    with pytest.raises(sqlite3.ProgrammingError): abertas[0].execute("SELECT 1")
@@ -0,0 +1,49 @@
+# test_escrita_json.py (EscritorJsonIncremental contra json.dump)
+
+import json
+
+import pytest
+
+from escrita_json import EscritorJsonIncremental
+from processador import ESCALA, JORNADA
+from registros import expandir_colecao
+
+
+def _escalas(quantidade):
+    escalas = []
+    for i in range(quantidade):
+        escala = ESCALA.criar(NOME=f"Escala {i} – ção", DESC_ESCALA="SEG A SEX 08:00 AS 17:00", COD=str(i), carga_horaria="44", key=f"k{i}")
+        escala["TIPO"], escala["JORNADAS"] = "SEMANAL", ["j1"] * 5 + ["ID_FOLGA", "ID_DSR"]
+        escalas.append(escala if i % 2 else escala.expandir())  # registros compactos e dicts comuns misturados
+    return escalas
+
+
+def _jornadas():
+    jornada = JORNADA.criar(NOME_JORNADA="08:00 / 17:00", HORAS_CONTRATUAIS=["08:00", "17:00"],
+                            PERIODOS=[{"TM_HORA_INICIO": "0800", "TM_HORA_FIM": "1700", "DESC_TIPO_HORA": "Expediente"}], key="j1")
+    return {"ID_FOLGA": {"NOME_JORNADA": "FOLGA", "key": "ID_FOLGA", "sem_expediente": "1"}, "j1": jornada}
+
+
+def _gravar(caminho, escalas, compacto=False, tamanho_lote=500, **demais_chaves):
+    with EscritorJsonIncremental(caminho, compacto=compacto, tamanho_lote=tamanho_lote) as escritor:
+        for escala in escalas: escritor.adicionar_escala(escala)
+        arquivo = escritor.finalizar(**demais_chaves)
+    return arquivo
+
+
+@pytest.mark.parametrize("quantidade, tamanho_lote", [(0, 500), (1, 500), (7, 3), (6, 2)])
+@pytest.mark.parametrize("compacto", [False, True])
+def test_escritor_igual_a_json_dump(tmp_path, quantidade, tamanho_lote, compacto):
+    caminho = tmp_path / "saida.json"
+    escalas, jornadas = _escalas(quantidade), _jornadas()
+    arquivo = _gravar(str(caminho), escalas, compacto, tamanho_lote, jornadas=jornadas, horas_adicionais={"Hora Extra 50%": {"TIPO": "HE", "VALOR": "50"}})
+    documento = {"escalas": [dict(e) for e in escalas], "jornadas": expandir_colecao(dict(jornadas)), "horas_adicionais": {"Hora Extra 50%": {"TIPO": "HE", "VALOR": "50"}}}
+    opcoes = {"separators": (',', ':')} if compacto else {"indent": 4}
+    assert caminho.read_text(encoding="utf-8") == json.dumps(documento, ensure_ascii=False, **opcoes)
+    assert arquivo.total_escalas == quantidade and arquivo.carregar() == documento
+
+
+def test_escritor_com_listas_vazias(tmp_path):
+    caminho = tmp_path / "saida.json"
+    _gravar(str(caminho), [], jornadas=[], horas_adicionais=[])
+    assert caminho.read_text(encoding="utf-8") == json.dumps({"escalas": [], "jornadas": [], "horas_adicionais": []}, ensure_ascii=False, indent=4)
@@ -0,0 +1,65 @@
+# test_gerenciador_escalas_final.py (Carga horária vetorizada contra o cálculo escala a escala)
+
+import random
+
+import pytest
+
+from gerenciador_escalas_final import calculate_carga_horaria, calculate_cargas_horarias, process_schedule_description
+
+
+def carga_horaria_escalar(jornadas_list, all_jornadas_definitions):
+    """O cálculo de antes: soma os períodos de Expediente de cada jornada da escala, um a um."""
+    total_minutes = 0
+    for jornada_key in jornadas_list:
+        if jornada_key in all_jornadas_definitions and jornada_key not in ["ID_DSR", "ID_FOLGA"]:
+            for period in all_jornadas_definitions[jornada_key].get('PERIODOS', []):
+                if period.get('DESC_TIPO_HORA') != 'Expediente': continue
+                try:
+                    start_time_str, end_time_str = period['TM_HORA_INICIO'], period['TM_HORA_FIM']
+                    if not start_time_str or not end_time_str: continue
+                    duration_minutes = (int(end_time_str[:2]) * 60 + int(end_time_str[2:])) - (int(start_time_str[:2]) * 60 + int(start_time_str[2:]))
+                    if duration_minutes < 0: duration_minutes += 24 * 60
+                    total_minutes += duration_minutes
+                except ValueError: continue
+    return str(round(total_minutes / 60))
+
+
+def _horario(aleatorio):
+    if aleatorio.random() < 0.03: return aleatorio.choice(["", "ab:c", "12", "2400", "0000"])
+    return f"{aleatorio.randrange(24):02d}{aleatorio.choice([0, 15, 30, 45, aleatorio.randrange(60)]):02d}"
+
+
+def _jornadas_aleatorias(aleatorio, quantidade):
+    jornadas = {"ID_FOLGA": {"NOME_JORNADA": "FOLGA", "key": "ID_FOLGA"}, "ID_DSR": {"NOME_JORNADA": "DSR", "key": "ID_DSR"}}
+    for i in range(quantidade):
+        periodos = [{"TM_HORA_INICIO": _horario(aleatorio), "TM_HORA_FIM": _horario(aleatorio), "DESC_TIPO_HORA": aleatorio.choice(["Expediente", "Expediente", "Intervalo"])}
+                    for _ in range(aleatorio.randrange(4))]
+        jornadas[f"j{i}"] = {"NOME_JORNADA": f"J{i}", "key": f"j{i}", "PERIODOS": periodos}
+    return jornadas
+
+
+@pytest.mark.parametrize("semente", range(5))
+def test_cargas_horarias_igual_ao_calculo_escalar(semente):
+    aleatorio = random.Random(semente)
+    jornadas = _jornadas_aleatorias(aleatorio, 60)
+    chaves = list(jornadas) + ["DESCONHECIDA"]
+    escalas = [[aleatorio.choice(chaves) for _ in range(aleatorio.randrange(9))] for _ in range(400)]
+    esperado = [carga_horaria_escalar(escala, jornadas) for escala in escalas]
+    duracoes = {}
+    assert calculate_cargas_horarias(escalas, jornadas, duracoes) == esperado
+    assert calculate_cargas_horarias(escalas[::-1], jornadas, duracoes) == esperado[::-1]  # durações já guardadas
+    assert [calculate_carga_horaria(escala, jornadas) for escala in escalas] == esperado
+
+
+def test_cargas_horarias_arredonda_como_round():
+    # Totais de 30, 90, 150 e 210 minutos: .5 vai para o par, como em round().
+    jornadas = {f"m{m}": {"PERIODOS": [{"TM_HORA_INICIO": "0000", "TM_HORA_FIM": f"{m // 60:02d}{m % 60:02d}", "DESC_TIPO_HORA": "Expediente"}]} for m in (29, 30, 31, 90, 150, 210)}
+    escalas = [[chave] for chave in jornadas] + [[]]
+    assert calculate_cargas_horarias(escalas, jornadas) == [carga_horaria_escalar(escala, jornadas) for escala in escalas] == ["0", "0", "1", "2", "2", "4", "0"]
+
+
+def test_cargas_horarias_das_escalas_geradas():
+    jornada_mapping, jornadas, por_impressao = {}, {}, {}
+    descricoes = ["SEG A SEX 08:00 AS 17:00", "12X36 19:00 AS 07:00", "6X1 - 06:00 AS 14:20", "SEG A QUI 08:00 AS 12:00 13:00 AS 18:00 SEX 08:00 AS 12:00 13:00 AS 17:00", "SAB 22:00 AS 06:00"]
+    escalas = [process_schedule_description(descricao, jornada_mapping, jornadas, por_impressao)[0] for descricao in descricoes]
+    assert calculate_cargas_horarias(escalas, jornadas) == [carga_horaria_escalar(escala, jornadas) for escala in escalas]
@@ -0,0 +1,201 @@
+# test_processador.py (MotorRegras contra a tradução linha a linha)
+
+import os
+import re
+import sqlite3
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from conftest import RAIZ
+from processador import LOG_COMPLETO, MotorRegras, process_file, traduzir_horarios
+
+# ==============================================================================
+# REFERÊNCIA: a tradução de antes do MotorRegras, copiada aqui para não depender do código testado
+# ==============================================================================
+
+def _get_day_indices(day_str):
+    if not isinstance(day_str, str): return []
+    day_map = {'SEG':0,'SEGUNDA':0,'2A':0,'2ª':0,'TER':1,'TERCA':1,'TERÇA':1,'3A':1,'3ª':1,'QUA':2,'QUARTA':2,'4A':2,'4ª':2,'QUI':3,'QUINTA':3,'5A':3,'5ª':3,'SEX':4,'SEXTA':4,'6A':4,'6ª':4,'SAB':5,'SABADO':5,'SÁBADO':5,'SÁB':5,'DOM':6,'DOMINGO':6}
+    indices, day_str_upper = set(), day_str.upper().strip()
+    range_match = re.search(r'([A-Z0-9ª]+)\s+(?:A|ATE|ATÉ)\s+([A-Z0-9ª]+)', day_str_upper)
+    if range_match:
+        start_day, end_day = day_map.get(range_match.group(1)), day_map.get(range_match.group(2))
+        if start_day is not None and end_day is not None: return sorted(list(range(start_day, end_day + 1)))
+    for part in filter(None, re.split(r'\s+', re.sub(r'[/,]', ' ', day_str_upper))):
+        if (idx := day_map.get(part)) is not None: indices.add(idx)
+    return sorted(list(indices))
+
+
+def _formatar_batidas(time_tokens, sep=" / "):
+    batidas = []
+    for t in time_tokens:
+        n = re.sub(r'[^0-9]', '', str(t).replace('H', ''))
+        if not n: continue
+        if len(n) <= 2: batidas.append(f"{int(n):02d}:00")
+        elif len(n) == 3: batidas.append(f"0{n[0]}:{n[1:]}")
+        elif len(n) >= 4: batidas.append(f"{n[:2]}:{n[2:4]}")
+    return sep.join(batidas)
+
+
+def _formatar_dias(day_indices):
+    if not day_indices: return ""
+    day_map = {0: 'SEG', 1: 'TER', 2: 'QUA', 3: 'QUI', 4: 'SEX', 5: 'SAB', 6: 'DOM'}
+    dias_ordenados = sorted(list(set(day_indices)))
+    grupos, grupo_atual = [], []
+    for idx in dias_ordenados:
+        if not grupo_atual or idx == grupo_atual[-1] + 1: grupo_atual.append(idx)
+        else: grupos.append(grupo_atual); grupo_atual = [idx]
+    if grupo_atual: grupos.append(grupo_atual)
+    if not any(len(g) > 2 for g in grupos): return " ".join([day_map[idx] for idx in dias_ordenados])
+    return " E ".join(f"{day_map[g[0]]} A {day_map[g[-1]]}" if len(g) > 2 else " ".join(day_map[idx] for idx in g) for g in grupos)
+
+
+def _calcular_duracao(horarios_tokens):
+    if len(horarios_tokens) < 2: return None
+    try:
+        t1_str = _formatar_batidas([horarios_tokens[0]], sep='').replace(':', ''); t2_str = _formatar_batidas([horarios_tokens[-1]], sep='').replace(':', '')
+        h1, h2 = datetime.strptime(t1_str, "%H%M"), datetime.strptime(t2_str, "%H%M")
+        if h2 < h1: h2 += timedelta(days=1)
+        return h2 - h1
+    except ValueError: return None
+
+
+def _parser_generico_fallback(texto):
+    resultados_partes = []
+    for parte in filter(None, re.split(r'(?=\b(?:SEG|TER|QUA|QUI|SEX|SAB|DOM|2ª|3ª|4ª|5ª|6ª)\b)', texto, flags=re.IGNORECASE)):
+        parte_strip = parte.strip()
+        if not parte_strip: continue
+        dias, horarios = _get_day_indices(parte_strip), re.findall(r'(\d{1,2}:?\d{2})', parte_strip)
+        if not dias and horarios: dias = list(range(5))
+        if dias and horarios:
+            separador_horario = ' AS ' if len(horarios) == 2 else ' / '
+            resultados_partes.append(f"{_formatar_dias(dias)} {_formatar_batidas(horarios, sep=separador_horario)}")
+    return " E ".join(resultados_partes) if resultados_partes else None
+
+
+def traducao_linha_a_linha(textos, dicionario_regras):
+    """A tradução de antes do MotorRegras: cada linha percorre todas as regras, na ordem recebida, e refaz as condições."""
+    def _limpar_texto(texto):
+        texto_upper = texto.upper().strip()
+        texto_limpo = re.sub(r'IRIS KRAUSE.*|DIARISTA|RECIFE|FEIRA|ÀS', '', texto_upper, flags=re.IGNORECASE)
+        if not any(kw in texto_upper for kw in ['(IMPAR)', '(PAR)']): texto_limpo = texto_limpo.replace('(', ' ').replace(')', ' ')
+        return re.sub(r'\s+', ' ', texto_limpo).strip()
+    def _traduzir_linha(texto_original):
+        if not isinstance(texto_original, str) or not texto_original.strip(): return "SEM INTERPRETAÇÃO"
+        texto_upper, texto_limpo = texto_original.upper().strip(), _limpar_texto(texto_original)
+        horarios_tokens = re.findall(r'(\d{1,2}H|\d{1,2}:\d{2})', texto_upper)
+        format_dict = {f"h{i+1}": _formatar_batidas([h], sep='') for i, h in enumerate(horarios_tokens)}
+        for regra in dicionario_regras:
+            if regra['tipo_regra'] == 'EXATA' and regra['condicao_texto'].upper() == texto_upper: return regra['formato_saida']
+            elif regra['tipo_regra'] == 'QUANTIDADE' and len(horarios_tokens) == regra['condicao_qtde_horarios']:
+                if not (regra['condicao_sem_dia'] and _get_day_indices(texto_limpo)): return regra['formato_saida'].format(**format_dict)
+            elif regra['tipo_regra'] == 'DURACAO':
+                palavras_chave = [kw.strip().upper() for kw in (regra['condicao_texto'] or "").split(',') if kw.strip()]
+                if palavras_chave and not all(kw in texto_upper for kw in palavras_chave): continue
+                duracao_ok = not regra['condicao_duracao']
+                if not duracao_ok and (duracao_total := _calcular_duracao(horarios_tokens)):
+                    try:
+                        h, m = map(int, regra['condicao_duracao'].split(':'))
+                        duracao_ok = duracao_total == timedelta(hours=h, minutes=m)
+                    except ValueError: pass
+                if duracao_ok: return regra['formato_saida'].format(**format_dict)
+        return _parser_generico_fallback(texto_limpo) or "SEM INTERPRETAÇÃO"
+    return [_traduzir_linha(texto) for texto in textos]
+
+# ==============================================================================
+# TESTES
+# ==============================================================================
+
+def _regra(id_, tipo, prioridade, formato, texto=None, duracao=None, qtde=None, sem_dia=0):
+    return {"id": id_, "nome_regra": f"Regra {id_}", "tipo_regra": tipo, "condicao_texto": texto, "condicao_duracao": duracao,
+            "condicao_qtde_horarios": qtde, "condicao_sem_dia": sem_dia, "formato_saida": formato, "prioridade": prioridade}
+
+# Já em ordem de prioridade, como o app.py lê do banco (ORDER BY prioridade).
+REGRAS = [
+    _regra(1, "EXATA", 1, "SEG A SEX 07:00 AS 19:00", texto="plantao especial"),
+    _regra(2, "DURACAO", 1, "NUNCA {h1}", texto="INVALIDA", duracao="xx"),
+    _regra(3, "DURACAO", 2, "12X36 - {h1} AS {h2}", texto="12X36, DIURNO", duracao="12:00"),
+    _regra(4, "DURACAO", 3, "SEG A SAB {h1} AS {h2}", duracao="06:00"),
+    _regra(5, "DURACAO", 4, "12X36 NOTURNO {h1} AS {h2}", texto="NOTURNO"),
+    _regra(6, "QUANTIDADE", 5, "SEG A SEX {h1} AS {h2}", qtde=2, sem_dia=1),
+    _regra(7, "QUANTIDADE", 5, "SEG A SEX {h1} / {h2} / {h3} / {h4}", qtde=4),
+    _regra(8, "EXATA", 9, "SEG A SEX 08:00 AS 17:00 (EXATA)", texto="SEG A SEX 08:00 AS 17:00"),
+    _regra(9, "EXATA", 9, "TURNO (EXATA)", texto="turno 08:00 as 12:00"),
+]
+
+TEXTOS = [
+    "plantao especial", "  PLANTAO ESPECIAL ", "08:00 AS 14:00", "08:00 AS 12:00 13:00 AS 17:00", "12X36 DIURNO 07:00 AS 19:00",
+    "12x36 noturno 19:00 as 07:00", "SEG A SEX 08:00 AS 17:00", "TURNO 08:00 AS 12:00", "SEG A QUI 08:00 AS 18:00 / SEX 08:00 AS 17:00",
+    "DIARISTA RECIFE 7H AS 13H", "SEG (IMPAR) 08:00 AS 12:00", "TER QUA (X) 10:00 AS 16:00", "INVALIDA 08:00 AS 09:00",
+    "SAB 22:00 AS 04:00", "SEM HORARIO", "", "   ", None, float("nan"), 1234, "SEG A SEX 7:00 AS 16:00 E SAB 7:00 AS 11:00",
+]
+
+
+def _traduzir(textos, regras, **opcoes):
+    df = pd.DataFrame({"DESC": textos}, index=range(10, 10 + len(textos)))
+    resultado, log = traduzir_horarios(df, "DESC", regras, **opcoes)
+    return resultado["DESCRICAO_TRADUZIDA"].tolist(), log
+
+
+def test_motor_regras_igual_a_traducao_linha_a_linha():
+    textos = TEXTOS * 3
+    assert _traduzir(textos, REGRAS)[0] == traducao_linha_a_linha(textos, REGRAS)
+
+
+def test_motor_regras_segue_a_ordem_recebida():
+    # ORDER BY prioridade no SQLite traz as regras sem prioridade (NULL) primeiro; a ordem da lista é a que vale.
+    regras = [_regra(10, "QUANTIDADE", None, "SEM PRIORIDADE {h1} AS {h2}", qtde=2)] + REGRAS[::-1]
+    textos = TEXTOS * 2
+    traduzidas, log = _traduzir(textos, regras, modo_log=LOG_COMPLETO)
+    assert traduzidas == traducao_linha_a_linha(textos, regras)
+    assert traduzidas[2] == "SEM PRIORIDADE 08:00 AS 14:00"
+    assert "Testando Regra (Prioridade None): 'Regra 10'" in log.renderizar()
+
+
+def test_motor_regras_paralelo_igual_ao_sequencial():
+    textos = TEXTOS * 3
+    sequencial, log_sequencial = _traduzir(textos, REGRAS, modo_log=LOG_COMPLETO)
+    paralelo, log_paralelo = _traduzir(textos, MotorRegras(REGRAS), modo_log=LOG_COMPLETO, processos=2, tamanho_lote=4)
+    assert paralelo == sequencial == traducao_linha_a_linha(textos, REGRAS)
+    assert log_paralelo.renderizar() == log_sequencial.renderizar()
+
+
+def test_motor_regras_cache_entre_execucoes():
+    cache = {}
+    primeira = _traduzir(TEXTOS, REGRAS, cache=cache)[0]
+    assert _traduzir(TEXTOS, REGRAS, cache=cache)[0] == primeira
+    assert list(cache) == [MotorRegras(REGRAS).assinatura]
+    outras_regras = REGRAS[:-1]
+    assert _traduzir(TEXTOS, outras_regras, cache=cache)[0] == traducao_linha_a_linha(TEXTOS, outras_regras)
+    assert list(cache) == [MotorRegras(outras_regras).assinatura]
+
+
+@pytest.mark.skipif(not (os.path.exists(os.path.join(RAIZ, "analise.csv")) and os.path.exists(os.path.join(RAIZ, "database_bkp.db"))),
+                    reason="analise.csv ou database_bkp.db ausente")
+def test_motor_regras_com_regras_e_descricoes_reais():
+    conn = sqlite3.connect(os.path.join(RAIZ, "database_bkp.db")); conn.row_factory = sqlite3.Row
+    try: regras = [dict(row) for row in conn.execute("SELECT * FROM regras_traducao ORDER BY prioridade").fetchall()]
+    finally: conn.close()
+    textos = pd.read_csv(os.path.join(RAIZ, "analise.csv"), engine='python', encoding='latin-1', sep=',').iloc[:, 1].tolist()
+    esperado = traducao_linha_a_linha(textos, regras)
+    assert _traduzir(textos, regras)[0] == esperado
+    assert _traduzir(textos, regras, processos=2, tamanho_lote=500)[0] == esperado
+
+
+def _semana(descricao, caminho):
+    """NOME_JORNADA de cada dia da escala gerada por process_file para uma descrição já traduzida."""
+    dados, _ = process_file(pd.DataFrame({"DESCRICAO_TRADUZIDA": [descricao], "NOME": ["Escala"]}), caminho)
+    return [dados["jornadas"][chave]["NOME_JORNADA"] for chave in dados["escalas"][0]["JORNADAS"]]
+
+
+@pytest.mark.parametrize("descricao, esperado", [
+    ("SEG-SEX 08:00 AS 17:00", ["FOLGA"] * 6 + ["DSR"]),  # 'SEG-SEX' não é intervalo de dias
+    ("SEG A SEX 08:00 AS 17:00", ["08:00 / 17:00"] * 5 + ["FOLGA", "DSR"]),
+    ("SEG A QUI 08:00 AS 18:00 E SEX 08:00 AS 17:00", ["08:00 / 18:00"] * 4 + ["08:00 / 17:00", "FOLGA", "DSR"]),
+    ("SEG, QUA/SEX 07:00 AS 13:00", ["07:00 / 13:00", "FOLGA", "07:00 / 13:00", "FOLGA", "07:00 / 13:00", "FOLGA", "DSR"]),
+    ("(2ª) 08:00 AS 12:00", ["FOLGA"] * 6 + ["DSR"]),
+])
+def test_process_file_dias_da_escala_semanal(tmp_path, descricao, esperado):
+    assert _semana(descricao, str(tmp_path / "saida.json")) == esperado